@@ -0,0 +1,64 @@
+"""
+AgentService.get_agents 记忆加载基准测试：用带模拟网络延迟的内存版 Supabase 对比
+逐个 agent 查询最新记忆（N+1）与 MemoryService.get_latest_memories 批量加载的往返次数与耗时。
+
+用法：
+    python -m backend.benchmarks.bench_agent_memories --agents 10 100 1000 --latency 0.01
+"""
+import argparse
+import time
+from backend.services import agent_service, memory_service
+from backend.services.agent_service import AgentService
+from backend.services.memory_service import LatestMemoriesCache, MemoryService
+from backend.tests.fake_supabase import FakeSupabase
+
+
+def seed(n_agents: int, memories_per_agent: int, latency: float) -> FakeSupabase:
+    db = FakeSupabase(latency=latency)
+    db.tables["agents"] = [{"id": str(i), "name": f"居民{i}", "position": {"x": 0, "y": 0}, "state": "IDLE"} for i in range(n_agents)]
+    db.tables["memories"] = [
+        {"id": f"{a}-{j}", "agent_id": str(a), "content": f"记忆{j}", "timestamp": j * n_agents + a, "importance": 1, "type": "EVENT"}
+        for a in range(n_agents) for j in range(memories_per_agent)
+    ]
+    memory_service.supabase = agent_service.supabase = db
+    return db
+
+
+def legacy(db: FakeSupabase):
+    # 旧写法：先取全部 agent，再逐个查询该 agent 的记忆
+    agents = db.table("agents").select("*").execute().data
+    service = MemoryService()
+    for agent in agents:
+        service.get_memories(agent["id"], limit=5)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--memories", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.01, help="每次往返的模拟延迟（秒）")
+    args = parser.parse_args()
+
+    memory_service.latest_memories_cache = LatestMemoriesCache(ttl=60)
+    for n in args.agents:
+        db = seed(n, args.memories, args.latency)
+        t = time.perf_counter()
+        legacy(db)
+        legacy_s, legacy_calls = time.perf_counter() - t, db.calls
+
+        db = seed(n, args.memories, args.latency)
+        memory_service.latest_memories_cache.invalidate()
+        t = time.perf_counter()
+        AgentService().get_agents()
+        batched_s, batched_calls = time.perf_counter() - t, db.calls
+
+        t = time.perf_counter()
+        AgentService().get_agents()
+        cached_s, cached_calls = time.perf_counter() - t, db.calls - batched_calls
+        print(f"{n:>5} agents  N+1 {legacy_calls:>5} 次往返 {legacy_s * 1000:9.1f}ms   "
+              f"批量 {batched_calls:>2} 次往返 {batched_s * 1000:7.1f}ms   "
+              f"命中缓存 {cached_calls} 次往返 {cached_s * 1000:6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+事件生命周期调度基准测试：大量同时生效的事件登记（激活并施加影响）与按时间推进批量到期撤销的耗时，
+以及没有事件到点时 advance 的空转开销。
+
+用法：
+    python -m backend.benchmarks.bench_event_lifetime --events 10000 100000 300000 --agents 10000
+"""
+import argparse
+import random
+import time
+from backend.models import Agent, Event
+from backend.services.event_lifetime import EventLifetimeScheduler
+from backend.services.world_state import WorldState, NullSink
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--agents", type=int, default=10000)
+    parser.add_argument("--affected", type=int, default=3, help="每个事件影响的 agent 数")
+    parser.add_argument("--steps", type=int, default=100, help="到期时间均匀分布在多少个 advance 步内")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    agent_ids = [f"a{i}" for i in range(args.agents)]
+    for n in args.events:
+        agents = [Agent(id=a, name=a, position={"x": 0, "y": 0}, state="IDLE") for a in agent_ids]
+        state = WorldState(agents, NullSink(), {'flushIntervalSeconds': 3600})
+        scheduler = EventLifetimeScheduler(state, clock=lambda: 0)
+        events = [Event(id=f"e{i}", type="SOCIAL", description="", start_time=0, duration=rng.randrange(1, args.steps + 1) * 1000,
+                        impact={"mood": rng.choice([-5, 5])}) for i in range(n)]
+        targets = [rng.sample(agent_ids, args.affected) for _ in range(n)]
+
+        t = time.perf_counter()
+        for event, ids in zip(events, targets):
+            scheduler.register(event, ids, now_ms=0)
+        register_us = (time.perf_counter() - t) / n * 1e6
+
+        t = time.perf_counter()
+        idle_rounds = 1000
+        for _ in range(idle_rounds):
+            scheduler.advance(0)
+        idle_us = (time.perf_counter() - t) / idle_rounds * 1e6
+
+        t = time.perf_counter()
+        worst = 0.0
+        for step in range(1, args.steps + 1):
+            s = time.perf_counter()
+            scheduler.advance(step * 1000)
+            worst = max(worst, time.perf_counter() - s)
+        expire_us = (time.perf_counter() - t) / n * 1e6
+        assert len(scheduler) == 0
+        state.close()
+
+        print(f"events={n:>7} 登记={register_us:6.2f}us/个 到期撤销={expire_us:6.2f}us/个 "
+              f"单步最慢={worst * 1000:7.2f}ms 空转advance={idle_us:5.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+事件流水线基准测试：同步执行全部副作用与异步流水线的受理延迟、吞吐对比。
+写库延迟用 FakeSupabase 模拟，embedding 与扇出用固定耗时模拟。
+
+用法：
+    python -m backend.benchmarks.bench_event_pipeline --events 200 --workers 1 4 8 --db-latency 0.02
+"""
+import argparse
+import time
+from backend.models import Event
+from backend.services import event_service
+from backend.services.event_service import EventService, _make_pipeline
+from backend.services.llm_service import LLMService
+from backend.services.vector_index import VectorIndex
+from backend.tests.fake_supabase import FakeSupabase
+
+
+def _events(n, prefix):
+    return [Event(id=f"{prefix}-{i}", type="SOCIAL", description=f"事件{i}", duration=1, affected_agents=["1"]) for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--fanout-latency", type=float, default=0.03)
+    args = parser.parse_args()
+
+    event_service.supabase = FakeSupabase(latency=args.db_latency)
+    event_service.event_index = VectorIndex("events", dim=2)
+    LLMService.get_embedding = lambda self, text: (time.sleep(args.embed_latency), [0.5, 0.5])[1]
+    EventService._fan_out_event = lambda self, job: time.sleep(args.fanout_latency)
+    service = EventService()
+    event_service.event_pipeline = _make_pipeline()
+
+    events = _events(args.events // 4, "sync")
+    t = time.perf_counter()
+    for event in events:
+        service.add_event(event, defer=False)
+    sync_total = time.perf_counter() - t
+    print(f"同步      受理={sync_total / len(events) * 1000:8.2f}ms/事件 吞吐={len(events) / sync_total:7.1f}事件/s")
+
+    settings = event_service.ConfigManager.get_event_pipeline_settings()
+    for workers in args.workers:
+        for stage in settings['stages'].values():
+            stage['workers'] = workers
+        event_service.event_pipeline = pipeline = _make_pipeline()
+        events = _events(args.events, f"w{workers}")
+        t = time.perf_counter()
+        for event in events:
+            service.add_event(event)
+        ack = time.perf_counter() - t
+        pipeline.drain()
+        total = time.perf_counter() - t
+        stats = pipeline.stats()
+        print(f"workers={workers:<3} 受理={ack / len(events) * 1000:8.3f}ms/事件 吞吐={len(events) / total:7.1f}事件/s "
+              f"端到端p95={stats['endToEndP95Ms']}ms")
+        pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
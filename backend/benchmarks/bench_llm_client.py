@@ -0,0 +1,124 @@
+"""
+LLM 客户端连接复用基准测试。
+
+在本地启动一个 OpenAI 兼容的桩服务（/v1/embeddings、/v1/chat/completions），
+分别测量「每次调用新建 OpenAI 客户端」（旧实现）与「共享连接池客户端」的 calls/sec。
+本地是明文 HTTP，没有 TLS 握手，可用 --handshake-ms 在每条新连接上模拟握手耗时。
+
+用法：
+    python -m backend.benchmarks.bench_llm_client --calls 200 --handshake-ms 30
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from openai import OpenAI
+from backend.services.llm_client import get_llm_client, reset_llm_clients
+
+EMBEDDING_DIM = 1536
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 允许 keep-alive
+    handshake_delay = 0.0
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+        if self.handshake_delay:
+            time.sleep(self.handshake_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.path.endswith('/embeddings'):
+            inputs = payload.get('input') or []
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            body = {
+                "object": "list",
+                "model": payload.get('model'),
+                "data": [{"object": "embedding", "index": i, "embedding": [0.001] * EMBEDDING_DIM} for i in range(len(inputs))],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            }
+        elif self.path.endswith('/chat/completions'):
+            body = {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get('model'),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "{\"action\": \"IDLE\"}"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _call(client: OpenAI, kind: str):
+    if kind == 'embedding':
+        client.embeddings.create(input=["AI小镇基准测试"], model="text-embedding-v3")
+    else:
+        client.chat.completions.create(model="qwen-max", messages=[{"role": "user", "content": "hi"}])
+
+
+def _run(label: str, calls: int, threads: int, make_client, kind: str) -> float:
+    per_thread = calls // threads
+    _StubHandler.connections = 0
+
+    def worker():
+        for _ in range(per_thread):
+            _call(make_client(), kind)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    rate = per_thread * threads / elapsed
+    print(f"{label:<10} {kind:<10} 调用 {per_thread * threads:>5} 次  耗时 {elapsed:6.2f}s  {rate:8.1f} calls/sec  新建连接 {_StubHandler.connections}")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 客户端连接复用基准测试")
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--handshake-ms', type=float, default=30.0, help="每条新连接模拟的TLS握手耗时（毫秒）")
+    args = parser.parse_args()
+
+    _StubHandler.handshake_delay = args.handshake_ms / 1000.0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    api_key = "stub-key"
+
+    try:
+        for kind in ('embedding', 'chat'):
+            before = _run("每次新建", args.calls, args.threads, lambda: OpenAI(api_key=api_key, base_url=base_url), kind)
+            reset_llm_clients()
+            after = _run("连接池", args.calls, args.threads, lambda: get_llm_client(api_key, base_url), kind)
+            print(f"{kind} 提升: {after / before:.1f}x\n")
+    finally:
+        reset_llm_clients()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+政策记忆替换基准测试：用带模拟网络延迟的内存版 Supabase 对比
+旧的逐 agent 查询 + 逐条删除写法与 PolicyMemoryService 的集合删除 + 批量插入。
+
+用法：
+    python -m backend.benchmarks.bench_policy_memory --agents 10 100 1000 --latency 0.02
+"""
+import argparse
+import time
+from backend.models import Event
+from backend.services import memory_service, policy_memory_service
+from backend.services.llm_service import LLMService
+from backend.services.policy_memory_service import PolicyMemoryService
+from backend.tests.fake_supabase import FakeSupabase
+
+
+def seed(db: FakeSupabase, n_agents: int, memories_per_agent: int):
+    db.tables["agents"] = [{"id": str(i)} for i in range(n_agents)]
+    db.tables["memories"] = [
+        {"id": f"{a}-{j}", "agent_id": str(a), "timestamp": j, "importance": 1,
+         "type": "POLICY" if j == 0 else "EVENT", "content": "最新政策/税率: 旧" if j == 0 else f"记忆{j}"}
+        for a in range(n_agents) for j in range(memories_per_agent)
+    ]
+
+
+def legacy(db: FakeSupabase, event: Event):
+    # 旧写法：get_agents 逐个取记忆，再逐个取前 100 条扫描内容、逐条删除、逐条插入
+    agents = db.table("agents").select("*").execute().data
+    for agent in agents:
+        db.table("memories").select("*").eq("agent_id", agent["id"]).execute()
+    for agent in agents:
+        old = db.table("memories").select("*").eq("agent_id", agent["id"]).range(0, 99).execute().data
+        for mem in old:
+            if '税' in mem["content"] or '政策' in mem["content"]:
+                db.table("memories").delete().eq("id", mem["id"]).execute()
+        db.table("memories").insert({"id": f"{event.id}-{agent['id']}-policy", "agent_id": agent["id"],
+                                     "type": "POLICY", "content": f"最新政策/税率: {event.description}"}).execute()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--memories", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02, help="每次往返的模拟延迟（秒）")
+    args = parser.parse_args()
+
+    LLMService.get_embedding = lambda self, text: [0.0] * 8
+    policy_memory_service.state_agents = []
+    event = Event(id="bench", type="POLICY", description="税率调整为 12%", impact={}, startTime=0, duration=1, affectedAgents=[])
+    for n in args.agents:
+        db = FakeSupabase(latency=args.latency)
+        seed(db, n, args.memories)
+        t = time.perf_counter()
+        legacy(db, event)
+        legacy_s, legacy_calls = time.perf_counter() - t, db.calls
+
+        db = FakeSupabase(latency=args.latency)
+        seed(db, n, args.memories)
+        memory_service.supabase = policy_memory_service.supabase = db
+        t = time.perf_counter()
+        PolicyMemoryService().replace_policy_memories(event)
+        new_s, new_calls = time.perf_counter() - t, db.calls
+        print(f"{n:>5} agents  旧写法 {legacy_calls:>6} 次往返 {legacy_s:8.2f}s   "
+              f"集合删除+批量插入 {new_calls:>3} 次往返 {new_s:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
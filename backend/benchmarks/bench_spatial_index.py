@@ -0,0 +1,60 @@
+"""
+视野查询基准测试：均匀网格空间索引与逐个遍历全部 agent 的对比。
+
+用法：
+    python -m backend.benchmarks.bench_spatial_index --agents 1000 5000 20000 --radius 150
+"""
+import argparse
+import math
+import random
+import time
+from backend.services.spatial_index import SpatialGrid
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--radius", type=float, default=150)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--cell-size", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for n in args.agents:
+        points = {f"a{i}": (rng.uniform(0, 800), rng.uniform(0, 600)) for i in range(n)}
+        grid = SpatialGrid(800, 600, args.cell_size)
+        t = time.perf_counter()
+        for agent_id, (x, y) in points.items():
+            grid.upsert(agent_id, x, y)
+        build_ms = (time.perf_counter() - t) * 1000
+        queries = [(rng.uniform(0, 800), rng.uniform(0, 600)) for _ in range(args.queries)]
+
+        t = time.perf_counter()
+        for x, y in queries:
+            sorted((math.hypot(px - x, py - y), a) for a, (px, py) in points.items()
+                   if math.hypot(px - x, py - y) <= args.radius)[:args.k]
+        scan_us = (time.perf_counter() - t) / len(queries) * 1e6
+
+        t = time.perf_counter()
+        for x, y in queries:
+            grid.query_radius(x, y, args.radius, limit=args.k)
+        radius_us = (time.perf_counter() - t) / len(queries) * 1e6
+
+        t = time.perf_counter()
+        for x, y in queries:
+            grid.nearest(x, y, args.k)
+        knn_us = (time.perf_counter() - t) / len(queries) * 1e6
+
+        t = time.perf_counter()
+        for i, agent_id in enumerate(points):
+            if i >= 1000:
+                break
+            grid.upsert(agent_id, rng.uniform(0, 800), rng.uniform(0, 600))
+        move_us = (time.perf_counter() - t) / min(1000, n) * 1e6
+        print(f"{n:>6} agents  构建 {build_ms:7.1f}ms  遍历 {scan_us:9.1f}us  半径查询 {radius_us:8.1f}us  "
+              f"{args.k}近邻 {knn_us:7.1f}us  移动 {move_us:5.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+进程内向量索引基准测试：构建耗时、内存占用、top-k 查询延迟。
+
+1M x 1536 维 float32 约需 6GB 内存，机器不足时可用 --dim 降维或调整 --sizes。
+
+用法：
+    python -m backend.benchmarks.bench_vector_index --sizes 10000 100000 1000000 --dim 1536
+"""
+import argparse
+import time
+import numpy as np
+from backend.services.vector_index import VectorIndex
+
+
+def bench(size: int, dim: int, queries: int, top_k: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    index = VectorIndex("bench", dim, initial_capacity=size)
+    chunk = 50000
+    start = time.perf_counter()
+    for offset in range(0, size, chunk):
+        n = min(chunk, size - offset)
+        block = rng.standard_normal((n, dim), dtype=np.float32)
+        index.add_many((f"id-{offset + i}", block[i], None) for i in range(n))
+    build = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(queries):
+        q = rng.standard_normal(dim, dtype=np.float32)
+        t = time.perf_counter()
+        index.search(q, top_k)
+        latencies.append((time.perf_counter() - t) * 1000)
+    latencies.sort()
+
+    t = time.perf_counter()
+    for i in range(min(1000, size)):
+        index.remove(f"id-{i}")
+    remove_us = (time.perf_counter() - t) / min(1000, size) * 1e6
+
+    print(f"{size:>9} x {dim:<5} 构建 {build:7.2f}s  矩阵 {index.nbytes() / 2**20:8.1f}MB  "
+          f"top{top_k} p50 {latencies[len(latencies) // 2]:7.2f}ms  p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f}ms  "
+          f"删除 {remove_us:6.1f}us/条")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="进程内向量索引基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size, args.dim, args.queries, args.top_k)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 # backend/config.py
+import os
 
 LLM_MODELS = {
     'deepseek-v3': {
@@ -208,8 +209,167 @@ EVENT_GENERATOR_PRESET = {
 }
 
 GLOBAL_SETTINGS = {
-    'eventFrequency': 0.1,
-    'timeScale': 1
+    'eventFrequency': 1.0,      # 每模拟小时生成的 Titan 事件数
+    'timeScale': 60,            # 模拟（小镇）时间倍速：60 即 1 真实分钟 = 小镇 1 小时，可经 PUT /api/simulation 调整
+    'maxTimeScale': 6000,
+    'maxCatchUpTicks': 5,       # 调度落后超过该周期数时跳过错过的周期，不集中补跑
+    'reactionConcurrency': 16,  # 事件反馈并发的最大 LLM 调用数
+    'reactionTimeout': 45.0     # 单个 agent 反馈超时（秒），超时结果被丢弃
+}
+
+# LLM/Embedding HTTP 客户端连接池配置（进程内按 base_url + api_key 复用）
+LLM_CLIENT_SETTINGS = {
+    'baseUrl': 'https://dashscope.aliyuncs.com/compatible-mode/v1',
+    'maxConnections': 64,           # 单个客户端最大并发连接数
+    'maxKeepaliveConnections': 32,  # 保持活跃的空闲连接数
+    'keepaliveExpiry': 30.0,        # 空闲连接保活时间（秒）
+    'connectTimeout': 5.0,          # 建连超时（秒）
+    'readTimeout': 120.0,           # 读超时（秒），流式输出需较长
+    'maxRetries': 2
+}
+
+# Embedding 配置：模型、统一维度与内容寻址缓存
+EMBEDDING_SETTINGS = {
+    'model': 'text-embedding-v3',
+    'dimension': 1536,                                  # 自动补齐/截断到该维度
+    'batchSize': 10,                                    # DashScope text-embedding-v3 单次请求最多 10 条
+    'cacheMaxEntries': 4096,                            # 进程内 LRU 条目上限（float32 约 6KB/条）
+    'cachePath': os.getenv('EMBEDDING_CACHE_PATH')      # 设置后启用 sqlite 磁盘缓存，重启后仍可命中
+}
+
+# 记忆存储配置
+MEMORY_SETTINGS = {
+    'insertBatchSize': 200,                 # 单次 bulk insert 的最大行数
+    # 写后缓冲：记忆先入队，攒够条数或超过时间阈值后批量落库
+    'writeBehind': True,
+    'writeBehindMaxBatch': 200,             # 达到该条数立即刷写
+    'writeBehindFlushSeconds': 1.0,         # 最早一条等待超过该秒数即刷写
+    'writeBehindMaxPending': 10000,         # 积压上限，达到后由提交方同步刷写
+    'writeBehindMaxRetries': 3,             # 同一批次连续刷写失败超过该次数后移入死信，不再阻塞后续写入
+    'policyDeleteChunkSize': 200,           # 政策记忆集合删除时每批的 agent id 数
+    # 批量加载每个 agent 最新 K 条记忆
+    'latestMemoriesChunkSize': 200,         # 每次 in_ 查询的 agent id 数
+    'latestMemoriesOverfetch': 2,           # 超额拉取倍数，减少补查
+    'latestMemoriesCacheTtlSeconds': 2.0,   # 共享缓存 TTL，0 表示不缓存
+    # 记忆整合：旧的低重要性记忆聚类为摘要，并限制每个 agent 的记忆条数
+    'consolidationIntervalSeconds': 600,    # 后台整合周期
+    'consolidationMinAgeMinutes': 60,       # 只整合早于该时长的记忆
+    'consolidationMaxImportance': 1,        # 只整合重要性不高于该值的记忆
+    'consolidationSimilarity': 0.85,        # 聚类的余弦相似度阈值
+    'consolidationMinClusterSize': 3,       # 簇内至少几条才生成摘要
+    'consolidationBatchSize': 2000,         # 每个 agent 每轮最多处理的候选条数
+    'summaryMaxChars': 300,
+    'maxMemoriesPerAgent': 2000,            # 每个 agent 的记忆上限，超出时淘汰综合得分最低的
+    'protectedTypes': ['POLICY', 'SUMMARY'] # 不参与整合与淘汰的记忆类型
+}
+
+# 记忆排序：综合得分 = 近因 × recencyWeight + 重要性 × importanceWeight + 相关度 × relevanceWeight
+MEMORY_RANKING_SETTINGS = {
+    'recencyWeight': 1.0,
+    'importanceWeight': 1.0,
+    'relevanceWeight': 1.0,
+    'recencyHalfLifeMinutes': 60   # 近因按指数衰减，经过该时长权重减半
+}
+
+# 进程内向量索引（记忆/事件/Agent 相似度检索），预热完成前回退到 Supabase RPC
+VECTOR_INDEX_SETTINGS = {
+    'enabled': True,
+    'warmLoadPageSize': 1000
+}
+
+# 关系图：好感度/互动次数矩阵
+RELATIONSHIP_SETTINGS = {
+    'decayHalfLifeHours': 72,            # 好感度向 0 衰减的半衰期，0 表示不衰减
+    'groupInteractionMaxAgents': 50,     # 参与人数不超过该值的事件才记为两两互动
+    'snapshotPath': os.getenv('RELATIONSHIP_SNAPSHOT_PATH')  # 设置后启动时加载、关闭时保存二进制快照
+}
+
+# 空间索引：地图均匀网格，用于视野/附近 agent 查询
+SPATIAL_SETTINGS = {
+    'mapWidth': 800,
+    'mapHeight': 600,
+    'cellSize': 50,          # 网格边长，接近视野半径的 1/3 时查询最省
+    'visionRadius': 150,     # prompt 中"视野内的人"的半径
+    'maxVisibleAgents': 8    # prompt 中最多列出的附近 agent 数，保证 prompt 长度有界
+}
+
+# 需求/属性随时间演化：每个 tick 对全体 agent 做一次批量计算，需求跌破阈值的 agent 才触发 LLM 决策
+AGENT_DYNAMICS_SETTINGS = {
+    'stepSeconds': 300,            # 演化步长（模拟秒）；模拟时间即小镇时间，倍速见 GLOBAL_SETTINGS.timeScale
+    # 每模拟小时的变化量；needs.x 为需求，其余为属性。各状态在 default 基础上覆盖
+    'rates': {
+        'default': {'energy': -4, 'needs.energy': -4, 'needs.social': -3, 'needs.fun': -3},
+        'IDLE': {'needs.fun': -4},
+        'WORKING': {'energy': -8, 'needs.energy': -8, 'needs.social': -1, 'needs.fun': -5},
+        'RESTING': {'energy': 20, 'needs.energy': 20, 'needs.fun': -1},
+        'SOCIALIZING': {'needs.social': 15, 'needs.fun': 5, 'sociability': 1}
+    },
+    'moodBaseline': 50,            # 心情向基线回归
+    'moodReversionPerHour': 0.1,   # 每小时回归与基线差值的比例
+    'moodPenaltyPerHour': 5,       # 每个低于阈值的需求每小时拉低心情的量
+    'thresholds': {'needs.energy': 20, 'needs.social': 20, 'needs.fun': 15, 'mood': 25},  # 向下跨越即标记
+    'decisionCooldownSeconds': 18000,  # 同一 agent 两次阈值决策的最短间隔（模拟秒）
+    'maxDecisionsPerStep': 5,          # 每步最多触发的 LLM 决策数
+    'persistIntervalSeconds': 3600     # 演化结果写回数据库的间隔（模拟秒）
+}
+
+# 事件副作用流水线：accept → persist → enrich（embedding）→ fanout（记忆、属性、关系、政策记忆）
+EVENT_PIPELINE_SETTINGS = {
+    'async': True,                 # False 时 add_event 在调用线程内同步执行全部阶段
+    'acceptTimeoutSeconds': 0.5,   # 入口队列满时 submit 最多等待多久，超时返回 503
+    'stages': {
+        'persist': {'workers': 4, 'queueSize': 1000, 'maxRetries': 3, 'retryBackoffSeconds': 0.5},
+        'enrich': {'workers': 4, 'queueSize': 1000, 'maxRetries': 2, 'retryBackoffSeconds': 0.5},
+        'fanout': {'workers': 4, 'queueSize': 1000, 'maxRetries': 2, 'retryBackoffSeconds': 0.5}
+    }
+}
+
+# 最近事件环形缓冲：GET /api/event 优先从内存读取，超出缓冲范围才查数据库
+RECENT_EVENTS_SETTINGS = {
+    'capacity': 2000,     # 缓冲的最近事件条数
+    'warmLoad': True      # 启动时从数据库预热最新的 capacity 条
+}
+
+# 政策登记表：事件写入时分类，prompt 直接取最近的有效政策
+POLICY_REGISTRY_SETTINGS = {
+    'capacity': 200,      # 保留的最近政策条数
+    'warmLoad': True,     # 启动时从数据库加载最近的政策事件
+    'warmLoadScanLimit': 2000,  # 预热时最多扫描的最近事件条数（政策按描述/meta 识别，只能在进程内分类）
+    'warmLoadPageSize': 500
+}
+
+# 事件生命周期：有 duration 的事件在 startTime 生效、startTime + duration 到期，到期时撤销数值影响
+EVENT_LIFETIME_SETTINGS = {
+    'enabled': True       # False 时事件的数值影响仍为一次性永久生效
+}
+
+# 事件级联：反应产生的触发事件按层推进，深度与数量受限
+EVENT_CASCADE_SETTINGS = {
+    'maxDepth': 2,              # 触发事件的最大层数（根事件为第 0 层）
+    'maxChildrenPerEvent': 3,   # 单个事件最多直接触发的事件数
+    'maxEventsPerAgent': 2,     # 单个 agent 在一次级联中最多触发的事件数
+    'maxEventsPerCascade': 20,  # 一次级联最多接纳的触发事件总数
+    'budgetSeconds': 90.0       # 一次级联的总耗时上限，超时后不再推进下一层
+}
+
+# 生成事件去重：与最近生成的事件比较 embedding 相似度，近重复事件丢弃/合并/减弱，节省反应的 LLM 调用
+EVENT_DEDUP_SETTINGS = {
+    'enabled': True,
+    'window': 50,                  # 参与比较的最近生成事件条数
+    'windowSeconds': 3600,         # 超过该时长的事件不再参与比较
+    'dropThreshold': 0.97,         # 相似度不低于该值直接丢弃
+    'mergeThreshold': 0.92,        # 视为重复：照常写入并标记 duplicateOf，只有原事件未覆盖的 agent 反应
+    'downweightThreshold': 0.85,   # 视为相似：impact 按比例减弱，反应人数受限
+    'downweightImpactScale': 0.5,
+    'downweightMaxReactors': 2
+}
+
+# 世界状态：进程内 agent 状态为唯一数据源，变更经 sink 异步写回
+WORLD_STATE_SETTINGS = {
+    'sink': 'supabase',            # supabase | null（不持久化，用于测试/压测）
+    'flushIntervalSeconds': 1.0,   # 脏 agent 最长等待多久写回
+    'maxBatch': 200,               # 单次 upsert 的最大行数
+    'maxPending': 10000
 }
 
 def _default_llm_prompts(agent):
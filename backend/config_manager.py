@@ -22,4 +22,64 @@ class ConfigManager:
 
     @classmethod
     def get_global_settings(cls):
-        return cls._config_module.GLOBAL_SETTINGS 
\ No newline at end of file
+        return cls._config_module.GLOBAL_SETTINGS
+
+    @classmethod
+    def get_llm_client_settings(cls):
+        return cls._config_module.LLM_CLIENT_SETTINGS
+
+    @classmethod
+    def get_embedding_settings(cls):
+        return cls._config_module.EMBEDDING_SETTINGS
+
+    @classmethod
+    def get_memory_settings(cls):
+        return cls._config_module.MEMORY_SETTINGS
+
+    @classmethod
+    def get_vector_index_settings(cls):
+        return cls._config_module.VECTOR_INDEX_SETTINGS
+
+    @classmethod
+    def get_memory_ranking_settings(cls):
+        return cls._config_module.MEMORY_RANKING_SETTINGS
+
+    @classmethod
+    def get_world_state_settings(cls):
+        return cls._config_module.WORLD_STATE_SETTINGS
+
+    @classmethod
+    def get_relationship_settings(cls):
+        return cls._config_module.RELATIONSHIP_SETTINGS
+
+    @classmethod
+    def get_spatial_settings(cls):
+        return cls._config_module.SPATIAL_SETTINGS
+
+    @classmethod
+    def get_agent_dynamics_settings(cls):
+        return cls._config_module.AGENT_DYNAMICS_SETTINGS
+
+    @classmethod
+    def get_event_pipeline_settings(cls):
+        return cls._config_module.EVENT_PIPELINE_SETTINGS
+
+    @classmethod
+    def get_recent_events_settings(cls):
+        return cls._config_module.RECENT_EVENTS_SETTINGS
+
+    @classmethod
+    def get_policy_registry_settings(cls):
+        return cls._config_module.POLICY_REGISTRY_SETTINGS
+
+    @classmethod
+    def get_event_lifetime_settings(cls):
+        return cls._config_module.EVENT_LIFETIME_SETTINGS
+
+    @classmethod
+    def get_event_cascade_settings(cls):
+        return cls._config_module.EVENT_CASCADE_SETTINGS
+
+    @classmethod
+    def get_event_dedup_settings(cls):
+        return cls._config_module.EVENT_DEDUP_SETTINGS
\ No newline at end of file
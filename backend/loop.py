@@ -1,18 +1,65 @@
-from backend.state import agents, events, simulation_status, stop_event
+from typing import Optional
+from backend.state import agents, events, stop_event
 from backend.models import Event, Memory
 import time
 from backend.services.event_service import EventService
 from backend.services.llm_service import LLMService
 from backend.services.agent_service import AgentService
+from backend.services.reaction_fanout import get_reaction_fanout
+from backend.services.agent_update_coalescer import AgentUpdateCoalescer
+from backend.services.relationship_graph import relationship_graph
+from backend.services.world_state import world_state
+from backend.services.agent_dynamics import AgentDynamics
+from backend.services.event_lifetime import event_lifetime
+from backend.services.event_cascade import EventCascade
+from backend.services.event_dedup import event_dedup
+from backend.services.simulation_clock import TickScheduler, simulation_clock, event_interval_seconds
+from backend.config_manager import ConfigManager
+
+# 当前运行中的调度器，供 PUT /api/simulation 运行时调整节奏
+current_scheduler: Optional[TickScheduler] = None
 
 def main_loop():
-    global simulation_status
+    global current_scheduler
     event_service = EventService()
     llm_service = LLMService()
     agent_service = AgentService()
-    def generate_and_persist_event_llm():
-        # 组装context，包含所有agent状态和当前时间
-        now = time.localtime()
+    reaction_fanout = get_reaction_fanout()
+    dynamics = AgentDynamics()
+    cascade = EventCascade(fanout=reaction_fanout)
+    global_settings = ConfigManager.get_global_settings()
+    step_seconds = ConfigManager.get_agent_dynamics_settings().get('stepSeconds', 300)
+    max_catch_up = global_settings.get('maxCatchUpTicks', 5)
+    pending_decisions = []
+    def step_dynamics(now_ms, elapsed_ms):
+        # 到点的事件生效，到期的事件撤销影响（堆顶比较，没有到期事件时不做任何工作）
+        event_lifetime.advance(now_ms)
+        # 全体 agent 的需求/属性演化是一次数组运算，按经过的模拟时间积分；只有跨越阈值的 agent 才按需决策，
+        # 决策冷却与写回间隔同样按模拟时间计算
+        now = now_ms / 1000
+        flagged = dynamics.step(min(elapsed_ms / 1000, max_catch_up * step_seconds), now=now)
+        due = dynamics.due_decisions(flagged, now=now)
+        pending_decisions.extend(due)
+        if pending_decisions:
+            scheduler.request('decisions')
+    def run_decisions(now_ms, elapsed_ms):
+        due = list(pending_decisions)
+        del pending_decisions[:len(due)]
+        if not due:
+            return
+        targets = world_state.get_agents([agent_id for agent_id, _ in due])
+        prompts = dict(due)
+        results = reaction_fanout.run(targets, lambda agent: llm_service.llm_decide(agent, dynamics.decision_prompt(prompts[agent.id])))
+        for result in results:
+            if result.timed_out:
+                print(f"Agent {result.item.id} 需求决策超时，已跳过")
+            elif result.error is not None:
+                print(f"Agent {result.item.id} 需求决策出错: {result.error}")
+    def generate_and_persist_event_llm(now_ms, elapsed_ms):
+        # 好感度按经过的模拟时间向 0 衰减（整矩阵一次运算）
+        relationship_graph.decay_elapsed(now=now_ms / 1000)
+        # 组装context，包含所有agent状态和当前模拟时间
+        now = time.localtime(now_ms / 1000)
         context = {
             "time": f"{now.tm_hour:02d}:{now.tm_min:02d}",
             "day": now.tm_mday,
@@ -28,17 +75,18 @@ def main_loop():
                     "traits": getattr(a, 'traits', None),
                     "attributes": getattr(a, 'attributes', None),
                     "relationships": getattr(a, 'relationships', None)
-                } for a in agents
+                } for a in world_state.get_agents()
             ]
         }
         # 1. 生成事件
-        event_obj = llm_service.generate_event_via_llm(context)
+        # 只生成不写库：去重判定之后再经事件流水线写入
+        event_obj = llm_service.generate_event_via_llm(context, persist=False)
         event = Event(
             id=event_obj.get('id', str(int(time.time() * 1000))),
             type=event_obj.get('type', 'LLM'),
             description=event_obj.get('description', ''),
             affectedAgents=event_obj.get('affectedAgents', event_obj.get('affected_agents', [])),
-            startTime=event_obj.get('start_time', int(time.time() * 1000)),
+            startTime=event_obj.get('start_time', now_ms),
             duration=event_obj.get('duration', 300000),
             impact=event_obj.get('impact', {}),
             meta=event_obj,
@@ -46,37 +94,50 @@ def main_loop():
             position=event_obj.get('position'),
             content=event_obj.get('content', None)
         )
-        event_service.add_event(event)
-        # 2. 让所有受影响的agent依次反馈
-        for agent_id in event.affectedAgents:
-            agent = next((a for a in agents if a.id == agent_id), None)
-            if agent:
-                prompt = event.description
-                try:
-                    llm_service.llm_decide(agent, prompt, event=event)
-                except Exception as e:
-                    print(f"Agent {agent_id} 反馈事件时出错: {e}")
-    # 启动时立即生成一次
-    if simulation_status == "running":
-        generate_and_persist_event_llm()
-    while not stop_event.is_set():
-        if simulation_status == "running":
-            time.sleep(60)  # 每分钟一次
-            generate_and_persist_event_llm()
-            for agent in agents:
-                if agent.id in event.affectedAgents:
-                    mem = Memory(
-                        id=f"{event.id}-{agent.id}",
-                        content=f"参与事件: {event.description}",
-                        timestamp=event.startTime,
-                        importance=2,
-                        type="EVENT",
-                        relatedAgents=event.affectedAgents,
-                        tags=[event.type.lower()]
-                    )
-                    agent.memories.append(mem)
-                    agent.attributes.mood += event.impact.get("mood", 0)
-                    agent.currentAction = f"响应事件 {event.id}"
-                    # 连锁事件等逻辑可继续补充
-        else:
-            time.sleep(1) 
\ No newline at end of file
+        # 与最近生成的事件做语义比较：近重复事件丢弃，或只让部分 agent 反应，节省反应的 LLM 调用
+        decision = event_dedup.check(event)
+        if not decision.persist:
+            print(f"[事件去重] 丢弃与 {decision.match_id} 近似重复的事件（相似度 {decision.similarity:.3f}）: {event.description}")
+            return
+        # 同步执行事件副作用，保证反馈前受影响 agent 已写入事件记忆
+        event_service.add_event(event, defer=False)
+        # 2. 受影响的agent并发反馈（有界并发 + 单agent超时），反馈中触发的事件按层级联，深度与数量受限
+        report = cascade.run(event, lambda agent, source, emit: llm_service.llm_decide(agent, source.description, event=source, emit=emit),
+                             reactors=decision.reactors)
+        if report.emitted or report.dropped:
+            print(f"[事件级联] {report.causal_id}: 触发 {report.emitted} 个事件，丢弃 {report.dropped} 个，共 {len(report.levels)} 层，耗时 {report.elapsed:.1f}s")
+        # 3. 按层、按affectedAgents顺序确定性地回写共享状态，本 tick 的字段补丁合并为每个 agent 一次写入
+        updates = AgentUpdateCoalescer(agent_service)
+        for result in report.results():
+            agent, source = result.item
+            if result.timed_out:
+                print(f"Agent {agent.id} 反馈事件 {source.id} 超时，已跳过")
+            elif result.error is not None:
+                print(f"Agent {agent.id} 反馈事件 {source.id} 时出错: {result.error}")
+            mem = Memory(
+                id=f"{source.id}-{agent.id}",
+                agent_id=agent.id,
+                content=f"参与事件: {source.description}",
+                timestamp=source.startTime,
+                importance=2,
+                type="EVENT",
+                relatedAgents=source.affectedAgents,
+                tags=[source.type.lower()]
+            )
+            agent.memories.append(mem)
+            # 事件 impact（如 mood）已在 add_event 中合并写入，这里只更新当前行动
+            updates.set_field(agent.id, "currentAction", f"响应事件 {source.id}")
+        updates.flush()
+    # 各子系统按模拟时间调度：演化每 tick 一次；Titan 事件按 eventFrequency（启动时立即生成一次）；
+    # 需求决策按需运行。调用 LLM 的子系统在后台线程执行，不拖住演化
+    scheduler = TickScheduler(simulation_clock, max_catch_up=max_catch_up)
+    scheduler.add('dynamics', step_dynamics, step_seconds)
+    scheduler.add('events', generate_and_persist_event_llm, event_interval_seconds(global_settings.get('eventFrequency', 1.0)),
+                  background=True, run_immediately=True)
+    scheduler.add('decisions', run_decisions, background=True)
+    current_scheduler = scheduler
+    try:
+        scheduler.run(stop_event)
+    finally:
+        if current_scheduler is scheduler:
+            current_scheduler = None
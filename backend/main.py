@@ -15,12 +15,20 @@ from backend.routers.simulation import router as simulation_router
 from backend.routers.llm import router as llm_router
 from backend.routers.log import router as log_router
 from backend.routers.websocket import router as websocket_router
-from backend.state import agents, events, simulation_status, simulation_thread, stop_event
+from backend.state import agents, events, stop_event
 from backend.loop import main_loop
 from backend.config_manager import ConfigManager
 from backend.services.llm_service import LLMService
+from backend.services.llm_client import reset_llm_clients
 from backend.routers.memory import router as memory_router
 from backend.services.supabase_client import supabase
+from backend.services.vector_index import warm_load_vector_indexes
+from backend.services.agent_event_index import warm_load_agent_event_index
+from backend.services.memory_consolidation import start_consolidation_worker
+from backend.services.memory_service import memory_write_buffer
+from backend.services.event_service import EventService, event_pipeline
+from backend.services.world_state import world_state
+from backend.services.relationship_graph import relationship_graph
 
 app = FastAPI()
 
@@ -117,72 +125,6 @@ async def websocket_agent(websocket: WebSocket, agent_id: str):
     except WebSocketDisconnect:
         ws_agent_manager.disconnect(agent_id, websocket)
 
-# ========== Simulation 控制 ========== #
-@app.get("/api/simulation")
-def get_simulation_status():
-    return ResponseModel(
-        data={
-            "status": simulation_status,
-            "agents": [a.dict() for a in agents],
-            "events": [e.dict() for e in events],
-        }
-    )
-
-@app.post("/api/simulation")
-def control_simulation(action: str = Query(...)):
-    global simulation_status, simulation_thread, stop_event
-    if action == 'start':
-        if simulation_status != "running":
-            simulation_status = "running"
-            stop_event.clear()
-            if simulation_thread is None or not simulation_thread.is_alive():
-                simulation_thread = threading.Thread(target=main_loop, daemon=True)
-                simulation_thread.start()
-        return ResponseModel(data={"status": "running"})
-    elif action == 'pause':
-        simulation_status = "paused"
-        return ResponseModel(data={"status": "paused"})
-    elif action == 'reset':
-        simulation_status = "idle"
-        stop_event.set()
-        events.clear()
-        return ResponseModel(data={"status": "idle"})
-    else:
-        raise HTTPException(status_code=400, detail="无效的操作")
-
-@app.put("/api/simulation")
-def update_simulation_settings(settings: SimulationSettings = Body(...)):
-    # TODO: 更新设置逻辑
-    return ResponseModel(data={"settings": settings.dict()})
-
-# ========== Event 增删查 ========== #
-@app.get("/api/event")
-def get_events(type: Optional[str] = None, limit: Optional[int] = None, offset: int = 0):
-    filtered = events
-    if type:
-        filtered = [e for e in events if e.type == type]
-    if offset or limit:
-        filtered = filtered[offset:offset+limit if limit else None]
-    return ResponseModel(data=[e.dict() for e in filtered])
-
-@app.post("/api/event")
-def add_event(event: Event):
-    events.append(event)
-    return ResponseModel(data=event.dict())
-
-@app.delete("/api/event/{event_id}")
-def delete_event(event_id: str):
-    global events
-    events = [e for e in events if e.id != event_id]
-    return ResponseModel(data={"success": True, "message": f"事件已删除: {event_id}"})
-
-# ========== Agent 日志 ========== #
-@app.get("/api/agents/log")
-def get_agent_log(id: str):
-    agent_events = [e for e in events if id in e.affectedAgents]
-    agent_events.sort(key=lambda e: e.startTime)
-    return ResponseModel(data=[e.dict() for e in agent_events])
-
 @app.post("/api/agent/{agent_id}/llm_decide")
 def agent_llm_decide(agent_id: str, req: LLMDecideRequest):
     agent = next((a for a in agents if a.id == agent_id), None)
@@ -199,10 +141,12 @@ def agent_llm_decide(agent_id: str, req: LLMDecideRequest):
 @app.post("/api/reload_config")
 def reload_config():
     ConfigManager.reload()
+    # 连接池参数可能变化，丢弃旧客户端
+    reset_llm_clients()
     # 重新加载 agents（如需热更新 agent 实例，可在此处实现）
-    global agents
-    agents.clear()
-    agents.extend([Agent(**a) for a in ConfigManager.get_agent_presets()])
+    world_state.replace_all([Agent(**a) for a in ConfigManager.get_agent_presets()])
+    world_state.hydrate()
+    relationship_graph.load_from_agents(world_state.agents)
     return {"status": "reloaded"}
 
 def init_default_agents():
@@ -236,4 +180,31 @@ app.include_router(websocket_router)
 app.include_router(memory_router)
 
 # FastAPI app初始化后调用
-init_default_agents() 
\ No newline at end of file
+init_default_agents()
+# 用数据库中已持久化的状态覆盖预设，此后 agent 读写都走进程内世界状态
+world_state.hydrate()
+# 关系图：优先加载二进制快照（含互动次数），否则由 agent 的好感度初始化
+relationship_snapshot = ConfigManager.get_relationship_settings().get('snapshotPath')
+if not (relationship_snapshot and relationship_graph.load(relationship_snapshot)):
+    relationship_graph.load_from_agents(world_state.agents)
+# 最近事件环形缓冲：同步预热一次，之后 GET /api/event 的常见请求不再查库
+EventService().warm_load_recent_events()
+# 政策登记表：加载最近的政策，prompt 不再扫描事件历史
+EventService().warm_load_policies()
+# 后台预热内存向量索引，预热完成前检索仍走数据库
+threading.Thread(target=warm_load_vector_indexes, daemon=True).start()
+# 后台建立 agent → 事件倒排索引，完成前 agent 时间线仍查数据库
+threading.Thread(target=warm_load_agent_event_index, daemon=True).start()
+# 后台记忆整合，限制每个 agent 的记忆规模
+consolidation_stop_event = threading.Event()
+start_consolidation_worker(consolidation_stop_event)
+
+@app.on_event("shutdown")
+def on_shutdown():
+    consolidation_stop_event.set()
+    # 先处理完已受理的事件（会产生记忆与 agent 写入），再刷写各写后缓冲
+    event_pipeline.close()
+    memory_write_buffer.close()
+    world_state.close()
+    if relationship_snapshot:
+        relationship_graph.save(relationship_snapshot) 
\ No newline at end of file
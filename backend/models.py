@@ -1,6 +1,11 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-import time
+
+
+def _sim_now_ms() -> int:
+    # 未指定 startTime 的事件按模拟时钟打时间戳，与事件生命周期调度同一时间基准；延迟导入避免模型层依赖服务层的导入顺序
+    from backend.services.simulation_clock import simulation_clock
+    return simulation_clock.now_ms()
 
 class AgentAttributes(BaseModel):
     energy: int = 100
@@ -38,18 +43,20 @@ class Agent(BaseModel):
     needs: Optional[Dict[str, int]] = None
     attributes: AgentAttributes = Field(default_factory=AgentAttributes)
     memories: List[Memory] = Field(default_factory=list)
-    relationships: Dict[str, Relationship] = Field(default_factory=dict)
     llmPrompts: Optional[dict] = None
     embedding: Optional[List[float]] = None
     emotion: Optional[str] = "平静"
-    relationships: Optional[Dict[str, float]] = {}
+    relationships: Optional[Dict[str, float]] = {}  # 对其他 agent 的好感度，互动次数等见 relationship_graph
+    role: Optional[str] = None
+    income: Optional[int] = None
+    sensitivity: Optional[Dict[str, float]] = None  # 政策敏感度，如 {"medical_tax": 0.8}
 
 class Event(BaseModel):
     id: str
     type: str
     description: str
     affectedAgents: List[str] = Field(default_factory=list, alias="affected_agents")
-    startTime: int = Field(default_factory=lambda: int(time.time() * 1000), alias="start_time")
+    startTime: int = Field(default_factory=_sim_now_ms, alias="start_time")
     duration: int
     impact: Dict[str, Any] = Field(default_factory=dict)
     meta: Optional[dict] = None
@@ -60,14 +67,20 @@ class Event(BaseModel):
     content: Optional[str] = None
     embedding: Optional[List[float]] = None
 
+    class Config:
+        # 驼峰字段名与数据库别名（affected_agents/start_time）都可用于构造
+        populate_by_name = True
+
 class ResponseModel(BaseModel):
     code: int = 0
     msg: str = "success"
     data: Any = None
 
 class SimulationSettings(BaseModel):
-    speed: Optional[int] = None
+    speed: Optional[float] = None           # 兼容旧字段，等同 timeScale
     environment: Optional[str] = None
+    timeScale: Optional[float] = None
+    eventFrequency: Optional[float] = None  # 每模拟小时生成的 Titan 事件数
 
 class AgentUpdateModel(BaseModel):
     name: Optional[str] = None
@@ -81,7 +94,7 @@ class AgentUpdateModel(BaseModel):
     needs: Optional[Dict[str, int]] = None
     attributes: Optional[AgentAttributes] = None
     memories: Optional[List[Memory]] = None
-    relationships: Optional[Dict[str, Relationship]] = None
+    relationships: Optional[Dict[str, float]] = None
 
 class EventQuery(BaseModel):
     type: Optional[str] = None
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Body, HTTPException, Depends
-from typing import List
+from typing import List, Optional
 from backend.models import Agent, ResponseModel, AgentUpdateModel
 from backend.services.agent_service import AgentService
+from backend.services.agent_update_coalescer import get_update_counters
+from backend.services.world_state import world_state
 from backend.state import agents
 
 router = APIRouter()
@@ -13,6 +15,26 @@ def get_agent_service():
 def get_agents(service: AgentService = Depends(get_agent_service)):
     return ResponseModel(data=[a.dict() for a in service.get_agents()])
 
+@router.get("/api/agent/update_stats")
+def get_agent_update_stats():
+    # 收到的补丁数与实际写入数，用于观察合并效果
+    return ResponseModel(data=get_update_counters())
+
+@router.get("/api/agent/{agent_id}/nearby")
+def get_nearby_agents(agent_id: str, radius: Optional[float] = None, k: Optional[int] = None):
+    """
+    附近的 agent：给定 radius 时返回半径内的（可用 k 截断），否则返回最近的 k 个（默认 5）。
+    """
+    agent = world_state.get_agent(agent_id)
+    if agent is None:
+        raise HTTPException(status_code=404, detail="Agent不存在")
+    x, y = agent.position.get('x', 0), agent.position.get('y', 0)
+    if radius is not None:
+        hits = world_state.spatial.query_radius(x, y, radius, exclude=agent_id, limit=k)
+    else:
+        hits = world_state.spatial.nearest(x, y, k or 5, exclude=agent_id)
+    return ResponseModel(data=[{"id": a, "distance": round(d, 2)} for a, d in hits])
+
 @router.post("/api/agent")
 def add_agent(agent: Agent, service: AgentService = Depends(get_agent_service)):
     service.add_agent(agent)
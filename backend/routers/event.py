@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, Body
 from typing import Optional, Any
 from backend.models import Event, ResponseModel
-from backend.services.event_service import EventService
+from backend.services.event_service import EventService, event_pipeline
+from backend.services.event_pipeline import PipelineFull
+from backend.services.recent_events import recent_events
+from backend.services.policy_registry import policy_registry
+from backend.services.event_lifetime import event_lifetime
+from backend.services.event_dedup import event_dedup
 from backend.services.llm_service import LLMService
-from backend.state import events
-import time
 from backend.services.supabase_client import supabase
 import os
 
@@ -15,72 +18,42 @@ def get_event_service():
 
 @router.get("/api/event")
 def get_events(type: Optional[str] = None, limit: Optional[int] = None, offset: int = 0, service: EventService = Depends(get_event_service)):
-    # 日志
-    print(f"API事件查询请求: type={type}, limit={limit}, offset={offset}")
-    
-    # 获取事件数据
-    events = service.get_events(type, limit, offset)
-    print(f"从服务层获取到{len(events)}个事件")
-    
-    events_dict_list = []
-    
-    # 处理数据并转换字段名
-    for e in events:
-        try:
-            event_dict = e.dict(exclude_none=True)  # 排除None值
-            
-            # 字段名转换：下划线转为驼峰（后端→前端）
-            field_mapping = {
-                'affected_agents': 'affectedAgents',
-                'start_time': 'startTime',
-                'created_at': 'createdAt',
-                'from_agent': 'fromAgent',
-                'to_agent': 'toAgent'
-            }
-            
-            for old_key, new_key in field_mapping.items():
-                if old_key in event_dict:
-                    event_dict[new_key] = event_dict.pop(old_key)
-            
-            # 确保created_at/createdAt字段存在
-            if 'createdAt' not in event_dict or not event_dict['createdAt']:
-                event_dict['createdAt'] = time.strftime('%Y-%m-%d %H:%M:%S', 
-                                                         time.localtime(event_dict.get('startTime', int(time.time()))/1000))
-            
-            # 可选：移除不需要的字段
-            if 'embedding' in event_dict:
-                del event_dict['embedding']  # 向量字段太大，前端不需要
-            
-            events_dict_list.append(event_dict)
-        except Exception as ex:
-            print(f"处理事件数据失败: {ex}")
-            # 尝试最小化处理
-            try:
-                minimal_dict = {
-                    'id': e.id if hasattr(e, 'id') else f"error-{time.time()}",
-                    'type': e.type if hasattr(e, 'type') else 'UNKNOWN',
-                    'description': e.description if hasattr(e, 'description') else '事件数据异常',
-                    'affectedAgents': [],
-                    'startTime': int(time.time() * 1000),
-                    'duration': 60000,
-                    'createdAt': time.strftime('%Y-%m-%d %H:%M:%S')
-                }
-                events_dict_list.append(minimal_dict)
-            except:
-                pass  # 如果连最小化处理都失败，就跳过
-    
-    # 将结果输出到控制台供调试
-    print(f"API返回{len(events_dict_list)}个事件")
-    if events_dict_list:
-        print(f"第一个事件数据示例: {events_dict_list[0]}")
-    
-    return ResponseModel(data=events_dict_list)
+    # 最近事件由内存环形缓冲直接回答（已是驼峰格式），深度历史才查数据库
+    return ResponseModel(data=service.get_events(type, limit, offset))
+
+@router.get("/api/event/recent_stats")
+def get_recent_event_stats():
+    return ResponseModel(data=recent_events.stats())
 
 @router.post("/api/event")
 def add_event(event: Event, service: EventService = Depends(get_event_service)):
-    service.add_event(event)
+    # 只受理入队，写库、embedding、记忆与关系等副作用由事件流水线异步完成
+    try:
+        service.add_event(event)
+    except PipelineFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return ResponseModel(data=event.dict())
 
+@router.get("/api/event/pipeline")
+def get_event_pipeline_stats():
+    # 各阶段队列深度、吞吐、重试/失败次数与延迟分位数
+    return ResponseModel(data=event_pipeline.stats())
+
+@router.get("/api/event/policies")
+def get_policies(limit: int = 10, active_only: bool = True):
+    # 最近发布的政策（旧→新），已解析出类型/目标/影响/到期时间
+    return ResponseModel(data=[p._asdict() for p in policy_registry.recent(limit, active_only)])
+
+@router.get("/api/event/lifetimes")
+def get_event_lifetime_stats():
+    # 生效中/待生效的事件数、堆大小、下一个到点时间与累计激活/到期/取消次数
+    return ResponseModel(data=event_lifetime.stats())
+
+@router.get("/api/event/dedup")
+def get_event_dedup_stats():
+    # 生成事件近重复抑制：保留/减弱/合并/丢弃次数、抑制率与节省的反应调用数
+    return ResponseModel(data=event_dedup.stats())
+
 @router.delete("/api/event/{event_id}")
 def delete_event(event_id: str, service: EventService = Depends(get_event_service)):
     success = service.delete_event(event_id)
@@ -88,30 +61,20 @@ def delete_event(event_id: str, service: EventService = Depends(get_event_servic
 
 # 新增：LLM生成事件接口
 @router.post("/api/event/llm_generate")
-def llm_generate_event(context: Any = Body(...)):
+def llm_generate_event(context: Any = Body(...), service: EventService = Depends(get_event_service)):
     """
     context: dict，建议包含 time, day, hour, agents 等
     """
     try:
-        event_obj = LLMService().generate_event_via_llm(context)
+        # 只生成不写库，和 POST /api/event 一样交给事件流水线，最近事件缓冲、agent 时间线与扇出才能看到它
+        event_obj = LLMService().generate_event_via_llm(context, persist=False)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM事件生成失败: {e}")
-    # 自动补全事件字段
-    event = Event(
-        id=str(int(time.time() * 1000)),
-        type=event_obj.get('type', 'LLM'),
-        description=event_obj.get('description', ''),
-        affectedAgents=event_obj.get('affectedAgents', []),
-        startTime=int(time.time() * 1000),
-        duration=event_obj.get('duration', 300000),
-        impact=event_obj.get('impact', {}),
-        meta=event_obj,
-        scope=event_obj.get('scope'),
-        position=event_obj.get('position'),
-        content=event_obj.get('content', None),
-        created_at=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
-    )
-    events.append(event)
+    event = Event(**event_obj)
+    try:
+        service.add_event(event)
+    except PipelineFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     return ResponseModel(data=event.dict())
 
 @router.post("/api/event/search_by_vector")
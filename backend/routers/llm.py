@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Body
 from backend.models import LLMDecideRequest, ResponseModel, Memory
 from backend.services.llm_service import LLMService
-from backend.state import agents
+from backend.services.world_state import world_state
+from backend.services.embedding_cache import embedding_cache
 
 router = APIRouter()
 
@@ -11,7 +12,7 @@ def get_llm_service():
 @router.post("/api/agent/{agent_id}/llm_decide")
 def agent_llm_decide(agent_id: str, req: LLMDecideRequest, service: LLMService = Depends(get_llm_service)):
     prompt = req.prompt
-    agent = next((a for a in agents if a.id == agent_id), None)
+    agent = world_state.get_agent(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent不存在")
     try:
@@ -28,4 +29,8 @@ def get_embedding_api(payload: dict = Body(...)):
     if not text:
         raise HTTPException(status_code=400, detail="text字段缺失")
     embedding = LLMService().get_embedding(text)
-    return ResponseModel(data={"embedding": embedding}) 
\ No newline at end of file
+    return ResponseModel(data={"embedding": embedding}) 
+
+@router.get("/api/llm/embedding/cache")
+def get_embedding_cache_stats():
+    return ResponseModel(data=embedding_cache.stats())
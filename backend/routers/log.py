@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
 from backend.models import ResponseModel
 from backend.services.log_service import LogService
 
@@ -8,6 +9,9 @@ def get_log_service():
     return LogService()
 
 @router.get("/api/agents/log")
-def get_agent_log(id: str, service: LogService = Depends(get_log_service)):
-    agent_events = service.get_agent_log(id)
-    return ResponseModel(data=[e.dict() for e in agent_events]) 
\ No newline at end of file
+def get_agent_log(id: str, limit: int = 50, cursor: Optional[str] = None, order: str = 'asc', service: LogService = Depends(get_log_service)):
+    # 键集分页：把返回的 nextCursor 作为下一页的 cursor
+    try:
+        return ResponseModel(data=service.get_agent_log(id, min(max(1, limit), 500), cursor, order))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import List, Optional
 from backend.models import Memory, ResponseModel
-from backend.services.memory_service import MemoryService
+from backend.services.memory_service import MemoryService, memory_write_buffer
+from backend.services.memory_consolidation import MemoryConsolidationService
 
 router = APIRouter()
 
@@ -27,12 +28,33 @@ def delete_memory(memory_id: str, service: MemoryService = Depends(get_memory_se
 
 @router.post("/api/memory/search_by_vector")
 def search_memories_by_vector(
-    query: dict,  # 期望格式：{"embedding": [...], "top_k": 5}
+    query: dict,  # 期望格式：{"embedding": [...], "top_k": 5}，可选 agent_id 及 types/min_importance/max_importance/since/until/tags 过滤
     service: MemoryService = Depends(get_memory_service)
 ):
     embedding = query.get("embedding")
     top_k = query.get("top_k", 5)
     if not embedding or not isinstance(embedding, list):
         raise HTTPException(status_code=400, detail="embedding字段缺失或格式错误")
-    memories = service.search_memories_by_embedding(embedding, top_k)
-    return ResponseModel(data=[m.dict() for m in memories]) 
\ No newline at end of file
+    agent_id = query.get("agent_id")
+    if agent_id:
+        filters = {k: query.get(k) for k in ("types", "min_importance", "max_importance", "since", "until", "tags")}
+        memories = service.search_agent_memories(agent_id, embedding, top_k, **filters)
+    else:
+        memories = service.search_memories_by_embedding(embedding, top_k)
+    return ResponseModel(data=[m.dict() for m in memories])
+
+@router.post("/api/memory/consolidate")
+def consolidate_memories(agent_id: Optional[str] = None):
+    service = MemoryConsolidationService()
+    if agent_id:
+        return ResponseModel(data=service.consolidate_agent(agent_id))
+    return ResponseModel(data=service.consolidate_all())
+
+
+@router.get("/api/memory/write_buffer")
+def get_write_buffer_stats():
+    return ResponseModel(data=memory_write_buffer.stats())
+
+@router.post("/api/memory/flush")
+def flush_memories(service: MemoryService = Depends(get_memory_service)):
+    return ResponseModel(data={"flushed": service.flush_pending()})
@@ -21,4 +21,7 @@ def control_simulation(action: str = Query(...), service: SimulationService = De
 
 @router.put("/api/simulation")
 def update_simulation_settings(settings: SimulationSettings = Body(...), service: SimulationService = Depends(get_simulation_service)):
-    return ResponseModel(data=service.update_settings(settings.dict())) 
\ No newline at end of file
+    try:
+        return ResponseModel(data=service.update_settings(settings.dict()))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
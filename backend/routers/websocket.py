@@ -1,6 +1,8 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from backend.services.websocket_service import ConnectionManager, EventWSManager, AgentWSManager
-from backend.state import events, agents, simulation_status
+from backend.state import events
+from backend.services.simulation_clock import simulation_clock
+from backend.services.world_state import world_state
 
 router = APIRouter()
 
@@ -23,7 +25,7 @@ async def websocket_events(websocket: WebSocket):
 async def websocket_agent(websocket: WebSocket, agent_id: str):
     await ws_agent_manager.connect(agent_id, websocket)
     try:
-        agent = next((a for a in agents if a.id == agent_id), None)
+        agent = world_state.get_agent(agent_id)
         if agent:
             await websocket.send_json({"agent": agent.dict()})
         while True:
@@ -36,8 +38,8 @@ async def websocket_simulation(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         await websocket.send_json({
-            "status": simulation_status,
-            "agents": [a.dict() for a in agents],
+            "status": simulation_clock.status,
+            "agents": [a.dict() for a in world_state.get_agents()],
             "events": [e.dict() for e in events],
         })
         while True:
@@ -0,0 +1,311 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+
+ATTRIBUTE_COLUMNS = ('energy', 'mood', 'sociability')
+ATTRIBUTE_RANGE = (0.0, 100.0)
+# 列式核心覆盖的 Agent 字段
+ROW_FIELDS = ('position', 'attributes', 'state', 'income', 'needs', 'sensitivity')
+
+
+class AgentArrays:
+    """
+    列式 agent 核心：按槽位存放位置、属性、需求、收入、政策敏感度和状态码的 NumPy 数组。
+    整 tick 的批量运算（事件影响、统计汇总等）直接作用在数组上，
+    pydantic Agent 只是视图：被批量运算改过的行标记为 dirty，读取时再写回对象。
+    需求与敏感度的键按首次出现动态分配列，缺失值为 NaN。
+    """
+
+    def __init__(self, capacity: int = 64, need_keys: Iterable[str] = (), tax_keys: Iterable[str] = ()):
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.energy = np.zeros(capacity, dtype=np.float32)
+        self.mood = np.zeros(capacity, dtype=np.float32)
+        self.sociability = np.zeros(capacity, dtype=np.float32)
+        self.income = np.full(capacity, np.nan, dtype=np.float32)
+        self.state_code = np.zeros(capacity, dtype=np.uint8)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.needs = np.full((capacity, 0), np.nan, dtype=np.float32)
+        self.sensitivity = np.full((capacity, 0), np.nan, dtype=np.float32)
+        self.need_keys: Dict[str, int] = {}
+        self.tax_keys: Dict[str, int] = {}
+        self.state_names: List[str] = []
+        self._state_codes: Dict[str, int] = {}
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = [None] * capacity
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        self._lock = threading.RLock()
+        for key in need_keys:
+            self._column('needs', key)
+        for key in tax_keys:
+            self._column('sensitivity', key)
+
+    # ---- 槽位与列 ----
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def capacity(self) -> int:
+        return self.x.shape[0]
+
+    def _grow(self):
+        old = self.capacity
+        new = old * 2
+        for name in ('x', 'y', 'energy', 'mood', 'sociability', 'income', 'state_code', 'alive', 'dirty', 'needs', 'sensitivity'):
+            column = getattr(self, name)
+            fill = np.nan if name in ('income', 'needs', 'sensitivity') else 0
+            grown = np.full((new,) + column.shape[1:], fill, dtype=column.dtype)
+            grown[:old] = column
+            setattr(self, name, grown)
+        self._ids.extend([None] * (new - old))
+        self._free = list(range(new - 1, old - 1, -1)) + self._free
+
+    def _column(self, matrix_name: str, key: str) -> int:
+        keys = self.need_keys if matrix_name == 'needs' else self.tax_keys
+        index = keys.get(key)
+        if index is None:
+            matrix = getattr(self, matrix_name)
+            extra = np.full((matrix.shape[0], 1), np.nan, dtype=np.float32)
+            setattr(self, matrix_name, np.hstack([matrix, extra]))
+            index = keys[key] = matrix.shape[1]
+        return index
+
+    def _state_code(self, state: str) -> int:
+        code = self._state_codes.get(state)
+        if code is None:
+            if len(self.state_names) >= 255:
+                raise ValueError("状态种类超过 255 个")
+            code = self._state_codes[state] = len(self.state_names)
+            self.state_names.append(state)
+        return code
+
+    def slot(self, agent_id: str) -> int:
+        with self._lock:
+            slot = self._slots.get(agent_id)
+            if slot is None:
+                if not self._free:
+                    self._grow()
+                slot = self._free.pop()
+                self._slots[agent_id] = slot
+                self._ids[slot] = agent_id
+                self.alive[slot] = True
+            return slot
+
+    def slots_of(self, agent_ids: Iterable[str]) -> np.ndarray:
+        slots = self._slots
+        return np.array([slots[a] for a in agent_ids if a in slots], dtype=np.intp)
+
+    def ids_of(self, slots: Iterable[int]) -> List[str]:
+        return [self._ids[i] for i in slots if self._ids[i] is not None]
+
+    def remove(self, agent_id: str):
+        with self._lock:
+            slot = self._slots.pop(agent_id, None)
+            if slot is None:
+                return
+            self._ids[slot] = None
+            self.alive[slot] = False
+            self.dirty[slot] = False
+            self.income[slot] = np.nan
+            self.needs[slot] = np.nan
+            self.sensitivity[slot] = np.nan
+            self._free.append(slot)
+
+    def clear(self):
+        with self._lock:
+            for agent_id in list(self._slots):
+                self.remove(agent_id)
+
+    # ---- 与 pydantic 视图互转 ----
+    def load(self, agent):
+        """
+        用 Agent 对象覆盖该行（对象是最新的，行不再 dirty）。
+        """
+        with self._lock:
+            self.load_fields(agent, ROW_FIELDS)
+            self.dirty[self._slots[agent.id]] = False
+
+    def load_fields(self, agent, fields: Iterable[str]):
+        """
+        只用 Agent 对象中指定字段覆盖该行对应的列，其余列（可能已被批量运算修改）保持不变，dirty 标记不变。
+        """
+        fields = set(fields)
+        with self._lock:
+            i = self.slot(agent.id)
+            if 'position' in fields:
+                pos = agent.position or {}
+                self.x[i], self.y[i] = pos.get('x', 0), pos.get('y', 0)
+            if 'attributes' in fields:
+                attrs = agent.attributes
+                self.energy[i], self.mood[i], self.sociability[i] = attrs.energy, attrs.mood, attrs.sociability
+            if 'state' in fields:
+                self.state_code[i] = self._state_code(agent.state)
+            if 'income' in fields:
+                self.income[i] = agent.income if getattr(agent, 'income', None) is not None else np.nan
+            if 'needs' in fields:
+                self.needs[i] = np.nan
+                for key, value in (agent.needs or {}).items():
+                    column = self._column('needs', key)
+                    self.needs[i, column] = value
+            if 'sensitivity' in fields:
+                self.sensitivity[i] = np.nan
+                for key, value in (getattr(agent, 'sensitivity', None) or {}).items():
+                    column = self._column('sensitivity', key)
+                    self.sensitivity[i, column] = value
+
+    def load_all(self, agents: Iterable):
+        with self._lock:
+            self.clear()
+            for agent in agents:
+                self.load(agent)
+
+    def write_view(self, agent):
+        """
+        把数组中的位置、属性、需求写回 Agent 对象（不做 pydantic 校验，值已在数组侧约束）。
+        与批量运算互斥，读取与清除 dirty 之间不会丢失并发的修改。
+        """
+        with self._lock:
+            self._write_view(agent)
+
+    def _write_view(self, agent):
+        i = self._slots.get(agent.id)
+        if i is None:
+            return
+        agent.position = {**(agent.position or {}), 'x': int(round(float(self.x[i]))), 'y': int(round(float(self.y[i])))}
+        attrs = agent.attributes
+        attrs.energy = int(round(float(self.energy[i])))
+        attrs.mood = int(round(float(self.mood[i])))
+        attrs.sociability = int(round(float(self.sociability[i])))
+        if self.need_keys:
+            row = self.needs[i]
+            needs = {key: int(round(float(row[c]))) for key, c in self.need_keys.items() if not np.isnan(row[c])}
+            agent.needs = needs or agent.needs
+        self.dirty[i] = False
+
+    def is_dirty(self, agent_id: str) -> bool:
+        i = self._slots.get(agent_id)
+        return i is not None and bool(self.dirty[i])
+
+    def dirty_ids(self) -> List[str]:
+        return self.ids_of(np.flatnonzero(self.dirty))
+
+    # ---- 批量运算 ----
+    def add_attributes(self, agent_ids: Optional[Iterable[str]], deltas: Dict[str, float]) -> np.ndarray:
+        """
+        对一组 agent（None 表示全体）的属性加增量并截断到 0~100，返回被修改的槽位。
+        """
+        with self._lock:
+            slots = np.flatnonzero(self.alive) if agent_ids is None else self.slots_of(agent_ids)
+            if len(slots) == 0:
+                return slots
+            low, high = ATTRIBUTE_RANGE
+            changed = False
+            for key, delta in deltas.items():
+                if key not in ATTRIBUTE_COLUMNS or not delta:
+                    continue
+                column = getattr(self, key)
+                # 同一 agent 在 ids 中出现多次时按次数累加
+                np.add.at(column, slots, np.float32(delta))
+                column[slots] = np.clip(column[slots], low, high)
+                changed = True
+            if changed:
+                self.dirty[slots] = True
+            return slots if changed else slots[:0]
+
+    def add_needs(self, agent_ids: Optional[Iterable[str]], deltas: Dict[str, float]) -> np.ndarray:
+        """
+        对需求加增量并截断到 0~100（没有该需求的 agent 保持 NaN），返回被修改的槽位。
+        """
+        with self._lock:
+            slots = np.flatnonzero(self.alive) if agent_ids is None else self.slots_of(agent_ids)
+            if len(slots) == 0:
+                return slots
+            low, high = ATTRIBUTE_RANGE
+            for key, delta in deltas.items():
+                column = self.need_keys.get(key)
+                if column is None or not delta:
+                    continue
+                values = self.needs[slots, column] + np.float32(delta)
+                self.needs[slots, column] = np.clip(values, low, high)
+            self.dirty[slots] = True
+            return slots
+
+    def add_rows(self, slots: np.ndarray, attribute_deltas: Optional[np.ndarray] = None,
+                 need_deltas: Optional[np.ndarray] = None):
+        """
+        按行加增量矩阵：attribute_deltas 形状 (len(slots), 3)，列顺序同 ATTRIBUTE_COLUMNS；
+        need_deltas 形状 (len(slots), 需求列数)。结果截断到 0~100，缺失的需求保持 NaN。
+        """
+        if len(slots) == 0:
+            return
+        low, high = ATTRIBUTE_RANGE
+        with self._lock:
+            if attribute_deltas is not None:
+                for c, key in enumerate(ATTRIBUTE_COLUMNS):
+                    column = getattr(self, key)
+                    column[slots] = np.clip(column[slots] + attribute_deltas[:, c], low, high)
+            if need_deltas is not None and self.needs.shape[1]:
+                self.needs[slots] = np.clip(self.needs[slots] + need_deltas, low, high)
+            self.dirty[slots] = True
+
+    def attribute_rows(self, slots: np.ndarray) -> np.ndarray:
+        """
+        取若干行的属性矩阵 (len(slots), 3)，列顺序同 ATTRIBUTE_COLUMNS。
+        """
+        with self._lock:
+            return np.stack([getattr(self, key)[slots] for key in ATTRIBUTE_COLUMNS], axis=1)
+
+    def add_attribute_rows(self, agent_ids: Sequence[str], attribute_deltas: np.ndarray) -> List[str]:
+        """
+        按 agent id 逐行加属性增量：同一 agent 的多行先累加，已移除的 agent 跳过，返回被修改的 agent id。
+        """
+        with self._lock:
+            index: Dict[int, int] = {}
+            targets, sources = [], []
+            for i, agent_id in enumerate(agent_ids):
+                slot = self._slots.get(agent_id)
+                if slot is None:
+                    continue
+                targets.append(index.setdefault(slot, len(index)))
+                sources.append(i)
+            if not index:
+                return []
+            total = np.zeros((len(index), len(ATTRIBUTE_COLUMNS)), dtype=np.float32)
+            np.add.at(total, targets, attribute_deltas[sources])
+            slots = np.fromiter(index.keys(), dtype=np.intp, count=len(index))
+            self.add_rows(slots, total)
+            return self.ids_of(slots)
+
+    def economy_summary(self) -> dict:
+        """
+        全镇经济总览：人口、收入均值/中位数、属性均值、各税种平均敏感度（全部向量化）。
+        """
+        with self._lock:
+            alive = self.alive
+            population = int(alive.sum())
+            if population == 0:
+                return {"population": 0}
+            income = self.income[alive]
+            known = income[~np.isnan(income)]
+            summary = {
+                "population": population,
+                "avgIncome": int(known.mean()) if len(known) else 0,
+                "medianIncome": int(np.median(known)) if len(known) else 0,
+                "avgEnergy": round(float(self.energy[alive].mean()), 1),
+                "avgMood": round(float(self.mood[alive].mean()), 1),
+                "lowMood": int((self.mood[alive] < 30).sum()),
+            }
+            if self.tax_keys:
+                sens = self.sensitivity[alive]
+                summary["sensitivity"] = {
+                    key: round(float(np.nanmean(sens[:, c])), 2)
+                    for key, c in self.tax_keys.items() if not np.all(np.isnan(sens[:, c]))
+                }
+            states = np.bincount(self.state_code[alive], minlength=len(self.state_names))
+            summary["states"] = {self.state_names[c]: int(n) for c, n in enumerate(states) if n}
+            return summary
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in (
+            'x', 'y', 'energy', 'mood', 'sociability', 'income', 'state_code', 'alive', 'dirty', 'needs', 'sensitivity'))
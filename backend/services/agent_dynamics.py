@@ -0,0 +1,143 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from backend.config_manager import ConfigManager
+from backend.services.agent_arrays import ATTRIBUTE_COLUMNS
+from backend.services.world_state import WorldState, world_state
+
+# 阈值标记在 prompt 中的说法
+THRESHOLD_LABELS = {
+    'needs.energy': '精力', 'needs.social': '社交', 'needs.fun': '娱乐',
+    'energy': '体力', 'mood': '心情', 'sociability': '社交意愿',
+}
+
+
+class AgentDynamics:
+    """
+    需求/属性演化引擎：每步对全体 agent 做一次批量计算——按状态查速率表衰减或恢复、
+    心情向基线回归并受低需求拖累、截断到 0~100。
+    需求或心情在本步向下跨越阈值的 agent 被标记，交给 LLM 决策；其余变化不调用 LLM。
+    时间一律按模拟秒计（模拟时间即小镇时间，倍速由模拟时钟的 timeScale 决定），速率表为每模拟小时的变化量。
+    """
+
+    def __init__(self, state: Optional[WorldState] = None, settings: Optional[dict] = None):
+        self.state = state or world_state
+        self.settings = settings or ConfigManager.get_agent_dynamics_settings()
+        self._last_step: Optional[float] = None
+        self._last_persist: Optional[float] = None
+        self._last_decision: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.steps = 0
+        self.flagged = 0
+
+    def _rate_tables(self, columns) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        按状态码展开速率表：属性 (状态数, 3) 与需求 (状态数, 需求列数)，单位为每小时。
+        """
+        rates = self.settings.get('rates', {})
+        default = rates.get('default', {})
+        attributes = np.zeros((max(1, len(columns.state_names)), len(ATTRIBUTE_COLUMNS)), dtype=np.float32)
+        needs = np.zeros((attributes.shape[0], columns.needs.shape[1]), dtype=np.float32)
+        for code, name in enumerate(columns.state_names):
+            for key, rate in {**default, **rates.get(name, {})}.items():
+                if key.startswith('needs.'):
+                    column = columns.need_keys.get(key[len('needs.'):])
+                    if column is not None:
+                        needs[code, column] = rate
+                elif key in ATTRIBUTE_COLUMNS:
+                    attributes[code, ATTRIBUTE_COLUMNS.index(key)] = rate
+        return attributes, needs
+
+    def _values(self, columns, slots: np.ndarray, key: str) -> Optional[np.ndarray]:
+        if key.startswith('needs.'):
+            column = columns.need_keys.get(key[len('needs.'):])
+            return None if column is None else columns.needs[slots, column].copy()
+        if key in ATTRIBUTE_COLUMNS:
+            return getattr(columns, key)[slots].copy()
+        return None
+
+    def step(self, dt_seconds: Optional[float] = None, now: Optional[float] = None) -> Dict[str, List[str]]:
+        """
+        推进 dt_seconds 模拟秒（默认取距上一步的时长），返回 {agent_id: [跨越阈值的键]}。
+        now 为当前模拟时间（秒），主循环传入调度器的模拟时间，决定写回间隔。
+        """
+        with self._lock:
+            now = now if now is not None else time.time()
+            if self._last_persist is None:
+                self._last_persist = now
+            if dt_seconds is None:
+                step_seconds = self.settings.get('stepSeconds', 5)
+                # 暂停后恢复时不补算暂停期间的演化
+                dt_seconds = min(now - self._last_step, 2 * step_seconds) if self._last_step is not None else step_seconds
+            self._last_step = now
+            hours = max(0.0, dt_seconds) / 3600
+            columns = self.state.columns
+            # 读列、计算增量、写回与阈值检测在世界状态锁内完成，期间的单 agent 更新不会被覆盖
+            with self.state.lock:
+                slots = np.flatnonzero(columns.alive)
+                if hours <= 0 or len(slots) == 0:
+                    return {}
+                thresholds = self.settings.get('thresholds', {})
+                before = {key: self._values(columns, slots, key) for key in thresholds}
+
+                attribute_rates, need_rates = self._rate_tables(columns)
+                codes = columns.state_code[slots]
+                attribute_deltas = attribute_rates[codes] * hours
+                need_deltas = need_rates[codes] * hours
+                # 心情：向基线回归，每个低于阈值的需求额外拉低
+                baseline = self.settings.get('moodBaseline', 50)
+                reversion = min(1.0, self.settings.get('moodReversionPerHour', 0.1) * hours)
+                low_needs = np.zeros(len(slots), dtype=np.float32)
+                for key, limit in thresholds.items():
+                    if key.startswith('needs.') and before[key] is not None:
+                        low_needs += before[key] < limit  # NaN 比较为 False
+                mood = ATTRIBUTE_COLUMNS.index('mood')
+                attribute_deltas[:, mood] += (baseline - columns.mood[slots]) * reversion
+                attribute_deltas[:, mood] -= low_needs * self.settings.get('moodPenaltyPerHour', 5) * hours
+                self.state.add_rows(slots, attribute_deltas, need_deltas)
+
+                crossed = np.zeros((len(slots), len(thresholds)), dtype=bool)
+                keys = list(thresholds)
+                for c, key in enumerate(keys):
+                    if before[key] is None:
+                        continue
+                    after = self._values(columns, slots, key)
+                    crossed[:, c] = (before[key] >= thresholds[key]) & (after < thresholds[key])
+                rows = np.flatnonzero(crossed.any(axis=1))
+                ids = columns.ids_of(slots[rows])
+            flagged = {agent_id: [keys[c] for c in np.flatnonzero(crossed[r])] for agent_id, r in zip(ids, rows)}
+            self.steps += 1
+            self.flagged += len(flagged)
+
+            # 演化结果按间隔（模拟秒）批量写回，避免每步 upsert 全镇
+            if now - self._last_persist >= self.settings.get('persistIntervalSeconds', 3600):
+                self._last_persist = now
+                self.state.writer.submit([("upsert", a) for a in columns.ids_of(slots)])
+            return flagged
+
+    def due_decisions(self, flagged: Dict[str, List[str]], now: Optional[float] = None) -> List[Tuple[str, List[str]]]:
+        """
+        从标记中挑出本步要交给 LLM 的 agent：跳过冷却期内的，最多 maxDecisionsPerStep 个。
+        now 为当前模拟时间（秒），冷却期按模拟时间计算。
+        """
+        now = now if now is not None else time.time()
+        cooldown = self.settings.get('decisionCooldownSeconds', 18000)
+        limit = self.settings.get('maxDecisionsPerStep', 5)
+        due = []
+        for agent_id, keys in flagged.items():
+            if len(due) >= limit:
+                break
+            if now - self._last_decision.get(agent_id, float('-inf')) < cooldown:
+                continue
+            self._last_decision[agent_id] = now
+            due.append((agent_id, keys))
+        return due
+
+    @staticmethod
+    def decision_prompt(keys: List[str]) -> str:
+        labels = '、'.join(THRESHOLD_LABELS.get(k, k) for k in keys)
+        return f"你的{labels}已经很低了，请结合当前状态决定接下来做什么。"
+
+    def stats(self) -> dict:
+        return {"steps": self.steps, "flagged": self.flagged, "cooling": len(self._last_decision)}
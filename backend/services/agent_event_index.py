@@ -0,0 +1,156 @@
+import bisect
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from backend.config_manager import ConfigManager
+
+Key = Tuple[int, str]  # (start_time, event_id)
+
+
+def encode_cursor(key: Key) -> str:
+    return f"{key[0]}:{key[1]}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Key]:
+    if not cursor:
+        return None
+    start, _, event_id = cursor.partition(':')
+    try:
+        return int(start), event_id
+    except ValueError:
+        raise ValueError(f"无效的分页游标: {cursor}")
+
+
+class AgentEventIndex:
+    """
+    agent → 事件的倒排索引：每个 agent 一个按 (start_time, event_id) 有序的键列表。
+    事件写入/删除时增量维护（bisect 插入，时间单调时等价于追加），
+    时间线按键集分页（游标为上一页最后一条的键），代价与该 agent 的事件总数无关。
+    索引只存键，事件内容由调用方按 id 批量取回。
+    """
+
+    def __init__(self):
+        self._timelines: Dict[str, List[Key]] = {}
+        self._events: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+        self._lock = threading.RLock()
+        self.ready = False
+        self.loading = False
+        self._tombstones: Set[str] = set()
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self, event_id: str, start_time: int, agent_ids: Iterable[str], skip_removed: bool = False):
+        event_id = str(event_id)
+        start_time = int(start_time or 0)
+        agent_ids = tuple(dict.fromkeys(a for a in agent_ids if a))
+        with self._lock:
+            if skip_removed and event_id in self._tombstones:
+                return
+            if event_id in self._events:
+                self.remove(event_id)
+            key = (start_time, event_id)
+            for agent_id in agent_ids:
+                timeline = self._timelines.setdefault(agent_id, [])
+                if not timeline or timeline[-1] < key:
+                    timeline.append(key)
+                else:
+                    bisect.insort(timeline, key)
+            self._events[event_id] = (start_time, agent_ids)
+
+    def remove(self, event_id: str) -> bool:
+        event_id = str(event_id)
+        with self._lock:
+            if self.loading:
+                # 预热期间删除的事件不能被随后加载的旧数据重新加入
+                self._tombstones.add(event_id)
+            entry = self._events.pop(event_id, None)
+            if entry is None:
+                return False
+            start_time, agent_ids = entry
+            key = (start_time, event_id)
+            for agent_id in agent_ids:
+                timeline = self._timelines.get(agent_id)
+                if not timeline:
+                    continue
+                i = bisect.bisect_left(timeline, key)
+                if i < len(timeline) and timeline[i] == key:
+                    del timeline[i]
+                if not timeline:
+                    del self._timelines[agent_id]
+            return True
+
+    def count(self, agent_id: str) -> int:
+        return len(self._timelines.get(agent_id, ()))
+
+    def page(self, agent_id: str, limit: int = 50, cursor: Optional[Key] = None,
+             descending: bool = True) -> Tuple[List[Key], Optional[Key]]:
+        """
+        键集分页：descending 时返回早于 cursor 的最新 limit 条，否则返回晚于 cursor 的最早 limit 条。
+        返回 (键列表, 下一页游标)，没有更多时游标为 None。
+        """
+        with self._lock:
+            timeline = self._timelines.get(agent_id, [])
+            if descending:
+                end = bisect.bisect_left(timeline, cursor) if cursor is not None else len(timeline)
+                start = max(0, end - limit)
+                keys = timeline[start:end][::-1]
+                more = start > 0
+            else:
+                start = bisect.bisect_right(timeline, cursor) if cursor is not None else 0
+                keys = timeline[start:start + limit]
+                more = start + limit < len(timeline)
+        return keys, (keys[-1] if keys and more else None)
+
+    def recent(self, agent_id: str, k: int = 3) -> List[str]:
+        keys, _ = self.page(agent_id, k)
+        return [event_id for _, event_id in keys]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"events": len(self._events), "agents": len(self._timelines),
+                    "ready": self.ready, "loading": self.loading}
+
+
+def _affected(row: dict) -> List[str]:
+    value = row.get('affected_agents') or []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except Exception:
+            return []
+    return [str(a) for a in value] if isinstance(value, list) else []
+
+
+def warm_load_agent_event_index(index: Optional['AgentEventIndex'] = None, page_size: Optional[int] = None):
+    """
+    启动时从数据库分页加载事件的 id/时间/参与者建立倒排索引，预热完成前时间线查询仍走数据库。
+    """
+    from backend.services.supabase_client import supabase
+    index = agent_event_index if index is None else index
+    page_size = page_size or ConfigManager.get_vector_index_settings().get('warmLoadPageSize', 1000)
+    index.loading = True
+    start = time.time()
+    offset = 0
+    try:
+        while True:
+            res = supabase.table("events").select("id,start_time,affected_agents").range(offset, offset + page_size - 1).execute()
+            rows = res.data or []
+            for row in rows:
+                if row.get('id') is not None:
+                    index.add(row['id'], row.get('start_time') or 0, _affected(row), skip_removed=True)
+            if len(rows) < page_size:
+                break
+            offset += page_size
+        index.ready = True
+        print(f"[事件倒排索引] 预热完成: {len(index)} 个事件, 耗时 {time.time() - start:.2f}s")
+    except Exception as e:
+        print(f"警告: 事件倒排索引预热失败，继续使用数据库查询: {e}")
+    finally:
+        index.loading = False
+        index._tombstones.clear()
+
+
+# 进程级 agent → 事件倒排索引，由 event_service 在写入/删除事件时维护
+agent_event_index = AgentEventIndex()
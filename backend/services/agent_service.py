@@ -1,68 +1,75 @@
 from typing import List, Optional
 from backend.models import Agent, AgentUpdateModel
 from backend.services.supabase_client import supabase
+from backend.services.world_state import world_state
 from backend.services.memory_service import MemoryService
-import time
+from backend.services.vector_index import agent_index
+from backend.services.relationship_graph import relationship_graph
 
 class AgentService:
-    def get_agents(self) -> List[Agent]:
-        # 添加重试机制和异常处理
-        for i in range(3):  # 最多重试2次
+    def get_agents(self, agent_ids: Optional[List[str]] = None, memory_limit: int = 5) -> List[Agent]:
+        """
+        从进程内世界状态读取 agent，返回副本并附上各自最新的 memory_limit 条记忆（批量加载，带短 TTL 缓存）。
+        memory_limit=0 时不加载记忆。
+        """
+        agents = world_state.get_agents(agent_ids)
+        latest = {}
+        if memory_limit:
             try:
-                res = supabase.table("agents").select("*").execute()
-                agents = [Agent(**a) for a in res.data]
-                memory_service = MemoryService()
-                for agent in agents:
-                    try:
-                        agent.memories = memory_service.get_memories(agent.id, limit=5)
-                    except Exception as e:
-                        print(f"警告: 获取Agent {agent.id} 的记忆失败: {e}")
-                        agent.memories = []
-                return agents
+                latest = MemoryService().get_latest_memories([agent.id for agent in agents], memory_limit)
             except Exception as e:
-                if i < 2:  # 如果不是最后一次尝试
-                    print(f"警告: 获取Agent列表第{i+1}次尝试失败，将重试: {e}")
-                    time.sleep(0.5)  # 休眠一小段时间再重试
-                else:
-                    print(f"错误: 获取Agent列表失败，已重试{i}次: {e}")
-                    # 在最终失败时返回空列表，而不是抛异常中断整个API请求
-                    return []
+                print(f"警告: 批量获取Agent记忆失败: {e}")
+        return [agent.copy(update={"memories": latest.get(agent.id, [])}) for agent in agents]
+
+    def get_agent(self, agent_id: str) -> Optional[Agent]:
+        # 热路径：直接返回世界状态中的对象
+        return world_state.get_agent(agent_id)
 
     def add_agent(self, agent: Agent) -> Agent:
-        # 只保留数据库实际字段，排除memories/llmPrompts/embedding等
-        db_fields = {"id", "name", "position", "state", "avatar", "personality", "traits", "attributes", "emotion", "relationships"}
-        agent_data = {k: v for k, v in agent.dict(exclude_none=True).items() if k in db_fields}
-        # 添加异常处理
-        try:
-            supabase.table("agents").insert(agent_data).execute()
-            return agent
-        except Exception as e:
-            print(f"错误: 添加Agent失败: {e}")
-            # 仍返回agent对象，但前端可能需要处理未成功添加的情况
-            return agent
+        world_state.add_agent(agent)
+        if agent.embedding:
+            agent_index.add(agent.id, agent.embedding, world_state.to_row(agent))
+        return agent
 
     def update_agent(self, agent_id: str, updates: AgentUpdateModel) -> Optional[Agent]:
-        update_data = updates.dict(exclude_unset=True)
+        return self.update_agent_fields(agent_id, updates.dict(exclude_unset=True))
+
+    def update_agent_fields(self, agent_id: str, update_data: dict) -> Optional[Agent]:
         # 添加异常处理
         try:
-            res = supabase.table("agents").update(update_data).eq("id", agent_id).execute()
-            if res.data:
-                return Agent(**res.data[0])
-            return None
+            agent = world_state.update_agent(agent_id, update_data)
+            if agent is not None:
+                if 'relationships' in update_data:
+                    relationship_graph.load_agent(agent_id, agent.relationships)
+                agent_index.update_payload(agent_id, world_state.to_row(agent))
+            return agent
         except Exception as e:
             print(f"错误: 更新Agent {agent_id} 失败: {e}")
             return None
 
-    def delete_agent(self, agent_id: str) -> bool:
-        # 添加异常处理
+    def add_attribute_deltas(self, agent_id: str, deltas: dict) -> Optional[Agent]:
+        """
+        属性增量直接加到列式核心的当前值上（锁内、截断到 0~100），不会覆盖并发的批量修改。
+        """
         try:
-            res = supabase.table("agents").delete().eq("id", agent_id).execute()
-            return bool(res.data)
+            if not world_state.apply_attribute_deltas([agent_id], deltas):
+                return world_state.get_agent(agent_id)
+            agent = world_state.get_agent(agent_id)
+            if agent is not None:
+                agent_index.update_payload(agent_id, world_state.to_row(agent))
+            return agent
         except Exception as e:
-            print(f"错误: 删除Agent {agent_id} 失败: {e}")
-            return False
+            print(f"错误: 更新Agent {agent_id} 属性失败: {e}")
+            return None
+
+    def delete_agent(self, agent_id: str) -> bool:
+        agent_index.remove(agent_id)
+        relationship_graph.remove_agent(agent_id)
+        return world_state.remove_agent(agent_id)
 
     def search_agents_by_embedding(self, query_embedding: list, top_k: int = 5) -> list:
+        if agent_index.ready:
+            return [Agent(**payload) for payload, _ in agent_index.search(query_embedding, top_k)]
         # 添加异常处理
         try:
             res = supabase.rpc("match_agents", {"query_embedding": query_embedding, "match_count": top_k}).execute()
@@ -0,0 +1,136 @@
+import itertools
+import threading
+from typing import Any, Dict, Optional
+from backend.models import Agent, AgentAttributes
+from backend.services.agent_service import AgentService
+from backend.services.relationship_graph import relationship_graph
+from backend.services.simulation_clock import simulation_clock
+
+ATTRIBUTE_FIELDS = set(AgentAttributes.__fields__)
+
+# 进程级计数：收到的补丁数 vs 实际发出的写入数
+_counters = {"patches": 0, "writes": 0, "dropped": 0}
+_counters_lock = threading.Lock()
+_sequence = itertools.count(1)
+
+
+def get_update_counters() -> dict:
+    with _counters_lock:
+        stats = dict(_counters)
+    stats["coalesceRatio"] = round(stats["patches"] / stats["writes"], 2) if stats["writes"] else 0.0
+    return stats
+
+
+def _count(**deltas):
+    with _counters_lock:
+        for key, value in deltas.items():
+            _counters[key] += value
+
+
+class _AgentPatch:
+    def __init__(self):
+        self.attribute_deltas: Dict[str, float] = {}
+        self.relationship_deltas: Dict[str, list] = {}  # target -> [增量, 互动次数]
+        self.sets: Dict[str, tuple] = {}  # field -> (seq, value)
+
+
+class AgentUpdateCoalescer:
+    """
+    合并一个 tick 或一个事件内对同一 agent 的所有补丁（属性增量、字段赋值、关系增量），
+    flush 时每个 agent 只写一次。
+    冲突规则：同一字段的多次赋值按提交序号后写者胜；属性/关系增量累加；
+    对某个属性赋值会清空它之前累计的增量，之后的增量继续叠加。
+    可作为上下文管理器使用，退出时自动 flush。
+    """
+
+    def __init__(self, agent_service: Optional[AgentService] = None):
+        self.agent_service = agent_service or AgentService()
+        self._patches: Dict[str, _AgentPatch] = {}
+        self._lock = threading.Lock()
+        self.patches = 0
+        self.writes = 0
+
+    def _patch(self, agent_id: str) -> _AgentPatch:
+        self.patches += 1
+        _count(patches=1)
+        return self._patches.setdefault(agent_id, _AgentPatch())
+
+    def add_attribute_delta(self, agent_id: str, attribute: str, delta: float):
+        with self._lock:
+            deltas = self._patch(agent_id).attribute_deltas
+            deltas[attribute] = deltas.get(attribute, 0) + delta
+
+    def add_relationship_delta(self, agent_id: str, target_id: str, delta: float):
+        with self._lock:
+            entry = self._patch(agent_id).relationship_deltas.setdefault(target_id, [0.0, 0])
+            entry[0] += delta
+            entry[1] += 1
+
+    def set_field(self, agent_id: str, field: str, value: Any):
+        with self._lock:
+            patch = self._patch(agent_id)
+            patch.sets[field] = (next(_sequence), value)
+            if field in ATTRIBUTE_FIELDS:
+                patch.attribute_deltas.pop(field, None)
+
+    def apply_impact(self, agent_id: str, impact: Dict[str, Any]):
+        """
+        事件 impact：energy/mood/sociability 为增量，其余 Agent 字段（如 emotion/state）为赋值，未知键忽略。
+        """
+        for key, value in (impact or {}).items():
+            if key in ATTRIBUTE_FIELDS and isinstance(value, (int, float)):
+                self.add_attribute_delta(agent_id, key, value)
+            elif key in Agent.__fields__ and key not in ('id', 'memories'):
+                self.set_field(agent_id, key, value)
+
+    def _build_fields(self, agent: Agent, patch: _AgentPatch) -> dict:
+        fields = {key: value for key, (_, value) in sorted(patch.sets.items(), key=lambda kv: kv[1][0])
+                  if key not in ATTRIBUTE_FIELDS}
+        # 只发送被赋值的属性键（其余由 world_state 在锁内取当前值），增量在 flush 中单独按增量应用
+        attr_sets = {key: value for key, (_, value) in patch.sets.items() if key in ATTRIBUTE_FIELDS}
+        if attr_sets:
+            fields['attributes'] = attr_sets
+        if patch.relationship_deltas:
+            # 关系图是好感度与互动次数的权威来源，Agent.relationships 只作为持久化镜像
+            if 'relationships' in fields or not relationship_graph.has_agent(agent.id):
+                relationship_graph.load_agent(agent.id, fields.get('relationships', agent.relationships))
+            # 最近互动时间按模拟时间记录，与 record_group 使用的事件 startTime 同一基准
+            now_ms = simulation_clock.now_ms()
+            for target_id, (delta, count) in patch.relationship_deltas.items():
+                relationship_graph.add_affinity(agent.id, target_id, delta, interactions=count, now=now_ms)
+            fields['relationships'] = relationship_graph.relationships_of(agent.id)
+        return fields
+
+    def flush(self) -> Dict[str, Agent]:
+        with self._lock:
+            patches, self._patches = self._patches, {}
+        updated = {}
+        for agent_id, patch in patches.items():
+            agent = self.agent_service.get_agent(agent_id)
+            if agent is None:
+                _count(dropped=1)
+                continue
+            fields = self._build_fields(agent, patch)
+            deltas = {k: v for k, v in patch.attribute_deltas.items() if v}
+            if not fields and not deltas:
+                continue
+            result = None
+            if fields:
+                result = self.agent_service.update_agent_fields(agent_id, fields)
+            if deltas:
+                result = self.agent_service.add_attribute_deltas(agent_id, deltas) or result
+            self.writes += 1
+            _count(writes=1)
+            if result is not None:
+                updated[agent_id] = result
+        return updated
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def stats(self) -> dict:
+        return {"patches": self.patches, "writes": self.writes, "pendingAgents": len(self._patches)}
@@ -0,0 +1,93 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+from backend.config_manager import ConfigManager
+
+
+class EmbeddingCache:
+    """
+    内容寻址的 embedding 两级缓存：键为 sha256(model, text)。
+    一级为进程内有界 LRU，二级为可选的 sqlite 磁盘存储（重启后仍可命中）。
+    向量以 float32 紧凑存储，取出时转换为 list。
+    """
+
+    def __init__(self, max_entries: int = 4096, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = self.make_key(model, text)
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return vec.tolist()
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vec = array('f')
+                    vec.frombytes(row[0])
+                    self._remember(key, vec)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vec.tolist()
+            self.misses += 1
+            return None
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        key = self.make_key(model, text)
+        vec = array('f', embedding)
+        with self._lock:
+            self._remember(key, vec)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", (key, model, vec.tobytes()))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"警告: 写入embedding磁盘缓存失败: {e}")
+
+    def _remember(self, key: str, vec: array):
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / total, 4) if total else 0.0,
+                "persistent": self._db is not None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+
+_settings = ConfigManager.get_embedding_settings()
+# 进程级单例，所有 LLMService 实例共享
+embedding_cache = EmbeddingCache(_settings.get('cacheMaxEntries', 4096), _settings.get('cachePath'))
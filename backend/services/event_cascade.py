@@ -0,0 +1,167 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from backend.models import Agent, Event
+from backend.config_manager import ConfigManager
+from backend.services.reaction_fanout import ReactionFanout, ReactionResult, get_reaction_fanout
+
+Emit = Callable[[Event], bool]
+
+
+def causal_meta(event: Event) -> dict:
+    """
+    事件的因果信息：causalId 为整条链根事件的 id，parentId 为直接触发它的事件，depth 为所在层数。
+    """
+    meta = event.meta or {}
+    return {"causalId": meta.get("causalId", event.id), "parentId": meta.get("parentId"), "depth": meta.get("depth", 0)}
+
+
+def mark_triggered(child: Event, parent: Event) -> Event:
+    parent_causal = causal_meta(parent)
+    child.meta = {**(child.meta or {}), "causalId": parent_causal["causalId"], "parentId": parent.id,
+                  "depth": parent_causal["depth"] + 1}
+    return child
+
+
+class CascadeReport(NamedTuple):
+    causal_id: str
+    levels: List[List[ReactionResult]]  # 每层的反应结果，item 为 (agent, 事件)
+    emitted: int                        # 被接受并写入的触发事件数
+    dropped: int                        # 因深度/预算/超时被丢弃的触发事件数
+    elapsed: float
+
+    def results(self) -> List[ReactionResult]:
+        return [r for level in self.levels for r in level]
+
+
+class _Collector:
+    """
+    单个 (agent, 事件) 反应期间收集触发事件；反应超时后关闭，迟到的事件直接丢弃。
+    """
+
+    def __init__(self, agent_id: str, limit: int):
+        self.agent_id = agent_id
+        self.limit = limit
+        self.events: List[Event] = []
+        self.dropped = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event) -> bool:
+        with self._lock:
+            if self.closed or len(self.events) >= self.limit:
+                self.dropped += 1
+                return False
+            self.events.append(event)
+            return True
+
+    def close(self) -> Tuple[List[Event], int]:
+        with self._lock:
+            self.closed = True
+            return self.events, self.dropped
+
+
+class EventCascade:
+    """
+    触发事件的级联执行器：按层（广度优先）推进，同一层所有 (agent, 事件) 的 LLM 反应并发执行，
+    反应中产生的触发事件（行为链互动、triggeredEvent）写入后成为下一层，由其受影响者（不含发起者）继续反应。
+    深度、单事件扇出、单 agent 触发数、整条级联的事件总数与耗时都有上限，
+    超出的触发事件丢弃并计数，单个话多的 agent 既拖不住本 tick 也无法让级联爆炸。
+    每个事件在 meta 中携带 causalId/parentId/depth，可按根事件追溯整条链。
+    """
+
+    def __init__(self, settings: Optional[dict] = None, fanout: Optional[ReactionFanout] = None,
+                 submit: Optional[Callable[[Event], Any]] = None, resolve: Optional[Callable[[List[str]], List[Agent]]] = None):
+        self.settings = settings or ConfigManager.get_event_cascade_settings()
+        self.fanout = fanout or get_reaction_fanout()
+        self.submit = submit or _submit_event
+        self.resolve = resolve or _resolve_agents
+        self._lock = threading.Lock()
+        self.cascades = 0
+        self.emitted = 0
+        self.dropped = 0
+        self.max_depth_reached = 0
+
+    def run(self, root: Event, react: Callable[[Agent, Event, Emit], Any],
+            reactors: Optional[List[str]] = None) -> CascadeReport:
+        """
+        对已写入的根事件执行级联：react(agent, event, emit) 做一次反应，通过 emit 提交触发事件。
+        reactors 指定根事件中需要反应的 agent（如近重复事件只让部分人反应），默认为全部受影响者。
+        """
+        max_depth = self.settings.get('maxDepth', 2)
+        max_children = self.settings.get('maxChildrenPerEvent', 3)
+        per_agent = self.settings.get('maxEventsPerAgent', 2)
+        max_events = self.settings.get('maxEventsPerCascade', 20)
+        budget = self.settings.get('budgetSeconds', 90.0)
+        started = time.monotonic()
+        root.meta = {**(root.meta or {}), **causal_meta(root)}
+        causal_id = root.meta["causalId"]
+        agent_emits: Dict[str, int] = {}
+        levels: List[List[ReactionResult]] = []
+        emitted = dropped = 0
+        frontier = [root]
+        depth = 0
+        while frontier:
+            remaining = budget - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            pairs = [(agent, event) for event in frontier
+                     for agent in self.resolve([a for a in dict.fromkeys(reactors if event is root and reactors is not None else event.affectedAgents)
+                                                if a != event.from_agent])]
+            collectors = [_Collector(agent.id, per_agent) for agent, _ in pairs]
+            tasks = list(zip(pairs, collectors))
+            results = self.fanout.run(tasks, lambda task: react(task[0][0], task[0][1], task[1]),
+                                      timeout=min(self.fanout.timeout, remaining))
+            levels.append([ReactionResult(task[0], r.value, r.error, r.timed_out) for task, r in zip(tasks, results)])
+            next_frontier: List[Event] = []
+            children: Dict[str, int] = {}
+            # 按输入顺序确定性地接纳触发事件
+            for (agent, parent), collector in tasks:
+                events, late = collector.close()
+                dropped += late
+                for child in events:
+                    over_budget = depth >= max_depth or emitted >= max_events or time.monotonic() - started >= budget
+                    if over_budget or children.get(parent.id, 0) >= max_children or agent_emits.get(agent.id, 0) >= per_agent:
+                        dropped += 1
+                        continue
+                    mark_triggered(child, parent)
+                    try:
+                        self.submit(child)
+                    except Exception as e:
+                        print(f"警告: 级联事件 {child.id} 写入失败: {e}")
+                        dropped += 1
+                        continue
+                    children[parent.id] = children.get(parent.id, 0) + 1
+                    agent_emits[agent.id] = agent_emits.get(agent.id, 0) + 1
+                    emitted += 1
+                    next_frontier.append(child)
+            frontier = next_frontier
+            if frontier:
+                depth += 1
+        with self._lock:
+            self.cascades += 1
+            self.emitted += emitted
+            self.dropped += dropped
+            self.max_depth_reached = max(self.max_depth_reached, depth)
+        return CascadeReport(causal_id, levels, emitted, dropped, time.monotonic() - started)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cascades": self.cascades, "emitted": self.emitted, "dropped": self.dropped,
+                    "maxDepthReached": self.max_depth_reached}
+
+
+def _submit_event(event: Event):
+    # 延迟导入，避免与 event_service → llm_service 的导入链循环
+    from backend.services.event_service import EventService
+    from backend.services.event_pipeline import PipelineFull
+    try:
+        EventService().add_event(event)
+    except PipelineFull:
+        print(f"警告: 事件队列已满，{event.id} 改为同步处理")
+        EventService().add_event(event, defer=False)
+
+
+def _resolve_agents(agent_ids: List[str]) -> List[Agent]:
+    from backend.services.world_state import world_state
+    return world_state.get_agents(agent_ids)
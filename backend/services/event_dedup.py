@@ -0,0 +1,158 @@
+import threading
+from typing import Callable, List, NamedTuple, Optional, Set
+import numpy as np
+from backend.models import Event
+from backend.config_manager import ConfigManager
+from backend.services.simulation_clock import simulation_clock
+
+KEEP = 'keep'
+DOWNWEIGHT = 'downweight'
+MERGE = 'merge'
+DROP = 'drop'
+
+
+class DedupDecision(NamedTuple):
+    action: str
+    similarity: float = 0.0
+    match_id: Optional[str] = None
+    reactors: Optional[List[str]] = None  # 需要做 LLM 反应的 agent，None 表示全部受影响者
+
+    @property
+    def persist(self) -> bool:
+        return self.action != DROP
+
+
+class EventDeduplicator:
+    """
+    生成事件的语义近重复抑制：新事件的 embedding 与最近 window 条（且不超过 windowSeconds）生成事件做余弦相似度比较。
+    相似度达到 dropThreshold 直接丢弃；达到 mergeThreshold 视为同一事件的重复，写入时标记 duplicateOf，
+    affectedAgents 收窄为原事件未覆盖的 agent（只有他们得到记忆、impact 与反应），并把他们并入原事件的覆盖范围；达到 downweightThreshold 时影响减弱、反应人数受限。
+    窗口是预分配的环形矩阵，一次比较是一次矩阵乘法；windowSeconds 按模拟时间计算，与生成事件的 startTime 同一基准。
+    各类处理次数与节省的反应调用数作为指标输出。
+    """
+
+    def __init__(self, settings: Optional[dict] = None, embed: Optional[Callable[[str], list]] = None,
+                 clock: Callable[[], int] = simulation_clock.now_ms):
+        self.settings = settings or ConfigManager.get_event_dedup_settings()
+        self.embed = embed or _embed
+        self.clock = clock
+        self.window = max(1, self.settings.get('window', 50))
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: List[Optional[str]] = [None] * self.window
+        self._agents: List[Set[str]] = [set() for _ in range(self.window)]
+        self._times = np.zeros(self.window, dtype=np.float64)
+        self._next = 0
+        self._lock = threading.Lock()
+        self.counts = {KEEP: 0, DOWNWEIGHT: 0, MERGE: 0, DROP: 0}
+        self.errors = 0
+        self.reactions_saved = 0
+
+    def check(self, event: Event) -> DedupDecision:
+        """
+        判定生成事件的处理方式，并按判定结果修改事件（embedding、meta 标记、减弱的 impact）。
+        保留、减弱或合并的事件进入窗口；丢弃的不进入，避免窗口被同一主题占满。
+        """
+        affected = len(set(event.affectedAgents))
+        if not self.settings.get('enabled', True) or not event.description:
+            return self._record(DedupDecision(KEEP), affected)
+        try:
+            embedding = event.embedding or self.embed(event.description)
+        except Exception as e:
+            self.errors += 1
+            print(f"警告: 事件去重生成 embedding 失败，按新事件处理: {e}")
+            return self._record(DedupDecision(KEEP), affected)
+        event.embedding = list(embedding)
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0:
+            return self._record(DedupDecision(KEEP), affected)
+        vector /= norm
+        now = self.clock() / 1000
+        with self._lock:
+            similarity, match = self._best_match(vector, now)
+            match_agents = self._agents[match] if match is not None else set()
+            match_id = self._ids[match] if match is not None else None
+            decision = self._decide(event, similarity, match_id, match_agents)
+            if decision.action == MERGE:
+                # 新覆盖到的 agent 并入原事件，再次出现的重复不会让他们重复反应
+                match_agents.update(event.affectedAgents)
+            if decision.action != DROP:
+                self._remember(event, vector, now)
+        return self._record(decision, affected)
+
+    def _best_match(self, vector: np.ndarray, now: float):
+        if self._vectors is None or self._vectors.shape[1] != len(vector):
+            self._vectors = np.zeros((self.window, len(vector)), dtype=np.float32)
+            self._ids = [None] * self.window
+            return 0.0, None
+        live = np.array([i is not None for i in self._ids]) & (now - self._times <= self.settings.get('windowSeconds', 3600))
+        if not live.any():
+            return 0.0, None
+        scores = np.where(live, self._vectors @ vector, -1.0)
+        best = int(np.argmax(scores))
+        return float(scores[best]), best
+
+    def _decide(self, event: Event, similarity: float, match_id: Optional[str], match_agents: Set[str]) -> DedupDecision:
+        affected = list(dict.fromkeys(event.affectedAgents))
+        if match_id is None:
+            return DedupDecision(KEEP, similarity)
+        if similarity >= self.settings.get('dropThreshold', 0.97):
+            return DedupDecision(DROP, similarity, match_id, [])
+        if similarity >= self.settings.get('mergeThreshold', 0.92):
+            # 原事件已覆盖的 agent 不再写记忆、不再叠加 impact，只保留新覆盖到的 agent
+            uncovered = [a for a in affected if a not in match_agents]
+            event.meta = {**(event.meta or {}), "duplicateOf": match_id, "similarity": round(similarity, 4),
+                          "coveredAgents": [a for a in affected if a in match_agents]}
+            event.affectedAgents = uncovered
+            return DedupDecision(MERGE, similarity, match_id, uncovered)
+        if similarity >= self.settings.get('downweightThreshold', 0.85):
+            scale = self.settings.get('downweightImpactScale', 0.5)
+            event.impact = {k: v * scale if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+                            for k, v in (event.impact or {}).items()}
+            event.meta = {**(event.meta or {}), "similarTo": match_id, "similarity": round(similarity, 4), "downweighted": True}
+            return DedupDecision(DOWNWEIGHT, similarity, match_id, affected[:self.settings.get('downweightMaxReactors', 2)])
+        return DedupDecision(KEEP, similarity, match_id)
+
+    def _remember(self, event: Event, vector: np.ndarray, now: float):
+        slot = self._next
+        self._vectors[slot] = vector
+        self._ids[slot] = event.id
+        self._agents[slot] = set(event.affectedAgents)
+        self._times[slot] = now
+        self._next = (slot + 1) % self.window
+
+    def _record(self, decision: DedupDecision, affected: int) -> DedupDecision:
+        with self._lock:
+            self.counts[decision.action] += 1
+            if decision.reactors is not None:
+                self.reactions_saved += affected - len(decision.reactors)
+        return decision
+
+    def clear(self):
+        """
+        清空比较窗口（如模拟 reset），之后的生成事件不再与 reset 之前的事件比较；计数保留。
+        """
+        with self._lock:
+            self._ids = [None] * self.window
+            self._agents = [set() for _ in range(self.window)]
+            self._times[:] = 0
+            self._next = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            checked = sum(self.counts.values())
+            suppressed = checked - self.counts[KEEP]
+            return {"checked": checked, "kept": self.counts[KEEP], "downweighted": self.counts[DOWNWEIGHT],
+                    "merged": self.counts[MERGE], "dropped": self.counts[DROP], "errors": self.errors,
+                    "suppressionRate": round(suppressed / checked, 4) if checked else 0.0,
+                    "reactionsSaved": self.reactions_saved}
+
+
+def _embed(text: str) -> list:
+    # 延迟导入，避免与 llm_service 的导入链循环；命中 embedding 缓存时不发请求
+    from backend.services.llm_service import LLMService
+    return LLMService().get_embedding(text)
+
+
+# 进程级生成事件去重器，由主循环在事件写入与反应扇出之前调用
+event_dedup = EventDeduplicator()
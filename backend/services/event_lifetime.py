@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from backend.models import Event
+from backend.services.agent_arrays import ATTRIBUTE_COLUMNS
+from backend.services.world_state import WorldState, world_state
+from backend.services.simulation_clock import simulation_clock
+
+ACTIVATE = 0
+EXPIRE = 1
+
+
+def wall_clock_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class _Lifetime:
+    __slots__ = ('event_id', 'start', 'end', 'agent_ids', 'deltas', 'applied_ids', 'applied', 'active')
+
+    def __init__(self, event_id: str, start: int, end: int, agent_ids: List[str], deltas: Dict[str, float]):
+        self.event_id = event_id
+        self.start = start
+        self.end = end
+        self.agent_ids = agent_ids
+        self.deltas = deltas
+        self.applied_ids: List[str] = []
+        self.applied: Optional[np.ndarray] = None
+        self.active = False
+
+
+class EventLifetimeScheduler:
+    """
+    事件生命周期调度：按 startTime 激活、startTime + duration 到期，时间点放在最小堆里。
+    激活时对受影响 agent 施加 impact 中的数值属性增量并记下实际生效值，到期时按实际值撤销；
+    同一次 advance 中到期的事件合并为一次数组运算写回，再把到期事件 id 批量通知订阅者。
+    每个事件的登记/到期是 O(log n) 的堆操作，取消采用惰性删除，不扫描事件表。
+    """
+
+    def __init__(self, state: Optional[WorldState] = None, clock: Callable[[], int] = wall_clock_ms):
+        self.state = state or world_state
+        self.clock = clock
+        self._heap: List[Tuple[int, int, int, str]] = []
+        self._entries: Dict[str, _Lifetime] = {}
+        self._seq = itertools.count()
+        self._subscribers: List[Callable[[List[str]], None]] = []
+        self._lock = threading.RLock()
+        self.activated = 0
+        self.expired = 0
+        self.cancelled = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def subscribe(self, callback: Callable[[List[str]], None]):
+        """
+        订阅到期通知：每次 advance 有事件到期时以到期事件 id 列表调用一次。
+        """
+        self._subscribers.append(callback)
+
+    def register(self, event: Event, agent_ids: List[str], now_ms: Optional[int] = None) -> bool:
+        """
+        登记一个有持续时间的事件。已开始的立即施加影响，未开始的等到 startTime 激活；
+        duration 不大于 0 的事件不登记，返回 False，由调用方按永久影响处理。
+        """
+        if not event.duration or event.duration <= 0:
+            return False
+        deltas = {k: v for k, v in (event.impact or {}).items() if k in ATTRIBUTE_COLUMNS and isinstance(v, (int, float))}
+        now_ms = self.clock() if now_ms is None else now_ms
+        start = int(event.startTime or now_ms)
+        entry = _Lifetime(str(event.id), start, start + int(event.duration), list(agent_ids), deltas)
+        with self._lock:
+            if entry.event_id in self._entries:
+                self.cancel(entry.event_id)
+            self._entries[entry.event_id] = entry
+            if start <= now_ms:
+                self._activate(entry)
+            else:
+                heapq.heappush(self._heap, (start, next(self._seq), ACTIVATE, entry.event_id))
+        return True
+
+    def _activate(self, entry: _Lifetime):
+        if entry.deltas and entry.agent_ids:
+            entry.applied_ids, entry.applied = self.state.apply_attribute_deltas_tracked(entry.agent_ids, entry.deltas)
+        entry.active = True
+        self.activated += 1
+        heapq.heappush(self._heap, (entry.end, next(self._seq), EXPIRE, entry.event_id))
+
+    def advance(self, now_ms: Optional[int] = None) -> List[str]:
+        """
+        推进到 now_ms：激活到点的事件，撤销并通知所有到期事件，返回到期事件 id。
+        """
+        now_ms = self.clock() if now_ms is None else now_ms
+        expired: List[_Lifetime] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now_ms:
+                when, _, kind, event_id = heapq.heappop(self._heap)
+                entry = self._entries.get(event_id)
+                if entry is None or (kind == ACTIVATE) == entry.active or when != (entry.start if kind == ACTIVATE else entry.end):
+                    continue  # 已取消或已被重新登记的旧堆项
+                if kind == ACTIVATE:
+                    self._activate(entry)
+                else:
+                    del self._entries[event_id]
+                    expired.append(entry)
+            self._revert(expired)
+            self.expired += len(expired)
+        expired_ids = [entry.event_id for entry in expired]
+        if expired_ids:
+            for callback in list(self._subscribers):
+                try:
+                    callback(expired_ids)
+                except Exception as e:
+                    print(f"警告: 事件到期通知处理失败: {e}")
+        return expired_ids
+
+    def _revert(self, entries: List[_Lifetime]):
+        # 本批到期事件的实际增量拼成一个矩阵，取反后一次写回
+        applied = [e for e in entries if e.applied_ids]
+        if not applied:
+            return
+        agent_ids = [agent_id for e in applied for agent_id in e.applied_ids]
+        self.state.add_attribute_rows(agent_ids, -np.concatenate([e.applied for e in applied]))
+
+    def cancel(self, event_id: str, revert: bool = True) -> bool:
+        """
+        取消事件（如被删除）：已生效的影响默认撤销，堆中的时间点惰性丢弃。
+        """
+        with self._lock:
+            entry = self._entries.pop(str(event_id), None)
+            if entry is None:
+                return False
+            if revert and entry.active:
+                self._revert([entry])
+            self.cancelled += 1
+            # 堆中全是失效项时整体重建，避免取消大量事件后堆只增不减
+            if len(self._heap) > 2 * len(self._entries) + 1024:
+                live = {e.event_id: e for e in self._entries.values()}
+                self._heap = [item for item in self._heap if item[3] in live and (item[2] == ACTIVATE) != live[item[3]].active]
+                heapq.heapify(self._heap)
+            return True
+
+    def clear(self, revert: bool = True) -> int:
+        """
+        清空全部登记（如模拟 reset）：已生效的影响默认一次性撤销，返回清除的事件数。
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+            if revert:
+                self._revert([e for e in entries if e.active])
+            self._entries.clear()
+            self._heap = []
+            self.cancelled += len(entries)
+            return len(entries)
+
+    def next_due(self) -> Optional[int]:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = sum(1 for e in self._entries.values() if e.active)
+            return {"tracked": len(self._entries), "active": active, "pending": len(self._entries) - active,
+                    "heapSize": len(self._heap), "nextDue": self._heap[0][0] if self._heap else None,
+                    "activated": self.activated, "expired": self.expired, "cancelled": self.cancelled}
+
+
+# 进程级事件生命周期调度器，按模拟时钟计时，由 event_service 登记、主循环推进
+event_lifetime = EventLifetimeScheduler(clock=simulation_clock.now_ms)
@@ -0,0 +1,230 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Sequence, Tuple
+
+
+class PipelineFull(Exception):
+    """
+    入口队列已满（下游处理不过来），调用方应稍后重试。
+    """
+
+
+class _Job:
+    __slots__ = ('payload', 'accepted_at', 'attempts')
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+        self.accepted_at = time.monotonic()
+        self.attempts = 0
+
+
+class PipelineStage:
+    """
+    流水线中的一级：有界队列 + 固定数量的工作线程。
+    处理失败按指数退避重试，超过 max_retries 后计入 failed：必需阶段丢弃该事件，
+    可选阶段（optional=True，如生成 embedding）仍把事件交给下一级。
+    下游队列满时工作线程阻塞在 put 上，背压沿流水线逐级向入口传递。
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1, queue_size: int = 1000,
+                 max_retries: int = 2, retry_backoff: float = 0.5, optional: bool = False,
+                 latency_window: int = 1000):
+        self.name = name
+        self.fn = fn
+        self.optional = optional
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue: "queue.Queue[Optional[_Job]]" = queue.Queue(maxsize=queue_size)
+        self.next: Optional['PipelineStage'] = None
+        self.on_done: Optional[Callable[[_Job], None]] = None
+        self._threads: List[threading.Thread] = []
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"event-{self.name}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def put(self, job: _Job, timeout: Optional[float] = None):
+        self.queue.put(job, timeout=timeout)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                self._process(job)
+            finally:
+                self.queue.task_done()
+
+    def _process(self, job: _Job):
+        while True:
+            started = time.monotonic()
+            try:
+                self.fn(job.payload)
+                with self._lock:
+                    self.processed += 1
+                    self._latencies.append(time.monotonic() - started)
+                break
+            except Exception as e:
+                job.attempts += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                if job.attempts > self.max_retries:
+                    with self._lock:
+                        self.failed += 1
+                    if not self.optional:
+                        print(f"错误: 事件流水线 {self.name} 阶段处理失败，已重试{self.max_retries}次: {e}")
+                        return
+                    print(f"警告: 事件流水线 {self.name} 阶段处理失败，跳过该阶段: {e}")
+                    break
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self.retry_backoff * (2 ** (job.attempts - 1)))
+        job.attempts = 0
+        if self.next is not None:
+            self.next.put(job)
+        elif self.on_done is not None:
+            self.on_done(job)
+
+    def stop(self):
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                "workers": self.workers,
+                "queued": self.queue.qsize(),
+                "capacity": self.queue.maxsize,
+                "processed": self.processed,
+                "retried": self.retried,
+                "failed": self.failed,
+                "lastError": self.last_error,
+            }
+        stats.update(_latency_summary(latencies))
+        return stats
+
+
+def _latency_summary(latencies: Sequence[float]) -> dict:
+    if not latencies:
+        return {"p50Ms": 0.0, "p95Ms": 0.0, "maxMs": 0.0}
+    n = len(latencies)
+    return {
+        "p50Ms": round(latencies[n // 2] * 1000, 2),
+        "p95Ms": round(latencies[min(n - 1, int(n * 0.95))] * 1000, 2),
+        "maxMs": round(latencies[-1] * 1000, 2),
+    }
+
+
+class EventPipeline:
+    """
+    事件副作用的分级异步流水线：accept → 各阶段（如 persist → enrich → fanout）。
+    submit 只做入队，毫秒级返回；每级有独立的有界队列、工作线程数、重试与延迟统计。
+    入口队列满时 submit 等待 accept_timeout 秒后抛 PipelineFull。
+    某一级最终失败的事件不再进入后续阶段。工作线程在首次 submit 时启动。
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[Any], Any], dict]], accept_timeout: float = 0.5,
+                 latency_window: int = 1000):
+        self.stages = [PipelineStage(name, fn, latency_window=latency_window, **options) for name, fn, options in stages]
+        for stage, following in zip(self.stages, self.stages[1:]):
+            stage.next = following
+        self.stages[-1].on_done = self._completed
+        self.accept_timeout = accept_timeout
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._end_to_end: Deque[float] = deque(maxlen=latency_window)
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+
+    def _ensure_started(self):
+        if not self._started:
+            with self._lock:
+                if not self._started:
+                    for stage in self.stages:
+                        stage.start()
+                    self._started = True
+
+    def submit(self, payload: Any, timeout: Optional[float] = None):
+        """
+        受理一个事件并立即返回；入口队列满且等待超时时抛 PipelineFull（背压）。
+        """
+        if self._closed:
+            # 已关闭（进程退出中）时在调用线程里同步跑完所有阶段
+            self.run_inline(payload)
+            return
+        self._ensure_started()
+        try:
+            self.stages[0].put(_Job(payload), timeout=self.accept_timeout if timeout is None else timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise PipelineFull(f"事件队列已满（{self.stages[0].queue.maxsize}），请稍后重试")
+        with self._lock:
+            self.accepted += 1
+
+    def run_inline(self, payload: Any) -> bool:
+        """
+        在调用线程中依次执行各阶段（不经过队列、不重试），必需阶段失败时停止并返回 False。
+        """
+        for stage in self.stages:
+            try:
+                stage.fn(payload)
+            except Exception as e:
+                if not stage.optional:
+                    print(f"错误: 事件流水线 {stage.name} 阶段处理失败: {e}")
+                    return False
+                print(f"警告: 事件流水线 {stage.name} 阶段处理失败，跳过该阶段: {e}")
+        return True
+
+    def _completed(self, job: _Job):
+        with self._lock:
+            self.completed += 1
+            self._end_to_end.append(time.monotonic() - job.accepted_at)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待所有已受理的事件走完流水线，超时返回 False。
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for stage in self.stages:
+            while stage.queue.unfinished_tasks:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.005)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        if self._closed:
+            return
+        if self._started:
+            self.drain(timeout)
+            for stage in self.stages:
+                stage.stop()
+        self._closed = True
+
+    def stats(self) -> dict:
+        with self._lock:
+            summary = {"accepted": self.accepted, "rejected": self.rejected, "completed": self.completed,
+                       "inFlight": sum(s.queue.unfinished_tasks for s in self.stages)}
+            summary.update({f"endToEnd{k[0].upper()}{k[1:]}": v for k, v in _latency_summary(sorted(self._end_to_end)).items()})
+        summary["stages"] = {stage.name: stage.stats() for stage in self.stages}
+        return summary
@@ -3,107 +3,39 @@ from backend.models import Event, Memory
 from backend.services.supabase_client import supabase
 from backend.services.memory_service import MemoryService
 from backend.services.agent_service import AgentService
+from backend.services.agent_update_coalescer import AgentUpdateCoalescer
+from backend.services.policy_memory_service import PolicyMemoryService
 from backend.services.llm_service import LLMService
+from backend.services.vector_index import event_index
+from backend.services.relationship_graph import relationship_graph
+from backend.services.world_state import world_state
+from backend.services.agent_arrays import ATTRIBUTE_COLUMNS
+from backend.services.event_pipeline import EventPipeline
+from backend.services.recent_events import recent_events, to_api_event
+from backend.services.agent_event_index import agent_event_index
+from backend.services.policy_registry import policy_registry, is_policy_event
+from backend.services.event_lifetime import event_lifetime
+from backend.config_manager import ConfigManager
 import time
 import json
+import threading
+import atexit
 
 class EventService:
-    def get_events(self, type: Optional[str] = None, limit: Optional[int] = None, offset: int = 0) -> List[Event]:
+    def get_events(self, type: Optional[str] = None, limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+        """
+        按时间倒序分页返回事件（API 驼峰格式）。最近的事件直接由内存环形缓冲回答，
+        超出缓冲范围的深度历史才查数据库。
+        """
+        if not limit or limit <= 0:
+            limit = 100 if offset > 0 else 50
+        page = recent_events.page(type or None, limit, offset)
+        if page is not None:
+            return page
         # 添加重试机制和异常处理
         for i in range(3):  # 最多重试2次
             try:
-                # 获取数据库连接状态
-                try:
-                    test_query = supabase.table("events").select("count(*)", count='exact').execute()
-                    print(f"数据库连接状态: 表events共有{test_query.count if hasattr(test_query, 'count') else '未知'}行数据")
-                except Exception as e:
-                    print(f"获取数据库表总行数失败: {e}")
-                
-                # 构建更灵活的查询
-                print(f"开始查询事件数据: type={type}, limit={limit}, offset={offset}")
-                query = supabase.table("events").select("*")
-                
-                # 如果指定了类型，则过滤
-                if type and type.strip():
-                    query = query.eq("type", type)
-                    print(f"按类型筛选: type={type}")
-                
-                # 强制按时间倒序排序
-                try:
-                    query = query.order("created_at", desc=True)
-                except Exception:
-                    # 如果created_at排序失败，尝试按start_time排序
-                    try:
-                        query = query.order("start_time", desc=True)
-                    except Exception:
-                        print("排序字段不存在，跳过排序")
-                
-                # 分页控制
-                if offset > 0:
-                    end_offset = offset + (limit or 100) - 1
-                    print(f"分页范围: {offset} - {end_offset}")
-                    query = query.range(offset, end_offset)
-                elif limit and limit > 0:
-                    print(f"仅限制数量: {limit}")
-                    query = query.limit(limit)
-                else:
-                    # 默认最多返回50条
-                    print("使用默认限制: 50条")
-                    query = query.limit(50)
-                
-                # 执行查询
-                print("执行Supabase查询...")
-                res = query.execute()
-                print(f"查询完成，获取到{len(res.data)}条事件")
-                
-                if not res.data:
-                    # 无结果，再查询一次不带任何条件的
-                    print("无查询结果，尝试不带条件查询...")
-                    raw_query = supabase.table("events").select("*").limit(10).execute()
-                    print(f"原始查询结果: {len(raw_query.data)}条")
-                    if raw_query.data:
-                        print(f"数据示例: {raw_query.data[0]}")
-                
-                # 处理数据，确保所有必要字段都存在
-                events = []
-                for e_data in res.data:
-                    # 确保字段名称一致
-                    if 'affected_agents' in e_data and isinstance(e_data['affected_agents'], str):
-                        try:
-                            e_data['affected_agents'] = json.loads(e_data['affected_agents'])
-                        except Exception as er:
-                            print(f"解析affected_agents失败: {er}")
-                            e_data['affected_agents'] = []
-                    
-                    # 确保时间戳是整数
-                    if 'start_time' in e_data and e_data['start_time'] is not None:
-                        try:
-                            e_data['start_time'] = int(e_data['start_time'])
-                        except Exception:
-                            e_data['start_time'] = int(time.time() * 1000)
-                    
-                    # 创建事件对象
-                    try:
-                        event = Event(**e_data)
-                        events.append(event)
-                    except Exception as ex:
-                        print(f"创建事件对象失败: {ex}, 数据: {e_data}")
-                        # 尝试创建最小事件对象
-                        try:
-                            event = Event(
-                                id=e_data.get('id', f"error-{int(time.time())}"),
-                                type=e_data.get('type', "ERROR"),
-                                description=e_data.get('description', str(e_data)),
-                                affectedAgents=e_data.get('affected_agents', []),
-                                startTime=e_data.get('start_time', int(time.time() * 1000)),
-                                duration=e_data.get('duration', 0)
-                            )
-                            events.append(event)
-                        except Exception:
-                            pass  # 如果连最小对象都创建失败则跳过
-                
-                print(f"成功转换{len(events)}个事件对象")
-                return events
+                return [to_api_event(row) for row in self._query_events(type, limit, offset)]
             except Exception as e:
                 if i < 2:  # 如果不是最后一次尝试
                     print(f"警告: 获取Event列表第{i+1}次尝试失败，将重试: {e}")
@@ -113,7 +45,84 @@ class EventService:
                     # 在最终失败时返回空列表，而不是抛异常中断整个API请求
                     return []
 
-    def add_event(self, event: Event) -> Event:
+    def _query_events(self, type: Optional[str], limit: int, offset: int) -> List[dict]:
+        query = supabase.table("events").select("*")
+        # 如果指定了类型，则过滤
+        if type and type.strip():
+            query = query.eq("type", type)
+        rows = query.order("created_at", desc=True).range(offset, offset + limit - 1).execute().data or []
+        for row in rows:
+            # 确保字段格式一致
+            if isinstance(row.get('affected_agents'), str):
+                try:
+                    row['affected_agents'] = json.loads(row['affected_agents'])
+                except Exception:
+                    row['affected_agents'] = []
+            if row.get('start_time') is not None:
+                try:
+                    row['start_time'] = int(row['start_time'])
+                except (TypeError, ValueError):
+                    row['start_time'] = None
+        return rows
+
+    def warm_load_recent_events(self) -> int:
+        """
+        启动时用数据库中最新的一批事件预热环形缓冲。
+        """
+        settings = ConfigManager.get_recent_events_settings()
+        if not settings.get('warmLoad', True):
+            return 0
+        capacity = recent_events.capacity
+        try:
+            rows = self._query_events(None, capacity + 1, 0)
+        except Exception as e:
+            print(f"警告: 预热最近事件缓冲失败: {e}")
+            return 0
+        recent_events.load(rows, complete=len(rows) <= capacity)
+        return len(recent_events)
+
+    def warm_load_policies(self) -> int:
+        """
+        启动时把数据库中最近的政策事件按发布时间加载进政策登记表。
+        政策按 is_policy_event 判定（Titan 生成的政策多为 LLM 类型，靠描述/meta 识别），
+        无法在查询中表达，因此分页扫描最近 warmLoadScanLimit 条事件在进程内分类，凑满 capacity 条即停。
+        """
+        settings = ConfigManager.get_policy_registry_settings()
+        if not settings.get('warmLoad', True):
+            return 0
+        scan_limit = settings.get('warmLoadScanLimit', 2000)
+        page_size = settings.get('warmLoadPageSize', 500)
+        policies = []
+        try:
+            for offset in range(0, scan_limit, page_size):
+                size = min(page_size, scan_limit - offset)
+                res = supabase.table("events").select("*").order("start_time", desc=True).range(offset, offset + size - 1).execute()
+                rows = res.data or []
+                for row in rows:
+                    event = Event(**{k: v for k, v in row.items() if k != 'embedding'})
+                    if is_policy_event(event):
+                        policies.append(event)
+                if len(policies) >= policy_registry.capacity or len(rows) < size:
+                    break
+        except Exception as e:
+            print(f"警告: 预热政策登记表失败: {e}")
+        return policy_registry.load(reversed(policies[:policy_registry.capacity]))
+
+    def add_event(self, event: Event, defer: Optional[bool] = None) -> Event:
+        """
+        受理事件：默认只做字段整理并交给事件流水线（persist → enrich → fanout）后立即返回；
+        defer=False 时在调用线程内同步执行全部阶段。入口队列满时抛 PipelineFull。
+        """
+        job = {"event": event, "row": self._event_row(event)}
+        if defer is None:
+            defer = ConfigManager.get_event_pipeline_settings().get('async', True)
+        if defer:
+            event_pipeline.submit(job)
+        else:
+            event_pipeline.run_inline(job)
+        return event
+
+    def _event_row(self, event: Event) -> dict:
         # 创建要存储的事件数据字典
         event_dict = event.dict(exclude_none=True)
         
@@ -126,79 +135,83 @@ class EventService:
         # 添加created_at字段到字典中，而不是直接设置到Event对象上
         event_dict['created_at'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
         
-        # 自动生成 embedding
-        if getattr(event, 'embedding', None) is None and getattr(event, 'description', None):
-            try:
-                embedding = LLMService().get_embedding(event.description)
-                event_dict['embedding'] = embedding
-            except Exception as e:
-                print(f"警告: 生成Event embedding失败: {e}")
-        
         # 强制校验 affected_agents 字段
         if 'affected_agents' in event_dict and (not isinstance(event_dict['affected_agents'], list) or not all(isinstance(a, str) for a in event_dict['affected_agents'])):
             print(f"[add_event] affected_agents 字段类型异常: {event_dict['affected_agents']}")
             event_dict['affected_agents'] = []
-        
+        return event_dict
+
+    def _persist_event(self, job: dict):
+        # 流水线 persist 阶段：写入事件行（失败由流水线重试，最终失败则不再执行后续阶段）。
+        # 按 id upsert：写入成功但响应超时/出错后的重试不会主键冲突，也不会把已存储的事件判为失败
+        supabase.table("events").upsert(job["row"]).execute()
+        recent_events.add(job["row"])
+        agent_event_index.add(job["event"].id, job["row"].get('start_time'), job["row"].get('affected_agents') or [])
+        policy_registry.observe(job["event"])
+
+    def _enrich_event(self, job: dict):
+        # 流水线 enrich 阶段：补生成 embedding 并写回事件行，再加入进程内向量索引
+        event, row = job["event"], job["row"]
+        if row.get('embedding') is None:
+            if not event.description:
+                return
+            row['embedding'] = LLMService().get_embedding(event.description)
+            supabase.table("events").update({"embedding": row['embedding']}).eq("id", event.id).execute()
+        event_index.add(event.id, row['embedding'], {k: v for k, v in row.items() if k != 'embedding'})
+
+    def _fan_out_event(self, job: dict):
+        # 流水线 fanout 阶段：政策记忆同步、受影响 agent 的记忆/属性/情感/关系。
+        # 失败时流水线会重试整个阶段：已完成的副作用记在 job["done"] 中，重试时跳过，不会重复计数或叠加增量
+        event = job["event"]
+        done = job.setdefault("done", set())
         # 环境类记忆自动同步（如政策/税率变动）
-        is_policy = event.type.upper() == 'POLICY' or \
-            ('税' in event.description or '政策' in event.description or (event.meta and ('税' in str(event.meta) or '政策' in str(event.meta))))
-        if is_policy:
+        if is_policy_event(event) and 'policy' not in done:
             try:
-                agent_service = AgentService()
-                memory_service = MemoryService()
-                agents = agent_service.get_agents()
-                for agent in agents:
-                    # 删除旧的政策/税率相关记忆
-                    old_memories = memory_service.get_memories(agent.id, limit=100)
-                    for mem in old_memories:
-                        if '税' in mem.content or '政策' in mem.content:
-                            memory_service.delete_memory(mem.id)
-                    # 写入最新政策记忆
-                    mem = Memory(
-                        id=f"{event.id}-{agent.id}-policy",
-                        agent_id=agent.id,
-                        content=f"最新政策/税率: {event.description}",
-                        timestamp=event.startTime,
-                        importance=3,
-                        type="POLICY",
-                        related_agents=[],
-                        tags=["policy"]
-                    )
-                    memory_service.add_memory(mem)
+                # 多个 fanout 线程间串行替换；按 startTime 排序而不是按到达顺序：
+                # 早于已应用政策的事件迟到（或重试）时跳过，不会覆盖较新的政策
+                with _policy_lock:
+                    latest = _applied_policy["startTime"]
+                    if latest is not None and event.startTime < latest:
+                        print(f"警告: 政策事件 {event.id} 早于已应用的政策 {_applied_policy['id']}，跳过政策记忆同步")
+                    else:
+                        PolicyMemoryService().replace_policy_memories(event)
+                        _applied_policy.update(startTime=event.startTime, id=event.id)
             except Exception as e:
                 print(f"警告: 同步政策记忆失败: {e}")
-        
-        # 写入事件，添加异常处理
-        try:
-            print(f"准备写入事件数据: {event_dict}")
-            supabase.table("events").insert(event_dict).execute()
-            # 成功才执行后续操作
-            try:
-                # 自动为受影响 agent 写入记忆，并同步属性
-                self._write_event_memories_and_update_agents(event)
-                # 事件后自动调整情感和关系分数
-                self._auto_adjust_emotion_and_relationship(event)
-            except Exception as e:
-                print(f"警告: 处理事件后续影响失败: {e}")
-            return event
-        except Exception as e:
-            print(f"错误: 添加Event失败: {e}")
-            return event  # 仍返回event对象，但数据库操作失败
+            done.add('policy')
+        # 本事件对各 agent 的属性/情感/关系补丁合并后，每个 agent 只写一次；
+        # 补丁只在全部收集成功后统一写出，中途失败的尝试不会留下写了一半的补丁
+        updates = AgentUpdateCoalescer()
+        # 自动为受影响 agent 写入记忆，并同步属性
+        self._write_event_memories_and_update_agents(event, updates, done)
+        # 事件后自动调整情感和关系分数
+        self._auto_adjust_emotion_and_relationship(event, updates)
+        if 'agents' not in done:
+            updates.flush()
+            done.add('agents')
 
     def delete_event(self, event_id: str) -> bool:
         try:
             res = supabase.table("events").delete().eq("id", event_id).execute()
+            event_index.remove(event_id)
+            recent_events.remove(event_id)
+            agent_event_index.remove(event_id)
+            policy_registry.remove(event_id)
+            event_lifetime.cancel(event_id)
             return bool(res.data)
         except Exception as e:
             print(f"错误: 删除Event {event_id} 失败: {e}")
             return False
 
-    def _write_event_memories_and_update_agents(self, event: Event):
-        agent_service = AgentService()
+    def _write_event_memories_and_update_agents(self, event: Event, updates: AgentUpdateCoalescer, done: Optional[set] = None):
+        # done 记录已完成的副作用（fanout 重试时跳过）
+        done = set() if done is None else done
+        # 先收集本事件产生的所有记忆，最后统一批量 embedding + bulk insert
+        memories = []
         # 新增：支持互动事件写入双方记忆
         if event.from_agent and event.to_agent and event.content:
             # 发起者记忆
-            mem_from = Memory(
+            memories.append(Memory(
                 id=f"{event.id}-{event.from_agent}-from",
                 agent_id=event.from_agent,
                 content=f"你对{event.to_agent}说: {event.content}",
@@ -207,10 +220,9 @@ class EventService:
                 type="DIALOGUE",
                 related_agents=[event.to_agent],
                 tags=[event.type.lower()]
-            )
-            MemoryService().add_memory(mem_from)
+            ))
             # 接收者记忆
-            mem_to = Memory(
+            memories.append(Memory(
                 id=f"{event.id}-{event.to_agent}-to",
                 agent_id=event.to_agent,
                 content=f"{event.from_agent}对你说: {event.content}",
@@ -219,42 +231,56 @@ class EventService:
                 type="DIALOGUE",
                 related_agents=[event.from_agent],
                 tags=[event.type.lower()]
-            )
-            MemoryService().add_memory(mem_to)
-            # 受影响agent属性更新（如有impact）
-            for agent_id in [event.from_agent, event.to_agent]:
-                if event.impact:
-                    agent_service.update_agent(agent_id, {k: v for k, v in event.impact.items()})
+            ))
+            impacted_agents = [event.from_agent, event.to_agent]
         else:
-            for agent_id in event.affected_agents:
+            for agent_id in event.affectedAgents:
                 # 写入记忆
-                mem = Memory(
+                memories.append(Memory(
                     id=f"{event.id}-{agent_id}",
                     agent_id=agent_id,
                     content=f"参与事件: {event.description}",
                     timestamp=event.startTime,
                     importance=2,
                     type="EVENT",
-                    related_agents=event.affected_agents,
+                    related_agents=event.affectedAgents,
                     tags=[event.type.lower()]
-                )
-                MemoryService().add_memory(mem)
-                # 更新 agent 属性（如有 impact）
-                if event.impact:
-                    agent_service.update_agent(agent_id, {k: v for k, v in event.impact.items()})
+                ))
+            impacted_agents = event.affectedAgents
+            # 小范围的多人事件记为两两共同参与，供关系图统计常互动的伙伴
+            max_group = ConfigManager.get_relationship_settings().get('groupInteractionMaxAgents', 50)
+            if 1 < len(event.affectedAgents) <= max_group and 'group' not in done:
+                relationship_graph.record_group(event.affectedAgents, event.startTime)
+                done.add('group')
+        if memories and 'memories' not in done:
+            MemoryService().add_memories(memories)
+            done.add('memories')
+        # 受影响agent属性更新（如有impact）：数值属性增量对全体受影响者做一次数组运算，
+        # 有持续时间的事件交给生命周期调度器，在 startTime 生效、到期撤销；其余字段（emotion/state 等）经合并器写入
+        if event.impact:
+            if 'attributes' not in done:
+                lifetime = ConfigManager.get_event_lifetime_settings().get('enabled', True)
+                if not (lifetime and event_lifetime.register(event, impacted_agents)):
+                    world_state.apply_attribute_deltas(impacted_agents, event.impact)
+                done.add('attributes')
+            field_impact = {k: v for k, v in event.impact.items() if k not in ATTRIBUTE_COLUMNS}
+            if field_impact:
+                for agent_id in impacted_agents:
+                    updates.apply_impact(agent_id, field_impact)
 
     def search_events_by_embedding(self, query_embedding: list, top_k: int = 5) -> list:
+        if event_index.ready:
+            return [Event(**payload) for payload, _ in event_index.search(query_embedding, top_k)]
         res = supabase.rpc("match_events", {"query_embedding": query_embedding, "match_count": top_k}).execute()
         return [Event(**e) for e in res.data]
 
-    def _auto_adjust_emotion_and_relationship(self, event: Event):
+    def _auto_adjust_emotion_and_relationship(self, event: Event, updates: AgentUpdateCoalescer):
         agent_service = AgentService()
         # 只处理有from_agent和to_agent的互动事件
         if event.from_agent and event.to_agent:
-            # 获取双方Agent
-            agents = {a.id: a for a in agent_service.get_agents() if a.id in [event.from_agent, event.to_agent]}
-            from_agent = agents.get(event.from_agent)
-            to_agent = agents.get(event.to_agent)
+            # 双方Agent都存在于世界状态中才调整
+            from_agent = agent_service.get_agent(event.from_agent)
+            to_agent = agent_service.get_agent(event.to_agent)
             # 关系调整规则
             positive_types = ["DIALOGUE", "GIFT", "COOPERATION", "REQUEST_HELP"]
             negative_types = ["CONFLICT", "REFUSE", "NEGATIVE"]
@@ -274,18 +300,44 @@ class EventService:
                 rel_delta = -0.2
                 emotion_to = "失落"
                 emotion_from = "不满"
-            # 调整关系分数
+            # 调整关系分数（双向），与情感一起合并为每个 agent 一次写入
             if from_agent and to_agent:
-                # from_agent对to_agent
-                rels = from_agent.relationships or {}
-                rels[to_agent.id] = round(rels.get(to_agent.id, 0.0) + rel_delta, 2)
-                agent_service.update_agent(from_agent.id, AgentUpdateModel(relationships=rels))
-                # to_agent对from_agent
-                rels2 = to_agent.relationships or {}
-                rels2[from_agent.id] = round(rels2.get(from_agent.id, 0.0) + rel_delta, 2)
-                agent_service.update_agent(to_agent.id, AgentUpdateModel(relationships=rels2))
+                if rel_delta:
+                    updates.add_relationship_delta(from_agent.id, to_agent.id, rel_delta)
+                    updates.add_relationship_delta(to_agent.id, from_agent.id, rel_delta)
                 # 情感调整
                 if emotion_from:
-                    agent_service.update_agent(from_agent.id, AgentUpdateModel(emotion=emotion_from))
+                    updates.set_field(from_agent.id, "emotion", emotion_from)
                 if emotion_to:
-                    agent_service.update_agent(to_agent.id, AgentUpdateModel(emotion=emotion_to)) 
\ No newline at end of file
+                    updates.set_field(to_agent.id, "emotion", emotion_to)
+
+
+def _make_pipeline() -> EventPipeline:
+    settings = ConfigManager.get_event_pipeline_settings()
+    stages = settings.get('stages', {})
+    service = EventService()
+
+    def options(name, optional=False):
+        stage = stages.get(name, {})
+        return {
+            'workers': stage.get('workers', 4),
+            'queue_size': stage.get('queueSize', 1000),
+            'max_retries': stage.get('maxRetries', 2),
+            'retry_backoff': stage.get('retryBackoffSeconds', 0.5),
+            'optional': optional,
+        }
+
+    return EventPipeline([
+        ("persist", service._persist_event, options('persist')),
+        ("enrich", service._enrich_event, options('enrich', optional=True)),  # embedding 失败不影响后续副作用
+        ("fanout", service._fan_out_event, options('fanout')),
+    ], accept_timeout=settings.get('acceptTimeoutSeconds', 0.5))
+
+
+_policy_lock = threading.Lock()
+# 最近一次成功同步到政策记忆的政策事件（在 _policy_lock 内读写）
+_applied_policy = {"startTime": None, "id": None}
+
+# 进程级事件流水线，进程退出时（shutdown 钩子或 atexit）处理完已受理的事件
+event_pipeline = _make_pipeline()
+atexit.register(event_pipeline.close)
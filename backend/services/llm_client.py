@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from backend.config_manager import ConfigManager
+
+# 进程级客户端注册表：同一 base_url + api_key 共享一个带连接池的客户端，
+# 避免每次决策/事件/embedding 都重新建连、重新握手。
+_clients: Dict[Tuple[str, str], OpenAI] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _client_key(base_url: str, api_key: str) -> Tuple[str, str]:
+    # api_key 只以摘要形式作为键，避免明文常驻在注册表里
+    return base_url.rstrip('/'), hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()
+
+
+def _pool_limits(settings: dict) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.get('maxConnections', 64),
+        max_keepalive_connections=settings.get('maxKeepaliveConnections', 32),
+        keepalive_expiry=settings.get('keepaliveExpiry', 30.0),
+    )
+
+
+def _timeout(settings: dict) -> httpx.Timeout:
+    return httpx.Timeout(
+        settings.get('readTimeout', 120.0),
+        connect=settings.get('connectTimeout', 5.0),
+    )
+
+
+def get_llm_client(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    """
+    获取（或创建）共享的同步 OpenAI 兼容客户端，底层 httpx 连接池 keep-alive 复用。
+    """
+    settings = ConfigManager.get_llm_client_settings()
+    base_url = base_url or settings['baseUrl']
+    key = _client_key(base_url, api_key)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=settings.get('maxRetries', 2),
+                timeout=_timeout(settings),
+                http_client=httpx.Client(limits=_pool_limits(settings), timeout=_timeout(settings)),
+            )
+            _clients[key] = client
+        return client
+
+
+def get_async_llm_client(api_key: str, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """
+    获取共享的异步客户端。httpx.AsyncClient 的连接池绑定在事件循环上，
+    因此按当前运行中的事件循环分别缓存，循环被回收后对应客户端随之释放。
+    """
+    settings = ConfigManager.get_llm_client_settings()
+    base_url = base_url or settings['baseUrl']
+    key = _client_key(base_url, api_key)
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _async_clients.setdefault(loop, {})
+        client = per_loop.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=settings.get('maxRetries', 2),
+                timeout=_timeout(settings),
+                http_client=httpx.AsyncClient(limits=_pool_limits(settings), timeout=_timeout(settings)),
+            )
+            per_loop[key] = client
+        return client
+
+
+def reset_llm_clients():
+    """
+    关闭并清空同步客户端（配置热加载后调用，使新的连接池参数生效）。
+    异步客户端随各自事件循环释放。
+    """
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _async_clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            print(f"警告: 关闭LLM客户端失败: {e}")
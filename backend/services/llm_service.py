@@ -1,11 +1,17 @@
 import time
-from typing import Optional
+from typing import Callable, List, Optional
 from backend.models import Memory, Agent, Event
 from backend.state import DASHSCOPE_API_KEY, events
-from openai import OpenAI
+from backend.services.llm_client import get_llm_client
 import os
 import json
 from backend.config import LLM_MODELS, EVENT_GENERATOR_PRESET
+from backend.config_manager import ConfigManager
+from backend.services.embedding_cache import embedding_cache
+from backend.services.memory_ranker import MemoryRanker
+from backend.services.relationship_graph import relationship_graph
+from backend.services.policy_registry import policy_registry
+from backend.services.simulation_clock import simulation_clock
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
@@ -15,29 +21,32 @@ class LLMService:
             raise ValueError(f"Agent {agent.name} 未配置决策prompt (llmPrompts['decision'])")
         prompt_template = agent.llmPrompts['decision']
         # 1. 身份自觉
-        identity = f"我是{getattr(agent, 'role', '未知角色')}{agent.name}，职责是{getattr(agent, 'duty', getattr(agent, 'role', '履行本职工作'))}。"
-        # 2. 高频互动对象分析
-        from collections import Counter
-        partners = []
-        for m in agent.memories:
-            if hasattr(m, 'relatedAgents') and m.relatedAgents:
-                partners.extend(m.relatedAgents)
-        top_partners = [p for p, _ in Counter(partners).most_common(3)]
+        identity = f"我是{agent.role or '未知角色'}{agent.name}，职责是{getattr(agent, 'duty', None) or agent.role or '履行本职工作'}。"
+        # 2. 高频互动对象分析（关系图按互动次数取前 3，与记忆条数无关）
+        top_partners = [self._agent_name(p) for p, _, _ in relationship_graph.top_partners(agent.id, 3)]
         rel_str = f"我最近经常和{', '.join(top_partners)}互动。" if top_partners else ''
         # 3. 记忆回溯（优先用向量检索，补充最近3条重要记忆）
+        # 所有记忆段都从同一次向量化排序结果中取，不再多次排序
+        ranked = MemoryRanker().rank(agent.memories)
+        latest_heard = ranked.latest('DIALOGUE', lambda m: bool(m.content) and '对你说' in m.content)
         context_text = ''
-        for m in sorted(agent.memories, key=lambda m: -m.timestamp):
-            if m.type == 'DIALOGUE' and m.content and '对你说' in m.content:
-                context_text = m.content
-                break
-        if not context_text and agent.memories:
-            context_text = agent.memories[-1].content
-        vector_memories = []
+        if latest_heard:
+            context_text = latest_heard.content
+        elif agent.memories:
+            context_text = ranked.recent(1)[0].content
+        # 同一情境只计算一次 embedding，记忆/事件/Agent 三路检索共用
+        context_embedding = None
         if context_text:
             try:
-                embedding = self.get_embedding(context_text)
+                context_embedding = self.get_embedding(context_text)
+            except Exception as e:
+                context_embedding = None
+        vector_memories = []
+        if context_embedding is not None:
+            try:
                 from backend.services.memory_service import MemoryService
-                vector_memories = MemoryService().search_memories_by_embedding(embedding, 5)
+                # 只检索本人的记忆，避免把其他居民的记忆注入 prompt
+                vector_memories = MemoryService().search_agent_memories(agent.id, context_embedding, 5)
             except Exception as e:
                 vector_memories = []
         vector_mem_str = ''
@@ -45,24 +54,33 @@ class LLMService:
             vector_mem_str = "\n【与当前情境最相关的历史记忆】\n" + "\n".join([f"- {m.content}" for m in vector_memories])
         # 新增：相关事件推荐
         event_str = ''
-        if context_text:
+        if context_embedding is not None:
             try:
-                similar_events = self.get_similar_events_by_context(context_text, 3)
+                similar_events = self.get_similar_events_by_context(context_text, 3, embedding=context_embedding)
                 if similar_events:
                     event_str = "\n【与当前情境最相关的历史事件】\n" + "\n".join([f"- {e.description}" for e in similar_events])
             except Exception as e:
                 event_str = ''
         # 新增：相关Agent推荐
         agent_str = ''
-        if context_text:
+        if context_embedding is not None:
             try:
-                similar_agents = self.get_similar_agents_by_context(context_text, 3)
+                similar_agents = self.get_similar_agents_by_context(context_text, 3, embedding=context_embedding)
                 if similar_agents:
                     agent_str = "\n【与你最相似的Agent】\n" + "\n".join([f"- {a.name}" for a in similar_agents if a.id != agent.id])
             except Exception as e:
                 agent_str = ''
-        # 依然保留最近3条重要记忆
-        important_memories = sorted(agent.memories, key=lambda m: (-m.importance, -m.timestamp))[:3]
+        # 最近亲历的事件：倒排索引 + 最近事件缓冲，纯内存读取
+        witnessed_str = ''
+        try:
+            from backend.services.log_service import LogService
+            witnessed = [d for d in LogService().recent_event_descriptions(agent.id, 3) if d]
+            if witnessed:
+                witnessed_str = "\n【最近亲历的事件】\n" + "\n".join([f"- {d}" for d in witnessed])
+        except Exception as e:
+            witnessed_str = ''
+        # 依然保留3条综合得分最高的记忆（近因 × 重要性 × 相关度）
+        important_memories = ranked.with_relevance(context_embedding, agent.id).top(3)
         mem_str = "最近记忆片段：" + "; ".join([m.content for m in important_memories]) if important_memories else ''
         # 4. 目标动机
         goals = getattr(agent, 'goals', None) or getattr(agent, 'goal', None) or '暂无明确目标'
@@ -71,43 +89,36 @@ class LLMService:
         emotion_str = f"【情感状态】你当前的情感是：{mood}。\n"
         # 6. 社会关系（与所有可见Agent的关系分数）
         relationships_str = ""
-        if hasattr(agent, 'relationships') and agent.relationships:
-            rels = []
-            for other_id, score in agent.relationships.items():
-                rels.append(f"与{other_id}的关系分数：{score}")
-            if rels:
-                relationships_str = "【社会关系】" + "; ".join(rels) + "\n"
+        rels = [f"与{self._agent_name(other_id)}的关系分数：{round(score, 2)}"
+                for other_id, score, _ in relationship_graph.top_partners(agent.id, 5, by='affinity')]
+        if rels:
+            relationships_str = "【社会关系】" + "; ".join(rels) + "\n"
         # 7. 历史多轮对话（与最近互动对象的DIALOGUE记忆）
-        dialogue_history = []
-        for m in sorted(agent.memories, key=lambda m: -m.timestamp):
-            if m.type == 'DIALOGUE' and m.content:
-                dialogue_history.append(m.content)
-            if len(dialogue_history) >= 5:
-                break
+        dialogue_history = [m.content for m in ranked.recent(5, 'DIALOGUE', lambda m: bool(m.content))]
         dialogue_history_str = ""
         if dialogue_history:
             dialogue_history_str = "【历史对话】\n" + "\n".join(dialogue_history) + "\n"
-        # 8. 当前环境
+        # 8. 当前环境：只列出视野半径内最近的若干人（网格索引查询，与全镇人数无关）
+        from backend.services.world_state import world_state
+        spatial_settings = ConfigManager.get_spatial_settings()
         visible_agents_str = ''
-        for other in filter(lambda a: a.id != agent.id, self.get_all_agents()):
-            rel = agent.relationships.get(other.id)
-            if rel:
-                visible_agents_str += f"- {other.name}（好感度:{rel.affinity} 互动:{rel.interactions} 最近:{rel.lastInteraction or '无'}) 正在{other.currentAction or '这里'}\n"
+        nearby = world_state.visible_agents(agent, spatial_settings.get('visionRadius', 150), spatial_settings.get('maxVisibleAgents', 8))
+        for other in nearby:
+            affinity, interactions, last = relationship_graph.get(agent.id, other.id)
+            if affinity or interactions:
+                last_str = time.strftime('%H:%M', time.localtime(last / 1000)) if last else '无'
+                visible_agents_str += f"- {other.name}（好感度:{round(affinity, 2)} 互动:{interactions} 最近:{last_str}) 正在{other.currentAction or '这里'}\n"
             else:
                 visible_agents_str += f"- {other.name}（初次见面）正在{other.currentAction or '这里'}\n"
-        from backend.state import events as global_events
-        policies = [e for e in global_events if '政策' in e.description or 'policy' in (e.meta or {})]
-        policies_str = ''
-        for p in policies[-3:]:
-            meta = p.meta or {}
-            policies_str += f"- {p.description} 类型:{meta.get('type','未知')} 目标:{meta.get('target','未知')} 影响:{meta.get('affectedAgents',meta.get('affected_agents','未知'))}\n"
+        # 最近的有效政策由政策登记表直接给出，不扫描事件历史
+        policies_str = ''.join(f"- {p.describe()}\n" for p in policy_registry.recent(3))
         env_str = (
             f"你现在在({agent.position.get('x')}, {agent.position.get('y')})，地形：{getattr(agent, 'tileType', '未知地形')}。时间：{getattr(agent, 'timeOfDay', getattr(agent, 'state', '未知时间'))}\n"
             f"你视野内的人：\n{visible_agents_str.strip()}\n"
             f"当前全局政策：\n{policies_str.strip()}"
         )
         # 8. 自我反思与成长机制
-        recent_memories = sorted(agent.memories, key=lambda m: -m.timestamp)[:10]
+        recent_memories = ranked.recent(10)
         all_text = ' '.join([m.content for m in recent_memories])
         import re
         words = re.findall(r'[\u4e00-\u9fa5A-Za-z]+', all_text)
@@ -126,11 +137,9 @@ class LLMService:
         # 多轮对话闭环：优先拼接"别人对我说"的最新DIALOGUE记忆
         recent_dialogue = None
         from_agent = None
-        for m in sorted(agent.memories, key=lambda m: -m.timestamp):
-            if m.type == 'DIALOGUE' and m.content and '对你说' in m.content:
-                recent_dialogue = m.content
-                from_agent = m.content.split('对你说')[0]
-                break
+        if latest_heard:
+            recent_dialogue = latest_heard.content
+            from_agent = latest_heard.content.split('对你说')[0]
         dialogue_str = f"你刚刚收到消息：{recent_dialogue}\n" if recent_dialogue else ''
         # 7. 结构化思考链条prompt拼接
         prompt = (
@@ -142,6 +151,7 @@ class LLMService:
             f"【社会关系】{rel_str}\n" +
             vector_mem_str +
             event_str +
+            witnessed_str +
             agent_str +
             f"\n【记忆回溯】{mem_str}\n" +
             f"【目标动机】{goals}\n" +
@@ -154,10 +164,49 @@ class LLMService:
         )
         return prompt
 
+    def _triggered_event(self, agent: Agent, content: str, source: Optional[Event] = None) -> Optional[Event]:
+        """
+        解析反应 JSON 中的 triggeredEvent（字符串或对象）为事件，受影响者按名字或 id 匹配，默认只有发起者本人。
+        """
+        try:
+            start, end = content.index('{'), content.rindex('}')
+            data = json.loads(content[start:end + 1])
+        except ValueError:
+            return None
+        triggered = data.get('triggeredEvent') if isinstance(data, dict) else None
+        if not triggered:
+            return None
+        if not isinstance(triggered, dict):
+            triggered = {'description': str(triggered)}
+        names = triggered.get('affectedAgents') or triggered.get('targets') or [triggered.get('target')]
+        names = names if isinstance(names, list) else [names]
+        by_name = {a.name: a.id for a in self.get_all_agents()}
+        affected = [agent.id] + [by_name.get(n, n) for n in names if n and by_name.get(n, n) != agent.id]
+        impact = triggered.get('impact') if isinstance(triggered.get('impact'), dict) else {}
+        # 按模拟时间计时，加速运行时持续时间与生命周期调度一致
+        now = simulation_clock.now_ms()
+        return Event(
+            # 同一 agent 可能在同一层对多个事件反应，id 带上来源事件避免主键冲突
+            id=f"{now}-{agent.id}-from-{source.id if source else 'none'}",
+            type=str(triggered.get('type', 'TRIGGERED')).upper(),
+            description=triggered.get('description') or f"{agent.name}引发的事件",
+            affected_agents=[a for a in dict.fromkeys(affected) if isinstance(a, str)],
+            start_time=now,
+            duration=int(triggered.get('duration', 60000)),
+            impact=impact,
+            meta={"triggeredBy": agent.id},
+            from_agent=agent.id,
+        )
+
+    def _agent_name(self, agent_id: str) -> str:
+        from backend.services.world_state import world_state
+        other = world_state.get_agent(agent_id)
+        return other.name if other else agent_id
+
     def get_all_agents(self):
-        # 避免循环依赖，延迟导入
-        from backend.state import agents
-        return agents
+        # 避免循环依赖，延迟导入；直接读进程内世界状态
+        from backend.services.world_state import world_state
+        return world_state.agents
 
     def generate_system_prompt(self, agent: Agent) -> str:
         if not hasattr(agent, 'llmPrompts') or 'system' not in agent.llmPrompts:
@@ -171,12 +220,19 @@ class LLMService:
 
     def generate_agent_reaction(self, agent: Agent, event: Event) -> str:
         context_text = event.description or ''
-        vector_memories = []
+        # 同一情境只计算一次 embedding，记忆/事件/Agent 三路检索共用
+        context_embedding = None
         if context_text:
             try:
-                embedding = self.get_embedding(context_text)
+                context_embedding = self.get_embedding(context_text)
+            except Exception as e:
+                context_embedding = None
+        vector_memories = []
+        if context_embedding is not None:
+            try:
                 from backend.services.memory_service import MemoryService
-                vector_memories = MemoryService().search_memories_by_embedding(embedding, 5)
+                # 只检索本人的记忆，避免把其他居民的记忆注入 prompt
+                vector_memories = MemoryService().search_agent_memories(agent.id, context_embedding, 5)
             except Exception as e:
                 vector_memories = []
         vector_mem_str = ''
@@ -184,25 +240,27 @@ class LLMService:
             vector_mem_str = "\n【与当前事件最相关的历史记忆】\n" + "\n".join([f"- {m.content}" for m in vector_memories])
         # 新增：相关事件推荐
         event_str = ''
-        if context_text:
+        if context_embedding is not None:
             try:
-                similar_events = self.get_similar_events_by_context(context_text, 3)
+                similar_events = self.get_similar_events_by_context(context_text, 3, embedding=context_embedding)
                 if similar_events:
                     event_str = "\n【与当前事件最相关的历史事件】\n" + "\n".join([f"- {e.description}" for e in similar_events])
             except Exception as e:
                 event_str = ''
         # 新增：相关Agent推荐
         agent_str = ''
-        if context_text:
+        if context_embedding is not None:
             try:
-                similar_agents = self.get_similar_agents_by_context(context_text, 3)
+                similar_agents = self.get_similar_agents_by_context(context_text, 3, embedding=context_embedding)
                 if similar_agents:
                     agent_str = "\n【与你最相似的Agent】\n" + "\n".join([f"- {a.name}" for a in similar_agents if a.id != agent.id])
             except Exception as e:
                 agent_str = ''
-        memories = agent.memories[-5:]
+        ranked = MemoryRanker().rank(agent.memories).with_relevance(context_embedding, agent.id)
+        memories = ranked.top(5)
         mem_str = '\n'.join(f"- {m.content}" for m in memories) or '（无）'
-        relationships = ', '.join(f"{k}: 好感度{v.affinity}" for k, v in agent.relationships.items()) or '（无）'
+        relationships = ', '.join(f"{self._agent_name(k)}: 好感度{round(v, 2)}"
+                                  for k, v, _ in relationship_graph.top_partners(agent.id, 5, by='affinity')) or '（无）'
         traits = ', '.join(agent.traits) if getattr(agent, 'traits', None) else ''
         needs = ', '.join(f"{k}:{v}" for k, v in getattr(agent, 'needs', {}).items()) if getattr(agent, 'needs', None) else ''
         attributes = ''
@@ -210,12 +268,12 @@ class LLMService:
             attrs = agent.attributes.dict() if hasattr(agent.attributes, 'dict') else (agent.attributes if isinstance(agent.attributes, dict) else vars(agent.attributes))
             attributes = ', '.join(f"{k}:{v}" for k, v in attrs.items())
         mood = getattr(agent, 'emotion', None) or getattr(agent, 'mood', '普通')
-        role = getattr(agent, 'role', '未知')
-        income = getattr(agent, 'income', '未知')
-        sensitivity = getattr(agent, 'sensitivity', {})
-        from backend.state import events as global_events
-        policies = [e for e in global_events if '政策' in e.description or 'policy' in (e.meta or {})]
-        policy_str = '\n'.join(f"- {p.description}" for p in policies[-3:]) if policies else '无'
+        emotion_str = f"【情感状态】你当前的情感是：{mood}。\n"
+        role = agent.role or '未知'
+        income = agent.income if agent.income is not None else '未知'
+        sensitivity = agent.sensitivity or {}
+        policies = policy_registry.recent(3)
+        policy_str = '\n'.join(f"- {p.description}" for p in policies) if policies else '无'
         impact_str = ''
         if hasattr(event, 'impact') and event.impact:
             impact_str = '\n你受到的影响：' + ', '.join(f"{k}:{v}" for k,v in event.impact.items())
@@ -230,15 +288,10 @@ class LLMService:
             if rels:
                 relationships_str = "【与事件相关Agent的关系】" + "; ".join(rels) + "\n"
         # 历史多轮对话（与事件相关Agent的DIALOGUE记忆）
-        dialogue_history = []
-        for m in sorted(agent.memories, key=lambda m: -m.timestamp):
-            if m.type == 'DIALOGUE' and m.content and (
-                (event and event.from_agent and event.from_agent in (m.relatedAgents or [])) or
-                (event and event.to_agent and event.to_agent in (m.relatedAgents or []))
-            ):
-                dialogue_history.append(m.content)
-            if len(dialogue_history) >= 5:
-                break
+        dialogue_history = [m.content for m in ranked.recent(5, 'DIALOGUE', lambda m: bool(m.content) and (
+            (event and event.from_agent and event.from_agent in (m.relatedAgents or [])) or
+            (event and event.to_agent and event.to_agent in (m.relatedAgents or []))
+        ))]
         dialogue_history_str = ""
         if dialogue_history:
             dialogue_history_str = "【历史对话】\n" + "\n".join(dialogue_history) + "\n"
@@ -268,7 +321,12 @@ class LLMService:
             f"如果你的反应会引发新的事件或影响其他agent，请在JSON中用 triggeredEvent 字段详细描述（如通知、协作、经济反馈、请求帮助等）。\n请输出你的反应，格式为JSON。"
         )
 
-    def llm_decide(self, agent: Agent, prompt: str, mode: str = 'decision', event: Optional[Event] = None) -> Optional[Memory]:
+    def llm_decide(self, agent: Agent, prompt: str, mode: str = 'decision', event: Optional[Event] = None,
+                   emit: Optional[Callable[[Event], bool]] = None) -> Optional[Memory]:
+        """
+        emit 不为空时（事件级联中），行为链互动与 triggeredEvent 产生的事件交给 emit，由级联执行器限额并写入；
+        否则直接写入事件流水线。
+        """
         from backend.services.memory_service import MemoryService
         if not DASHSCOPE_API_KEY:
             raise RuntimeError("DASHSCOPE_API_KEY未配置")
@@ -283,11 +341,8 @@ class LLMService:
                 f"用户输入：{prompt}\n"
                 f"请决定你的下一步行动："
             )
-        # 使用 openai.OpenAI 兼容阿里云百炼
-        client = OpenAI(
-            api_key=DASHSCOPE_API_KEY,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-        )
+        # 使用 openai.OpenAI 兼容阿里云百炼（进程内共享连接池）
+        client = get_llm_client(DASHSCOPE_API_KEY)
         model = agent.llmModel or "qwen-max"
         messages = [
             {"role": "user", "content": full_prompt}
@@ -319,14 +374,20 @@ class LLMService:
             return None
         actions = parse_llm_action_chain(content)
         if actions:
-            for act in actions:
+            # 避免循环依赖，延迟导入
+            from backend.services.event_service import EventService
+            from backend.services.event_pipeline import PipelineFull
+            from backend.services.agent_update_coalescer import AgentUpdateCoalescer
+            # 行为链中的多次移动合并为一次写入，以最后一次为准
+            updates = AgentUpdateCoalescer()
+            for i, act in enumerate(actions):
                 action_type = act.get('action', '').upper()
                 # MOVE
                 if action_type == 'MOVE' and 'target_position' in act:
                     x, y = act['target_position']
                     x = max(0, min(800, int(x)))
                     y = max(0, min(600, int(y)))
-                    AgentService().update_agent(agent.id, AgentUpdateModel(position={'x': x, 'y': y}))
+                    updates.set_field(agent.id, 'position', {'x': x, 'y': y})
                 # 互动类
                 elif action_type in ('SPEAK', 'TALK', 'INTERACT', 'GIFT', 'COOPERATE', 'REQUEST_HELP'):
                     target_name = act.get('target')
@@ -344,11 +405,12 @@ class LLMService:
                             'REQUEST_HELP': 'REQUEST_HELP',
                         }.get(action_type, 'DIALOGUE')
                         event = Event(
-                            id=str(int(time.time() * 1000)),
+                            # 多个agent并发决策，ID需带上agent和动作序号避免主键冲突
+                            id=f"{int(time.time() * 1000)}-{agent.id}-{i}",
                             type=event_type,
                             description=f"{agent.name}对{to_agent.name}执行{action_type}{'，物品：'+item if item else ''}{'，内容：'+message if message else ''}",
                             affectedAgents=[agent.id, to_agent.id],
-                            startTime=int(time.time() * 1000),
+                            startTime=simulation_clock.now_ms(),
                             duration=10000,
                             impact={},
                             meta={"action": action_type, "from": agent.name, "to": to_agent.name, "item": item, "message": message},
@@ -356,9 +418,22 @@ class LLMService:
                             to_agent=to_agent.id,
                             content=message or item or action_type
                         )
-                        EventService().add_event(event)
+                        if emit is not None:
+                            emit(event)
+                            continue
+                        try:
+                            EventService().add_event(event)
+                        except PipelineFull:
+                            # 事件队列已满时在当前线程同步处理，决策线程自然放慢
+                            print(f"警告: 事件队列已满，{event.id} 改为同步处理")
+                            EventService().add_event(event, defer=False)
+            updates.flush()
             # 行为链已处理，后续单步解析不再执行
         else:
+            # 反应中声明的连锁事件（triggeredEvent）只在级联中接纳，由级联执行器控制深度与数量
+            triggered = self._triggered_event(agent, content, event) if emit is not None else None
+            if triggered is not None:
+                emit(triggered)
             # 自动解析移动指令并驱动Agent移动
             import re, json
             from backend.services.agent_service import AgentService
@@ -402,65 +477,70 @@ class LLMService:
             else:
                 importance = 2
         mem = Memory(
-            id=f"llm-{int(time.time() * 1000)}",
+            id=f"llm-{agent.id}-{int(time.time() * 1000)}",
             agent_id=agent.id,
             content=content,
-            timestamp=int(time.time() * 1000),
+            timestamp=simulation_clock.now_ms(),
             importance=importance,
             type="LLM_RESPONSE",
             relatedAgents=None,
             tags=["llm"]
         )
-        MemoryService().add_memory(mem)
         # 行动结果反馈：若LLM输出有"结果"字段则写入，否则用默认模板
         result_match = re.search(r'结果[：:]\s*([\u4e00-\u9fa5A-Za-z0-9_\-，。,.！!\s]+)', content)
         result_text = result_match.group(1).strip() if result_match else None
         if result_text:
             result_mem = Memory(
-                id=f"result-{int(time.time() * 1000)}",
+                id=f"result-{agent.id}-{int(time.time() * 1000)}",
                 agent_id=agent.id,
                 content=f"你完成了本次行动，结果是：{result_text}",
-                timestamp=int(time.time() * 1000),
+                timestamp=simulation_clock.now_ms(),
                 importance=importance,
                 type="RESULT",
                 relatedAgents=None,
                 tags=["result"]
             )
-            MemoryService().add_memory(result_mem)
         else:
             # 默认模板
             result_mem = Memory(
-                id=f"result-{int(time.time() * 1000)}",
+                id=f"result-{agent.id}-{int(time.time() * 1000)}",
                 agent_id=agent.id,
                 content=f"你完成了本次行动，结果待观察。",
-                timestamp=int(time.time() * 1000),
+                timestamp=simulation_clock.now_ms(),
                 importance=1,
                 type="RESULT",
                 relatedAgents=None,
                 tags=["result"]
             )
-            MemoryService().add_memory(result_mem)
+        # 决策记忆与结果记忆一次批量写入（embedding 合并为一次请求）
+        MemoryService().add_memories([mem, result_mem])
         return mem
 
-    def generate_event_via_llm(self, context: dict) -> dict:
+    def generate_event_via_llm(self, context: dict, persist: bool = True) -> dict:
+        """
+        persist=False 时只生成不写库，由调用方（如主循环经去重后交给事件流水线）负责写入。
+        """
         import logging
         # context拼接包含所有agent状态、经济总览、政策历史
-        from backend.state import agents, events as global_events
+        from backend.services.world_state import world_state
+        agents = world_state.get_agents()
         agents_summary = '\n'.join([
-            f"{a.name}({a.id}) 职业:{getattr(a,'role','未知')} 收入:{getattr(a,'income','未知')} 状态:{a.state} 需求:{a.needs} 属性:{a.attributes.dict() if hasattr(a.attributes,'dict') else a.attributes}" for a in agents
+            f"{a.name}({a.id}) 职业:{a.role or '未知'} 收入:{a.income if a.income is not None else '未知'} 状态:{a.state} 需求:{a.needs} 属性:{a.attributes.dict()}" for a in agents
         ])
-        economy_summary = f"总居民数:{len(agents)} 平均收入:{sum([getattr(a,'income',0) or 0 for a in agents])//max(1,len(agents))}"
-        policy_history = '\n'.join([
-            f"{e.description} 类型:{(e.meta or {}).get('type','未知')} 目标:{(e.meta or {}).get('target','未知')} 影响:{(e.meta or {}).get('affectedAgents',(e.meta or {}).get('affected_agents','未知'))}" for e in global_events if '政策' in e.description or 'policy' in (e.meta or {})][-5:])
+        # 经济总览直接在列式数组上统计，不遍历 Agent 对象
+        economy = world_state.economy_summary()
+        economy_summary = (
+            f"总居民数:{economy.get('population', 0)} 平均收入:{economy.get('avgIncome', 0)} 收入中位数:{economy.get('medianIncome', 0)} "
+            f"平均心情:{economy.get('avgMood', 0)} 低落人数:{economy.get('lowMood', 0)} 平均政策敏感度:{economy.get('sensitivity', {})}"
+        )
+        # 政策历史含已到期的政策
+        policy_history = '\n'.join(p.describe() for p in policy_registry.recent(5, active_only=False))
         context_full = f"{context}\n\n[居民摘要]\n{agents_summary}\n[经济总览]\n{economy_summary}\n[政策历史]\n{policy_history}"
         prompts = EVENT_GENERATOR_PRESET.get('llmPrompts', {})
         if 'event_system' not in prompts or 'event_decision' not in prompts:
             raise ValueError("事件生成器未配置完整的llmPrompts (event_system/event_decision)")
         prompt = prompts['event_system'] + '\n' + prompts['event_decision'].format(context=context_full)
-        client = OpenAI(
-            api_key=DASHSCOPE_API_KEY,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-        )
+        client = get_llm_client(DASHSCOPE_API_KEY)
         # 事件生成器模型独立选择
         model = EVENT_GENERATOR_PRESET.get('llmModel', LLM_MODELS.get('qwq-plus', {}).get('model', 'qwq-plus'))
         messages = [
@@ -497,7 +577,7 @@ class LLMService:
             type=event_obj.get('type', 'LLM'),
             description=event_obj.get('description', ''),
             affectedAgents=affected_agents,
-            startTime=event_obj.get('startTime', event_obj.get('start_time', int(_time.time() * 1000))),
+            startTime=event_obj.get('startTime', event_obj.get('start_time', simulation_clock.now_ms())),
             duration=event_obj.get('duration', 300000),
             impact=event_obj.get('impact', {}),
             meta=event_obj.get('meta', {}),
@@ -507,6 +587,8 @@ class LLMService:
             to_agent=event_obj.get('to_agent'),
             content=event_obj.get('content')
         )
+        if not persist:
+            return event.dict()
         print(f"[LLM事件生成] 写入数据库前事件对象: {event}")
         from backend.services.supabase_client import supabase
         try:
@@ -519,28 +601,58 @@ class LLMService:
     def get_embedding(self, text: str) -> list:
         """
         调用阿里百炼 DashScope embedding API 生成文本向量，并自动补齐/截断为1536维。
+        相同 (model, text) 优先命中内容寻址缓存，不再重复请求。
         """
-        if not DASHSCOPE_API_KEY:
-            raise RuntimeError("DASHSCOPE_API_KEY 未配置")
-        client = OpenAI(
-            api_key=DASHSCOPE_API_KEY,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-        )
-        resp = client.embeddings.create(input=[text], model="text-embedding-v3")
-        emb = resp.data[0].embedding
-        # 自动补齐/截断为1536维
-        if len(emb) < 1536:
-            emb = emb + [0.0] * (1536 - len(emb))
-        elif len(emb) > 1536:
-            emb = emb[:1536]
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(self, texts: List[str]) -> List[list]:
+        """
+        批量生成 embedding：先去重并查缓存，未命中的文本按 provider 单批上限打包请求。
+        返回结果与输入一一对应。
+        """
+        settings = ConfigManager.get_embedding_settings()
+        model = settings.get('model', 'text-embedding-v3')
+        dim = settings.get('dimension', 1536)
+        batch_size = max(1, settings.get('batchSize', 10))
+        resolved = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            cached = embedding_cache.get(model, text)
+            if cached is not None:
+                resolved[text] = cached
+            else:
+                missing.append(text)
+        if missing:
+            if not DASHSCOPE_API_KEY:
+                raise RuntimeError("DASHSCOPE_API_KEY 未配置")
+            client = get_llm_client(DASHSCOPE_API_KEY)
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                resp = client.embeddings.create(input=batch, model=model)
+                for item in sorted(resp.data, key=lambda d: d.index):
+                    text = batch[item.index]
+                    emb = self._fit_dimension(item.embedding, dim)
+                    embedding_cache.put(model, text, emb)
+                    resolved[text] = emb
+        return [resolved[text] for text in texts]
+
+    @staticmethod
+    def _fit_dimension(emb: list, dim: int) -> list:
+        # 自动补齐/截断为统一维度
+        if len(emb) < dim:
+            emb = emb + [0.0] * (dim - len(emb))
+        elif len(emb) > dim:
+            emb = emb[:dim]
         return emb
 
-    def get_similar_events_by_context(self, context_text: str, top_k: int = 5):
+    def get_similar_events_by_context(self, context_text: str, top_k: int = 5, embedding: Optional[list] = None):
         from backend.services.event_service import EventService
-        embedding = self.get_embedding(context_text)
+        if embedding is None:
+            embedding = self.get_embedding(context_text)
         return EventService().search_events_by_embedding(embedding, top_k)
 
-    def get_similar_agents_by_context(self, context_text: str, top_k: int = 5):
+    def get_similar_agents_by_context(self, context_text: str, top_k: int = 5, embedding: Optional[list] = None):
         from backend.services.agent_service import AgentService
-        embedding = self.get_embedding(context_text)
-        return AgentService().search_agents_by_embedding(embedding, top_k) 
\ No newline at end of file
+        if embedding is None:
+            embedding = self.get_embedding(context_text)
+        return AgentService().search_agents_by_embedding(embedding, top_k)
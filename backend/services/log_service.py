@@ -1,10 +1,56 @@
-from typing import List
-from backend.models import Event
+from typing import Dict, List, Optional, Tuple
 from backend.services.supabase_client import supabase
+from backend.services.agent_event_index import agent_event_index, decode_cursor, encode_cursor, Key
+from backend.services.recent_events import recent_events, to_api_event
 
 class LogService:
-    def get_agent_log(self, agent_id: str) -> List[Event]:
+    def get_agent_log(self, agent_id: str, limit: int = 50, cursor: Optional[str] = None, order: str = 'asc') -> dict:
+        """
+        agent 时间线：按 startTime 排序（order=asc 从早到晚，desc 从晚到早），键集分页。
+        返回 {"events": [...], "nextCursor": 下一页游标或 None}。倒排索引预热完成前回退到数据库查询。
+        """
+        cursor_key = decode_cursor(cursor)
+        descending = order == 'desc'
+        if agent_event_index.ready:
+            keys, next_key = agent_event_index.page(agent_id, limit, cursor_key, descending)
+            events = self.load_events([event_id for _, event_id in keys])
+        else:
+            events, next_key = self._query_log(agent_id, limit, cursor_key, descending)
+        return {"events": events, "nextCursor": encode_cursor(next_key) if next_key else None}
+
+    def load_events(self, event_ids: List[str], allow_db: bool = True) -> List[dict]:
+        """
+        按 id 取事件（保持顺序）：先查最近事件缓冲，缺失的一次批量查库；allow_db=False 时只用缓冲。
+        """
+        found: Dict[str, dict] = {}
+        missing = []
+        for event_id in event_ids:
+            event = recent_events.get(event_id)
+            if event is not None:
+                found[event_id] = event
+            else:
+                missing.append(event_id)
+        if missing and allow_db:
+            res = supabase.table("events").select("*").in_("id", missing).execute()
+            for row in res.data or []:
+                found[str(row['id'])] = to_api_event(row)
+        return [found[event_id] for event_id in event_ids if event_id in found]
+
+    def recent_event_descriptions(self, agent_id: str, k: int = 3) -> List[str]:
+        """
+        供 prompt 使用的最近亲历事件描述，只读内存（倒排索引 + 最近事件缓冲），不查库。
+        """
+        if not agent_event_index.ready:
+            return []
+        return [e.get('description', '') for e in self.load_events(agent_event_index.recent(agent_id, k), allow_db=False)]
+
+    def _query_log(self, agent_id: str, limit: int, cursor: Optional[Key], descending: bool) -> Tuple[List[dict], Optional[Key]]:
         res = supabase.table("events").select("*").contains("affected_agents", [agent_id]).execute()
-        agent_events = [Event(**e) for e in res.data]
-        agent_events.sort(key=lambda e: e.startTime)
-        return agent_events 
\ No newline at end of file
+        rows = sorted(res.data or [], key=lambda r: (int(r.get('start_time') or 0), str(r.get('id'))), reverse=descending)
+        keys = [(int(r.get('start_time') or 0), str(r.get('id'))) for r in rows]
+        if cursor is not None:
+            rows = [r for r, key in zip(rows, keys) if (key < cursor if descending else key > cursor)]
+            keys = [key for key in keys if (key < cursor if descending else key > cursor)]
+        page = rows[:limit]
+        next_key = keys[limit - 1] if len(rows) > limit else None
+        return [to_api_event(r) for r in page], next_key
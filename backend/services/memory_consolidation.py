@@ -0,0 +1,209 @@
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from backend.models import Memory
+from backend.config_manager import ConfigManager
+from backend.services.supabase_client import supabase
+from backend.services.memory_service import MemoryService
+from backend.services.memory_ranker import MemoryRanker
+from backend.services.vector_index import memory_index, parse_embedding
+
+
+def _row_bytes(row: dict) -> int:
+    # 近似存储占用：正文 UTF-8 字节 + float32 向量 + 其余字段的 JSON 长度
+    emb = row.get('embedding') or []
+    rest = {k: v for k, v in row.items() if k not in ('embedding', 'content')}
+    return len((row.get('content') or '').encode('utf-8')) + 4 * len(emb) + len(json.dumps(rest, ensure_ascii=False).encode('utf-8'))
+
+
+class MemoryConsolidationService:
+    """
+    记忆整合：把每个 agent 较旧、低重要性的记忆按 embedding 相似度聚类，
+    每个簇替换为一条 SUMMARY 记忆（合并向量为簇内归一化均值），
+    再按每个 agent 的上限淘汰综合得分最低的记忆，并报告回收的行数与字节数。
+    """
+
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = settings or ConfigManager.get_memory_settings()
+        self.memory_service = MemoryService()
+
+    def _load_agent_rows(self, agent_id: str) -> List[dict]:
+        rows, offset, page = [], 0, 1000
+        while True:
+            res = supabase.table("memories").select("*").eq("agent_id", agent_id).range(offset, offset + page - 1).execute()
+            batch = res.data or []
+            for row in batch:
+                row['embedding'] = parse_embedding(row.get('embedding'))
+            rows.extend(batch)
+            if len(batch) < page:
+                return rows
+            offset += page
+
+    def _cluster(self, rows: List[dict]) -> List[List[int]]:
+        """
+        贪心聚类：依次取未分配的记忆为簇心，把相似度达到阈值的未分配记忆并入。
+        没有 embedding 的记忆按 type 分组。
+        """
+        threshold = self.settings.get('consolidationSimilarity', 0.85)
+        with_emb = [i for i, r in enumerate(rows) if r.get('embedding')]
+        clusters = []
+        if with_emb:
+            dim = max(len(rows[i]['embedding']) for i in with_emb)
+            matrix = np.zeros((len(with_emb), dim), dtype=np.float32)
+            for j, i in enumerate(with_emb):
+                emb = rows[i]['embedding']
+                matrix[j, :len(emb)] = emb
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms > 0, norms, 1.0)
+            unassigned = np.ones(len(with_emb), dtype=bool)
+            for j in range(len(with_emb)):
+                if not unassigned[j]:
+                    continue
+                members = np.flatnonzero(unassigned & (matrix @ matrix[j] >= threshold))
+                unassigned[members] = False
+                clusters.append([with_emb[m] for m in members])
+        by_type: Dict[str, List[int]] = {}
+        for i, r in enumerate(rows):
+            if not r.get('embedding'):
+                by_type.setdefault(r.get('type') or 'OBSERVATION', []).append(i)
+        clusters.extend(by_type.values())
+        return clusters
+
+    def _summarize(self, agent_id: str, rows: List[dict], seq: int) -> Memory:
+        max_chars = self.settings.get('summaryMaxChars', 300)
+        contents = list(dict.fromkeys(r.get('content') or '' for r in sorted(rows, key=lambda r: r.get('timestamp') or 0)))
+        types = list(dict.fromkeys(r.get('type') or 'OBSERVATION' for r in rows))
+        text = f"[{'/'.join(types)} 共{len(rows)}条记忆的摘要] " + "; ".join(c for c in contents if c)
+        if len(text) > max_chars:
+            text = text[:max_chars - 1] + '…'
+        related = sorted({a for r in rows for a in (r.get('relatedAgents') or [])})
+        embeddings = [r['embedding'] for r in rows if r.get('embedding')]
+        merged = None
+        if embeddings:
+            dim = max(len(e) for e in embeddings)
+            matrix = np.zeros((len(embeddings), dim), dtype=np.float32)
+            for j, e in enumerate(embeddings):
+                matrix[j, :len(e)] = e
+            mean = matrix.mean(axis=0)
+            norm = float(np.linalg.norm(mean))
+            merged = (mean / norm if norm > 0 else mean).tolist()
+        return Memory(
+            id=f"summary-{agent_id}-{int(time.time() * 1000)}-{seq}",
+            agent_id=agent_id,
+            content=text,
+            timestamp=max(int(r.get('timestamp') or 0) for r in rows),
+            importance=max(int(r.get('importance') or 1) for r in rows),
+            type="SUMMARY",
+            relatedAgents=related or None,
+            tags=["summary"],
+            embedding=merged,
+        )
+
+    def _delete_rows(self, ids: List[str]):
+        # 集合删除，分批避免 URL 过长
+        for start in range(0, len(ids), 200):
+            chunk = ids[start:start + 200]
+            supabase.table("memories").delete().in_("id", chunk).execute()
+            for memory_id in chunk:
+                memory_index.remove(memory_id)
+
+    def consolidate_agent(self, agent_id: str, now: Optional[int] = None) -> dict:
+        start = time.time()
+        now = now if now is not None else int(time.time() * 1000)
+        protected = set(self.settings.get('protectedTypes', ['POLICY', 'SUMMARY']))
+        min_age_ms = self.settings.get('consolidationMinAgeMinutes', 60) * 60 * 1000
+        max_importance = self.settings.get('consolidationMaxImportance', 1)
+        min_cluster = self.settings.get('consolidationMinClusterSize', 3)
+        batch_size = self.settings.get('consolidationBatchSize', 2000)
+        cap = self.settings.get('maxMemoriesPerAgent', 2000)
+
+        rows = self._load_agent_rows(agent_id)
+        by_id = {str(r['id']): r for r in rows}
+        candidates = [r for r in rows
+                      if r.get('type') not in protected
+                      and int(r.get('importance') or 0) <= max_importance
+                      and now - int(r.get('timestamp') or 0) >= min_age_ms]
+        # 每轮只处理最旧的一批，控制聚类矩阵规模
+        candidates.sort(key=lambda r: r.get('timestamp') or 0)
+        candidates = candidates[:batch_size]
+
+        removed_ids: List[str] = []
+        summaries: List[Memory] = []
+        for cluster in self._cluster(candidates):
+            if len(cluster) < min_cluster:
+                continue
+            members = [candidates[i] for i in cluster]
+            summaries.append(self._summarize(agent_id, members, len(summaries)))
+            removed_ids.extend(str(r['id']) for r in members)
+
+        # 上限约束：整合后仍超出时，淘汰非保护类型中综合得分最低的记忆
+        removed = set(removed_ids)
+        remaining = [r for r in rows if str(r['id']) not in removed]
+        excess = len(remaining) + len(summaries) - cap
+        evicted = 0
+        if excess > 0:
+            evictable = [Memory(**{k: v for k, v in r.items() if k != 'embedding'}) for r in remaining if r.get('type') not in protected]
+            ranked = MemoryRanker().rank(evictable, now=now)
+            order = np.argsort(ranked.scores, kind='stable')[:excess]
+            for i in order:
+                removed_ids.append(evictable[i].id)
+            evicted = len(order)
+
+        if summaries:
+            self.memory_service.add_memories(summaries, defer=False)
+        if removed_ids:
+            self._delete_rows(removed_ids)
+
+        bytes_removed = sum(_row_bytes(by_id[i]) for i in removed_ids if i in by_id)
+        bytes_added = sum(_row_bytes(m.dict(exclude_none=True)) for m in summaries)
+        report = {
+            "agent_id": agent_id,
+            "rowsBefore": len(rows),
+            "rowsAfter": len(rows) - len(removed_ids) + len(summaries),
+            "rowsRemoved": len(removed_ids),
+            "summariesAdded": len(summaries),
+            "evicted": evicted,
+            "rowsReclaimed": len(removed_ids) - len(summaries),
+            "bytesReclaimed": max(0, bytes_removed - bytes_added),
+            "elapsedMs": int((time.time() - start) * 1000),
+        }
+        if report["rowsRemoved"]:
+            print(f"[记忆整合] agent {agent_id}: {report}")
+        return report
+
+    def consolidate_all(self, agent_ids: Optional[List[str]] = None) -> dict:
+        if agent_ids is None:
+            agent_ids = [str(r['id']) for r in (supabase.table("agents").select("id").execute().data or [])]
+        reports = []
+        for agent_id in agent_ids:
+            try:
+                reports.append(self.consolidate_agent(agent_id))
+            except Exception as e:
+                print(f"警告: 整合Agent {agent_id} 的记忆失败: {e}")
+        return {
+            "agents": len(reports),
+            "rowsReclaimed": sum(r["rowsReclaimed"] for r in reports),
+            "bytesReclaimed": sum(r["bytesReclaimed"] for r in reports),
+            "reports": reports,
+        }
+
+
+def start_consolidation_worker(stop_event: threading.Event, interval: Optional[float] = None) -> threading.Thread:
+    """
+    后台记忆整合线程：每隔 interval 秒对所有 agent 执行一次整合。
+    """
+    interval = interval or ConfigManager.get_memory_settings().get('consolidationIntervalSeconds', 600)
+
+    def run():
+        service = MemoryConsolidationService()
+        while not stop_event.wait(interval):
+            try:
+                service.consolidate_all()
+            except Exception as e:
+                print(f"警告: 记忆整合任务失败: {e}")
+
+    thread = threading.Thread(target=run, name="memory-consolidation", daemon=True)
+    thread.start()
+    return thread
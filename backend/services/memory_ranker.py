@@ -0,0 +1,120 @@
+from typing import Callable, List, Optional, Sequence
+import numpy as np
+from backend.models import Memory
+from backend.config_manager import ConfigManager
+from backend.services.vector_index import memory_index
+from backend.services.simulation_clock import simulation_clock
+
+
+def _min_max(values: np.ndarray) -> np.ndarray:
+    if values.size == 0:
+        return values
+    lo, hi = float(values.min()), float(values.max())
+    if hi - lo < 1e-9:
+        return np.zeros_like(values) if hi == 0 else np.ones_like(values)
+    return (values - lo) / (hi - lo)
+
+
+class RankedMemories:
+    """
+    一次排序的结果：时间倒序索引、类型列、综合得分都以数组形式保存，
+    prompt 各段（最近对话、重要记忆、反思素材）都从这里取，不再各自排序。
+    """
+
+    def __init__(self, memories: Sequence[Memory], timestamps: np.ndarray, importance: np.ndarray,
+                 types: np.ndarray, recency: np.ndarray, ranker: "MemoryRanker"):
+        self.memories = list(memories)
+        self.timestamps = timestamps
+        self.importance = importance
+        self.types = types
+        self.recency = recency
+        self.relevance = np.zeros(len(self.memories), dtype=np.float32)
+        self._ranker = ranker
+        self.order_recent = np.argsort(-timestamps, kind='stable')
+        self.scores = self._combine()
+
+    def _combine(self) -> np.ndarray:
+        w = self._ranker.weights
+        return (w['recency'] * _min_max(self.recency)
+                + w['importance'] * _min_max(self.importance)
+                + w['relevance'] * _min_max(self.relevance))
+
+    def with_relevance(self, query_embedding: Optional[list], agent_id: Optional[str] = None) -> "RankedMemories":
+        """
+        加入与当前情境的相关度后重新计算综合得分。
+        向量优先取该 agent 的内存索引分区，没有时才用记忆自带的 embedding。
+        """
+        if query_embedding is None or not self.memories:
+            return self
+        relevance = np.zeros(len(self.memories), dtype=np.float32)
+        partition = memory_index.partition(agent_id) if agent_id else None
+        if partition is not None and len(partition):
+            ids, sims = partition.similarities(query_embedding)
+            position = {m.id: i for i, m in enumerate(self.memories)}
+            for item_id, sim in zip(ids, sims):
+                i = position.get(item_id)
+                if i is not None:
+                    relevance[i] = sim
+        else:
+            rows = [i for i, m in enumerate(self.memories) if m.embedding]
+            if rows:
+                matrix = np.asarray([self.memories[i].embedding for i in rows], dtype=np.float32)
+                q = np.asarray(query_embedding, dtype=np.float32)[:matrix.shape[1]]
+                norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(q) or 1.0)
+                relevance[rows] = (matrix @ q) / np.where(norms > 0, norms, 1.0)
+        self.relevance = relevance
+        self.scores = self._combine()
+        return self
+
+    def recent(self, k: int, type: Optional[str] = None, predicate: Optional[Callable[[Memory], bool]] = None) -> List[Memory]:
+        order = self.order_recent
+        if type is not None:
+            order = order[self.types[order] == type]
+        result = []
+        for i in order:
+            m = self.memories[i]
+            if predicate is None or predicate(m):
+                result.append(m)
+                if len(result) >= k:
+                    break
+        return result
+
+    def latest(self, type: Optional[str] = None, predicate: Optional[Callable[[Memory], bool]] = None) -> Optional[Memory]:
+        found = self.recent(1, type, predicate)
+        return found[0] if found else None
+
+    def top(self, k: int) -> List[Memory]:
+        n = len(self.memories)
+        if n == 0 or k <= 0:
+            return []
+        k = min(k, n)
+        idx = np.argpartition(-self.scores, k - 1)[:k] if k < n else np.arange(n)
+        idx = idx[np.lexsort((-self.timestamps[idx], -self.scores[idx]))]
+        return [self.memories[i] for i in idx]
+
+
+class MemoryRanker:
+    """
+    记忆排序引擎：综合得分 = 近因（指数衰减）× 权重 + 重要性 × 权重 + 相关度 × 权重，
+    三项各自 min-max 归一化后加权，全部在数组上一次完成。
+    """
+
+    def __init__(self, settings: Optional[dict] = None):
+        settings = settings or ConfigManager.get_memory_ranking_settings()
+        self.weights = {
+            'recency': settings.get('recencyWeight', 1.0),
+            'importance': settings.get('importanceWeight', 1.0),
+            'relevance': settings.get('relevanceWeight', 1.0),
+        }
+        self.half_life_ms = settings.get('recencyHalfLifeMinutes', 60) * 60 * 1000
+
+    def rank(self, memories: Sequence[Memory], now: Optional[int] = None) -> RankedMemories:
+        n = len(memories)
+        # 记忆时间戳按模拟时间记录，新近度也按模拟时间计算
+        now = now if now is not None else simulation_clock.now_ms()
+        timestamps = np.fromiter((m.timestamp for m in memories), dtype=np.int64, count=n)
+        importance = np.fromiter((m.importance for m in memories), dtype=np.float32, count=n)
+        types = np.array([m.type for m in memories], dtype=object)
+        age = np.maximum(now - timestamps, 0).astype(np.float64)
+        recency = np.exp(-np.log(2) * age / self.half_life_ms).astype(np.float32)
+        return RankedMemories(memories, timestamps, importance, types, recency, self)
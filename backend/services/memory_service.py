@@ -1,9 +1,51 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from backend.models import Memory
 from backend.services.supabase_client import supabase
 from backend.services.llm_service import LLMService
+from backend.config_manager import ConfigManager
+from backend.services.vector_index import memory_index, MemoryPartition, parse_embedding
+from backend.services.write_behind import WriteBehindBuffer
+import atexit
+import threading
 import time
 
+
+class LatestMemoriesCache:
+    """
+    每个 agent 最新 K 条记忆的短 TTL 缓存，同一请求或同一 tick 内的多个调用方共享。
+    写入或删除记忆时按 agent 失效。
+    """
+
+    def __init__(self, ttl: float = 2.0):
+        self.ttl = ttl
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, agent_id: str, k: int) -> Optional[List[Memory]]:
+        with self._lock:
+            entry = self._entries.get(agent_id)
+        if entry is None:
+            return None
+        expires, fetched_k, memories = entry
+        # 缓存的条数不少于 k，或该 agent 本来就不足 fetched_k 条时才能复用
+        if time.monotonic() >= expires or (fetched_k < k and len(memories) >= fetched_k):
+            return None
+        return memories[:k]
+
+    def put(self, agent_id: str, k: int, memories: List[Memory]):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[agent_id] = (time.monotonic() + self.ttl, k, memories)
+
+    def invalidate(self, agent_ids: Optional[List[str]] = None):
+        with self._lock:
+            if agent_ids is None:
+                self._entries.clear()
+            else:
+                for agent_id in agent_ids:
+                    self._entries.pop(agent_id, None)
+
 class MemoryService:
     def get_memories(self, agent_id: Optional[str] = None, limit: Optional[int] = None, offset: int = 0) -> List[Memory]:
         query = supabase.table("memories").select("*")
@@ -24,28 +66,198 @@ class MemoryService:
                             m['embedding'] = json.loads(m['embedding'])
                         except Exception:
                             m['embedding'] = None
-                return [Memory(**m) for m in res.data]
+                memories = [Memory(**m) for m in res.data]
+                if not offset:
+                    memories = self._merge_pending(memories, agent_id, limit)
+                return memories
             except Exception as e:
                 if i == 0:
                     time.sleep(0.5)
                 else:
                     raise RuntimeError(f"Supabase连接异常: {e}")
 
+    @staticmethod
+    def _merge_pending(memories: List[Memory], agent_id: Optional[str], limit: Optional[int]) -> List[Memory]:
+        # 读己之写：写后缓冲中尚未落库的记忆也要能被读到（排在最前，它们是最新的）
+        pending = memory_write_buffer.pending(lambda m: not agent_id or m.agent_id == agent_id)
+        if not pending:
+            return memories
+        seen = {m.id for m in memories}
+        merged = [m for m in reversed(pending) if m.id not in seen] + memories
+        return merged[:limit] if limit else merged
+
+    def get_latest_memories(self, agent_ids: List[str], k: int = 5, use_cache: bool = True) -> Dict[str, List[Memory]]:
+        """
+        批量获取多个 agent 各自最新的 k 条记忆（按 timestamp 倒序），替代逐个 agent 查询。
+        每批 agent 用一次 in_ 查询按时间倒序超额拉取；结果被截断时，只对仍不足 k 条的 agent 补查。
+        """
+        result: Dict[str, List[Memory]] = {}
+        missing = []
+        for agent_id in agent_ids:
+            cached = latest_memories_cache.get(agent_id, k) if use_cache else None
+            if cached is None:
+                missing.append(agent_id)
+            else:
+                result[agent_id] = cached
+        settings = ConfigManager.get_memory_settings()
+        chunk_size = settings.get('latestMemoriesChunkSize', 200)
+        overfetch = settings.get('latestMemoriesOverfetch', 2)
+        for start in range(0, len(missing), chunk_size):
+            result.update(self._fetch_latest(missing[start:start + chunk_size], k, overfetch))
+        for agent_id in missing:
+            # 读己之写：合并写后缓冲中该 agent 尚未落库的记忆
+            memories = self._merge_pending(result.get(agent_id, []), agent_id, None)
+            memories = sorted(memories, key=lambda m: m.timestamp, reverse=True)[:k]
+            result[agent_id] = memories
+            if use_cache:
+                latest_memories_cache.put(agent_id, k, memories)
+        return result
+
+    def _fetch_latest(self, agent_ids: List[str], k: int, overfetch: int) -> Dict[str, List[Memory]]:
+        grouped: Dict[str, List[Memory]] = {agent_id: [] for agent_id in agent_ids}
+        seen = set()
+        short = list(agent_ids)
+        cutoff = None
+        rounds = 0
+        while short:
+            if rounds < 4 and len(short) > 1:
+                limit = k * len(short) * overfetch
+                query = supabase.table("memories").select("*").in_("agent_id", short)
+            else:
+                # 多轮仍未收敛时，对剩余的少数 agent 逐个精确查询
+                limit = k
+                query = supabase.table("memories").select("*").eq("agent_id", short[0])
+            if cutoff is not None:
+                # 比 cutoff 更新的行上一轮已全部拿到，只向更早翻页（同一时间戳的行按 id 去重）
+                query = query.lte("timestamp", cutoff)
+            rows = query.order("timestamp", desc=True).limit(limit).execute().data or []
+            for row in rows:
+                agent_id = str(row['agent_id'])
+                if row['id'] in seen or len(grouped.get(agent_id, [])) >= k:
+                    continue
+                seen.add(row['id'])
+                if isinstance(row.get('embedding'), str):
+                    row['embedding'] = parse_embedding(row['embedding'])
+                grouped[agent_id].append(Memory(**row))
+            rounds += 1
+            if limit == k:
+                short = short[1:]
+            elif len(rows) < limit:
+                # 未被截断：本轮涉及的 agent 都已拿全
+                break
+            else:
+                # 被截断：总记忆不足 k 条的 agent 不会被踢出，留在 short 中继续按 cutoff 向更早翻页，
+                # 活跃 agent 拿满后退出，后续轮次只剩安静的 agent，通常一轮即可拿全
+                cutoff = rows[-1]['timestamp']
+                short = [a for a in short if len(grouped[a]) < k]
+        return grouped
+
     def add_memory(self, memory: Memory) -> Memory:
-        # 自动生成 embedding
-        if memory.embedding is None and memory.content:
-            memory.embedding = LLMService().get_embedding(memory.content)
-        supabase.table("memories").insert(memory.dict(exclude_none=True)).execute()
-        return memory
+        return self.add_memories([memory])[0]
+
+    def add_memories(self, memories: List[Memory], defer: Optional[bool] = None) -> List[Memory]:
+        """
+        写入记忆。默认进入写后缓冲，由后台线程攒批后统一 embedding 并 bulk insert，
+        调用方不再等待数据库往返；defer=False 时同步落库（需要立即可检索的场景）。
+        """
+        latest_memories_cache.invalidate(list({m.agent_id for m in memories}))
+        if defer is None:
+            defer = ConfigManager.get_memory_settings().get('writeBehind', True)
+        if defer:
+            memory_write_buffer.submit(memories)
+        else:
+            self._persist_memories(memories)
+        return memories
+
+    def flush_pending(self) -> int:
+        return memory_write_buffer.flush()
+
+    def _persist_memories(self, memories: List[Memory]):
+        """
+        批量落库：缺少 embedding 的内容统一走批量 embedding，再按批次 bulk insert。
+        """
+        pending = [m for m in memories if m.embedding is None and m.content]
+        if pending:
+            # 自动生成 embedding。失败时直接抛出、整批不写入：写后缓冲会重试（超过上限移入死信），
+            # 避免落库一条没有 embedding、之后再也检索不到的记忆
+            embeddings = LLMService().get_embeddings([m.content for m in pending])
+            for m, emb in zip(pending, embeddings):
+                m.embedding = emb
+        batch_size = ConfigManager.get_memory_settings().get('insertBatchSize', 200)
+        for start in range(0, len(memories), batch_size):
+            rows = [m.dict(exclude_none=True) for m in memories[start:start + batch_size]]
+            supabase.table("memories").insert(rows).execute()
+            for row in rows:
+                emb = row.pop('embedding', None)
+                if emb is not None:
+                    memory_index.add(row['id'], emb, row)
+
+    def _undo_persisted(self, memory_ids: List[str]):
+        # 写后缓冲回调：刷写途中被删除的记忆已随该批落库，落库后立即删除，避免被迟到的插入"复活"
+        supabase.table("memories").delete().in_("id", memory_ids).execute()
+        for memory_id in memory_ids:
+            memory_index.remove(memory_id)
 
     def delete_memory(self, memory_id: str) -> bool:
+        # 排队中的直接撤回；正在刷写的由缓冲在落库后回调 _undo_persisted 删除
+        discarded = memory_write_buffer.discard(lambda m: m.id == memory_id)
+        latest_memories_cache.invalidate()
         res = supabase.table("memories").delete().eq("id", memory_id).execute()
-        return bool(res.data)
+        memory_index.remove(memory_id)
+        return bool(res.data) or discarded > 0
 
     def search_memories_by_embedding(self, query_embedding: list, top_k: int = 5) -> list:
         """
         基于embedding向量的相似度检索，返回最相似的top_k条Memory。
-        依赖Supabase SQL自定义函数 match_memories。
+        内存索引预热完成后直接本地检索，否则依赖Supabase SQL自定义函数 match_memories。
         """
+        if memory_index.ready:
+            return [Memory(**payload) for payload, _ in memory_index.search(query_embedding, top_k)]
         res = supabase.rpc("match_memories", {"query_embedding": query_embedding, "match_count": top_k}).execute()
-        return [Memory(**m) for m in res.data] 
\ No newline at end of file
+        return [Memory(**m) for m in res.data]
+
+    def search_agent_memories(self, agent_id: str, query_embedding: list, top_k: int = 5,
+                              types: Optional[List[str]] = None, min_importance: Optional[int] = None,
+                              max_importance: Optional[int] = None, since: Optional[int] = None,
+                              until: Optional[int] = None, tags: Optional[List[str]] = None) -> List[Memory]:
+        """
+        只在某个 agent 自己的记忆中检索，先按 type / importance 区间 / 时间窗 / tags 预过滤再打分。
+        内存索引可用时只扫描该 agent 的分区；否则按同样条件查询该 agent 的记忆后在本地打分。
+        """
+        filters = dict(types=types, min_importance=min_importance, max_importance=max_importance,
+                       since=since, until=until, tags=tags)
+        if memory_index.ready:
+            return [Memory(**payload) for payload, _ in memory_index.search_agent(agent_id, query_embedding, top_k, **filters)]
+        query = supabase.table("memories").select("*").eq("agent_id", agent_id)
+        if types:
+            query = query.in_("type", types)
+        if min_importance is not None:
+            query = query.gte("importance", min_importance)
+        if max_importance is not None:
+            query = query.lte("importance", max_importance)
+        if since is not None:
+            query = query.gte("timestamp", since)
+        if until is not None:
+            query = query.lte("timestamp", until)
+        rows = query.execute().data or []
+        if tags:
+            rows = [r for r in rows if set(tags).intersection(r.get('tags') or [])]
+        partition = MemoryPartition(f"memories:{agent_id}", memory_index.dim, max(1, len(rows)))
+        partition.add_many((str(r['id']), emb, r) for r in rows
+                           for emb in [parse_embedding(r.pop('embedding', None))] if emb is not None)
+        return [Memory(**payload) for payload, _ in partition.search(query_embedding, top_k)]
+
+
+_write_behind_settings = ConfigManager.get_memory_settings()
+latest_memories_cache = LatestMemoriesCache(_write_behind_settings.get('latestMemoriesCacheTtlSeconds', 2.0))
+# 进程级记忆写后缓冲，进程退出时（shutdown 钩子或 atexit）刷写剩余积压
+memory_write_buffer = WriteBehindBuffer(
+    "memories",
+    lambda batch: MemoryService()._persist_memories(batch),
+    max_batch=_write_behind_settings.get('writeBehindMaxBatch', 200),
+    flush_interval=_write_behind_settings.get('writeBehindFlushSeconds', 1.0),
+    max_pending=_write_behind_settings.get('writeBehindMaxPending', 10000),
+    max_retries=_write_behind_settings.get('writeBehindMaxRetries', 3),
+    undo_fn=lambda batch: MemoryService()._undo_persisted([m.id for m in batch]),
+)
+atexit.register(memory_write_buffer.close)
@@ -0,0 +1,107 @@
+import time
+from typing import List, Optional
+from backend.models import Event, Memory
+from backend.config_manager import ConfigManager
+from backend.services.supabase_client import supabase
+from backend.services.llm_service import LLMService
+from backend.services.memory_service import MemoryService, memory_write_buffer
+from backend.services.vector_index import memory_index
+from backend.state import agents as state_agents
+
+POLICY_TYPE = "POLICY"
+POLICY_TAG = "policy"
+
+
+class PolicyMemoryService:
+    """
+    政策记忆：每个 agent 只保留一条最新的 POLICY 记忆（tags 含 policy）。
+    发布新政策时按 agent id 分块做集合删除，再用同一个 embedding 批量插入新记忆，
+    网络往返次数与 agent 数量的分块数成正比，而不是 agent × 记忆条数。
+    """
+
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = settings or ConfigManager.get_memory_settings()
+        self.memory_service = MemoryService()
+
+    def _agent_ids(self) -> List[str]:
+        res = supabase.table("agents").select("id").execute()
+        return [str(r['id']) for r in (res.data or [])]
+
+    def build_memory(self, event: Event, agent_id: str, embedding: Optional[list] = None) -> Memory:
+        return Memory(
+            id=f"{event.id}-{agent_id}-policy",
+            agent_id=agent_id,
+            content=f"最新政策/税率: {event.description}",
+            timestamp=event.startTime,
+            importance=3,
+            type=POLICY_TYPE,
+            tags=[POLICY_TAG],
+            embedding=embedding,
+        )
+
+    def delete_policy_memories(self, agent_ids: List[str]) -> int:
+        """
+        集合删除这些 agent 的全部政策记忆，同时移除尚未落库的缓冲记忆与索引条目。
+        """
+        id_set = set(agent_ids)
+        deleted = memory_write_buffer.discard(lambda m: m.type == POLICY_TYPE and m.agent_id in id_set)
+        chunk_size = self.settings.get('policyDeleteChunkSize', 200)
+        for start in range(0, len(agent_ids), chunk_size):
+            chunk = agent_ids[start:start + chunk_size]
+            res = supabase.table("memories").delete().eq("type", POLICY_TYPE).in_("agent_id", chunk).execute()
+            for row in res.data or []:
+                memory_index.remove(str(row['id']))
+            deleted += len(res.data or [])
+        return deleted
+
+    def replace_policy_memories(self, event: Event, agent_ids: Optional[List[str]] = None) -> dict:
+        """
+        用新政策替换所有 agent 的政策记忆，返回各阶段耗时与行数。
+        """
+        start = time.perf_counter()
+        if agent_ids is None:
+            agent_ids = self._agent_ids()
+        fetched = time.perf_counter()
+
+        deleted = self.delete_policy_memories(agent_ids)
+        deleted_at = time.perf_counter()
+
+        # 所有 agent 的政策记忆内容相同，只需一次 embedding 请求
+        embedding = None
+        try:
+            embedding = LLMService().get_embedding(f"最新政策/税率: {event.description}")
+        except Exception as e:
+            print(f"警告: 生成政策记忆 embedding 失败: {e}")
+        embedded = time.perf_counter()
+
+        memories = [self.build_memory(event, agent_id, embedding) for agent_id in agent_ids]
+        # 同步落库，避免与刚执行的删除交错
+        self.memory_service.add_memories(memories, defer=False)
+        inserted = time.perf_counter()
+
+        self._sync_state_agents(memories)
+        report = {
+            "eventId": event.id,
+            "agents": len(agent_ids),
+            "deleted": deleted,
+            "inserted": len(memories),
+            "fetchAgentsMs": round((fetched - start) * 1000, 1),
+            "deleteMs": round((deleted_at - fetched) * 1000, 1),
+            "embeddingMs": round((embedded - deleted_at) * 1000, 1),
+            "insertMs": round((inserted - embedded) * 1000, 1),
+            "elapsedMs": round((inserted - start) * 1000, 1),
+        }
+        print(f"[政策记忆] {report}")
+        return report
+
+    @staticmethod
+    def _sync_state_agents(memories: List[Memory]):
+        # 同步进程内 agent 状态中的政策记忆，保证下一轮 prompt 读到最新政策
+        by_agent = {m.agent_id: m for m in memories}
+        for agent in state_agents:
+            memory = by_agent.get(agent.id)
+            if memory is None:
+                continue
+            kept = [m for m in (agent.memories or []) if getattr(m, 'type', None) != POLICY_TYPE]
+            kept.append(memory)
+            agent.memories = kept
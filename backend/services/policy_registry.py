@@ -0,0 +1,124 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, List, NamedTuple, Optional
+from backend.models import Event
+from backend.config_manager import ConfigManager
+from backend.services.simulation_clock import simulation_clock
+
+
+def is_policy_event(event: Event) -> bool:
+    """
+    政策/税率类事件判定（事件写入时只判定一次）。
+    """
+    description = event.description or ''
+    meta = event.meta or {}
+    return (event.type or '').upper() == 'POLICY' or '政策' in description or '税' in description \
+        or 'policy' in meta or '政策' in str(meta) or '税' in str(meta)
+
+
+class PolicyRecord(NamedTuple):
+    id: str
+    description: str
+    type: str
+    target: str
+    effect: Any
+    affected: Any
+    start_time: int
+    expires_at: Optional[int]  # None 表示长期有效
+
+    def active(self, now_ms: int) -> bool:
+        return self.expires_at is None or self.expires_at > now_ms
+
+    def describe(self) -> str:
+        return f"{self.description} 类型:{self.type} 目标:{self.target} 影响:{self.affected}"
+
+
+def _policy_expiry(start_time: int, meta: dict) -> Optional[int]:
+    # 政策默认长期有效：Event.duration 是事件影响的持续时长（默认 300000），不代表政策失效；
+    # 只有 meta 显式给出到期时间（expiresAt，毫秒）或有效时长（duration，毫秒）时才会到期
+    expires_at = meta.get('expiresAt', meta.get('expires_at'))
+    if isinstance(expires_at, (int, float)) and not isinstance(expires_at, bool):
+        return int(expires_at)
+    duration = meta.get('duration')
+    if isinstance(duration, (int, float)) and not isinstance(duration, bool) and duration > 0:
+        return start_time + int(duration)
+    return None
+
+
+def parse_policy(event: Event) -> PolicyRecord:
+    meta = event.meta or {}
+    start_time = int(event.startTime or 0)
+    return PolicyRecord(
+        id=str(event.id),
+        description=event.description or '',
+        type=str(meta.get('type', '未知')),
+        target=str(meta.get('target', '未知')),
+        effect=meta.get('effect', event.impact or {}),
+        affected=meta.get('affectedAgents', meta.get('affected_agents', '未知')),
+        start_time=start_time,
+        expires_at=_policy_expiry(start_time, meta),
+    )
+
+
+class PolicyRegistry:
+    """
+    政策登记表：事件写入时分类一次，政策类事件解析出类型/目标/影响/到期时间后按发布时间顺序保存最近 capacity 条。
+    "最近 N 条政策"只从尾部往前取，代价与事件历史总量无关；prompt 构建不再扫描全部事件。
+    """
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self._records: "OrderedDict[str, PolicyRecord]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def observe(self, event: Event) -> Optional[PolicyRecord]:
+        """
+        登记一个新事件，是政策则返回解析结果，否则返回 None。
+        """
+        if not is_policy_event(event):
+            return None
+        record = parse_policy(event)
+        with self._lock:
+            self._records.pop(record.id, None)
+            self._records[record.id] = record
+            while len(self._records) > self.capacity:
+                self._records.popitem(last=False)
+        return record
+
+    def load(self, events_oldest_first: Iterable[Event]) -> int:
+        with self._lock:
+            self._records.clear()
+            for event in events_oldest_first:
+                self.observe(event)
+            return len(self._records)
+
+    def remove(self, event_id: str) -> bool:
+        with self._lock:
+            return self._records.pop(str(event_id), None) is not None
+
+    def recent(self, n: int = 3, active_only: bool = True, now_ms: Optional[int] = None) -> List[PolicyRecord]:
+        """
+        最近发布的 n 条政策（旧→新）；active_only 时跳过已到期的（按模拟时间判断，与政策的 startTime 同一基准）。
+        """
+        now_ms = now_ms if now_ms is not None else simulation_clock.now_ms()
+        result = []
+        with self._lock:
+            for record in reversed(self._records.values()):
+                if len(result) >= n:
+                    break
+                if not active_only or record.active(now_ms):
+                    result.append(record)
+        return result[::-1]
+
+    def stats(self) -> dict:
+        now_ms = simulation_clock.now_ms()
+        with self._lock:
+            return {"size": len(self._records), "capacity": self.capacity,
+                    "active": sum(1 for r in self._records.values() if r.active(now_ms))}
+
+
+# 进程级政策登记表，由 event_service 在写入/删除事件时维护
+policy_registry = PolicyRegistry(ConfigManager.get_policy_registry_settings().get('capacity', 200))
@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+from backend.config_manager import ConfigManager
+
+
+class ReactionResult(NamedTuple):
+    item: Any
+    value: Any = None
+    error: Optional[BaseException] = None
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.timed_out
+
+
+class ReactionFanout:
+    """
+    受影响 agent 反馈的并发扇出：有界线程池 + 单 agent 超时。
+    结果总是按输入顺序返回，调用方据此按确定顺序回写共享状态。
+    超时的 agent 直接放弃（线程无法强制取消，底层 HTTP 读超时兜底），不阻塞其他 agent。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: Optional[float] = None):
+        settings = ConfigManager.get_global_settings()
+        self.max_workers = max_workers or settings.get('reactionConcurrency', 16)
+        self.timeout = timeout if timeout is not None else settings.get('reactionTimeout', 45.0)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='agent-reaction')
+
+    def run(self, items: Sequence[Any], fn: Callable[[Any], Any], timeout: Optional[float] = None) -> List[ReactionResult]:
+        timeout = self.timeout if timeout is None else timeout
+        # 单 agent 超时从任务真正开始执行算起，排队时间不计入
+        started: Dict[int, float] = {}
+
+        def task(index: int, item: Any):
+            started[index] = time.monotonic()
+            return fn(item)
+
+        futures = {self._executor.submit(task, i, item): i for i, item in enumerate(items)}
+        results: List[Optional[ReactionResult]] = [None] * len(items)
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            for fut in list(pending):
+                i = futures[fut]
+                if i in started and now - started[i] >= timeout and not fut.done():
+                    results[i] = ReactionResult(items[i], timed_out=True)
+                    pending.discard(fut)
+            if not pending:
+                break
+            running = [started[futures[f]] for f in pending if futures[f] in started]
+            wait_for = min(timeout - (now - s) for s in running) if running else timeout
+            done, _ = wait(pending, timeout=max(0.01, wait_for), return_when=FIRST_COMPLETED)
+            for fut in done:
+                i = futures[fut]
+                pending.discard(fut)
+                try:
+                    results[i] = ReactionResult(items[i], value=fut.result())
+                except Exception as e:
+                    results[i] = ReactionResult(items[i], error=e)
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_fanout: Optional[ReactionFanout] = None
+_default_lock = threading.Lock()
+
+
+def get_reaction_fanout() -> ReactionFanout:
+    global _default_fanout
+    with _default_lock:
+        if _default_fanout is None:
+            _default_fanout = ReactionFanout()
+        return _default_fanout
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from backend.config_manager import ConfigManager
+
+# 数据库字段（下划线）→ 前端字段（驼峰）
+API_FIELD_MAPPING = {
+    'affected_agents': 'affectedAgents',
+    'start_time': 'startTime',
+    'created_at': 'createdAt',
+    'from_agent': 'fromAgent',
+    'to_agent': 'toAgent'
+}
+
+
+def to_api_event(row: dict) -> dict:
+    """
+    把事件行（数据库字段或 Event.dict()）转换为前端使用的驼峰格式，去掉 embedding 和空值。
+    """
+    event = {API_FIELD_MAPPING.get(k, k): v for k, v in row.items() if k != 'embedding' and v is not None}
+    if not event.get('createdAt'):
+        start = event.get('startTime') or int(time.time() * 1000)
+        event['createdAt'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start / 1000))
+    return event
+
+
+class RecentEventBuffer:
+    """
+    最近事件环形缓冲：按写入顺序保存最近 capacity 条事件（已是 API 驼峰格式），并按类型建二级索引。
+    分页从最新往旧取；请求范围超出缓冲覆盖（且缓冲之外还有更早的事件）时返回 None，由调用方回退到数据库。
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._items: Deque[dict] = deque()
+        self._by_type: Dict[str, Deque[dict]] = {}
+        self._ids: Dict[str, dict] = {}
+        self._lock = threading.RLock()
+        # 缓冲之外是否可能还有更早的事件（未预热或发生过淘汰）
+        self.truncated = True
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def _evict_oldest(self):
+        oldest = self._items.popleft()
+        self._ids.pop(oldest['id'], None)
+        bucket = self._by_type.get(oldest.get('type'))
+        if bucket and bucket[0] is oldest:
+            bucket.popleft()
+            if not bucket:
+                del self._by_type[oldest.get('type')]
+        self.truncated = True
+
+    def add(self, row: dict):
+        event = to_api_event(row)
+        with self._lock:
+            if event['id'] in self._ids:
+                self.remove(event['id'])
+            self._items.append(event)
+            self._by_type.setdefault(event.get('type'), deque()).append(event)
+            self._ids[event['id']] = event
+            while len(self._items) > self.capacity:
+                self._evict_oldest()
+
+    def remove(self, event_id: str) -> bool:
+        with self._lock:
+            event = self._ids.pop(event_id, None)
+            if event is None:
+                return False
+            self._items.remove(event)
+            bucket = self._by_type.get(event.get('type'))
+            if bucket is not None:
+                bucket.remove(event)
+                if not bucket:
+                    del self._by_type[event.get('type')]
+            return True
+
+    def get(self, event_id: str) -> Optional[dict]:
+        return self._ids.get(event_id)
+
+    def load(self, rows_newest_first: List[dict], complete: bool):
+        """
+        预热：用数据库中最新的一批事件（新→旧）填充缓冲；complete 表示数据库中没有更早的事件。
+        """
+        with self._lock:
+            self._items.clear()
+            self._by_type.clear()
+            self._ids.clear()
+            for row in reversed(rows_newest_first[:self.capacity]):
+                self.add(row)
+            self.truncated = not complete or len(rows_newest_first) > self.capacity
+
+    def page(self, type: Optional[str] = None, limit: int = 50, offset: int = 0) -> Optional[List[dict]]:
+        """
+        按时间倒序分页；缓冲无法完整回答时返回 None。
+        """
+        with self._lock:
+            source = self._items if not type else self._by_type.get(type, ())
+            end = offset + (limit or 0)
+            if self.truncated and end > len(source):
+                self.misses += 1
+                return None
+            self.hits += 1
+            n = len(source)
+            # deque 从右端（最新）往左取
+            return [source[n - 1 - i] for i in range(offset, min(end, n))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._items), "capacity": self.capacity, "types": len(self._by_type),
+                    "truncated": self.truncated, "hits": self.hits, "misses": self.misses}
+
+
+# 进程级最近事件缓冲，由 event_service 在写入/删除事件时维护
+recent_events = RecentEventBuffer(ConfigManager.get_recent_events_settings().get('capacity', 1000))
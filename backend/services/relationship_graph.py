@@ -0,0 +1,261 @@
+import json
+import math
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from backend.config_manager import ConfigManager
+
+_MAGIC = b"RGR1"
+
+
+class RelationshipGraph:
+    """
+    稠密关系图：按 agent 槽位索引的好感度矩阵（float32）、互动次数矩阵（uint32）
+    和最近互动时间矩阵（int64 毫秒）。affinity[i, j] 表示 i 对 j 的好感度（有向）。
+    衰减、top-k 伙伴、邻域查询都是整行/整矩阵的向量化运算，与记忆条数无关。
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.affinity = np.zeros((capacity, capacity), dtype=np.float32)
+        self.interactions = np.zeros((capacity, capacity), dtype=np.uint32)
+        self.last_interaction = np.zeros((capacity, capacity), dtype=np.int64)
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = [None] * capacity
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        self._lock = threading.RLock()
+        self.last_decay = time.time()
+
+    # ---- 槽位 ----
+    def __len__(self):
+        return len(self._slots)
+
+    def has_agent(self, agent_id: str) -> bool:
+        return agent_id in self._slots
+
+    def _grow(self):
+        old = self.affinity.shape[0]
+        new = old * 2
+        for name in ('affinity', 'interactions', 'last_interaction'):
+            matrix = getattr(self, name)
+            grown = np.zeros((new, new), dtype=matrix.dtype)
+            grown[:old, :old] = matrix
+            setattr(self, name, grown)
+        self._ids.extend([None] * (new - old))
+        self._free = list(range(new - 1, old - 1, -1)) + self._free
+
+    def slot(self, agent_id: str) -> int:
+        with self._lock:
+            slot = self._slots.get(agent_id)
+            if slot is None:
+                if not self._free:
+                    self._grow()
+                slot = self._free.pop()
+                self._slots[agent_id] = slot
+                self._ids[slot] = agent_id
+            return slot
+
+    def remove_agent(self, agent_id: str):
+        with self._lock:
+            slot = self._slots.pop(agent_id, None)
+            if slot is None:
+                return
+            for matrix in (self.affinity, self.interactions, self.last_interaction):
+                matrix[slot, :] = 0
+                matrix[:, slot] = 0
+            self._ids[slot] = None
+            self._free.append(slot)
+
+    # ---- 写 ----
+    def set_affinity(self, src: str, dst: str, value: float):
+        with self._lock:
+            i, j = self.slot(src), self.slot(dst)
+            self.affinity[i, j] = value
+
+    def add_affinity(self, src: str, dst: str, delta: float, interactions: int = 1, now: Optional[int] = None) -> float:
+        """
+        调整 src 对 dst 的好感度并累加互动次数，返回新的好感度。
+        """
+        with self._lock:
+            i, j = self.slot(src), self.slot(dst)
+            self.affinity[i, j] = round(float(self.affinity[i, j]) + delta, 4)
+            if interactions:
+                self.interactions[i, j] += interactions
+                self.last_interaction[i, j] = now if now is not None else int(time.time() * 1000)
+            return float(self.affinity[i, j])
+
+    def record_group(self, agent_ids: Iterable[str], now: Optional[int] = None):
+        """
+        记录一次多人共同参与（两两互动次数 +1，不改变好感度）。
+        """
+        with self._lock:
+            slots = np.array([self.slot(a) for a in dict.fromkeys(agent_ids)], dtype=np.intp)
+            if len(slots) < 2:
+                return
+            block = np.ix_(slots, slots)
+            self.interactions[block] += 1
+            self.last_interaction[block] = now if now is not None else int(time.time() * 1000)
+            self.interactions[slots, slots] -= 1
+            self.last_interaction[slots, slots] = 0
+
+    def load_agent(self, agent_id: str, relationships: Optional[Dict[str, float]]):
+        """
+        用 Agent.relationships 覆盖该 agent 的好感度行（互动次数保留）。
+        """
+        with self._lock:
+            i = self.slot(agent_id)
+            self.affinity[i, :] = 0
+            for other_id, value in (relationships or {}).items():
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                # 先分配槽位（可能扩容替换矩阵）再写入
+                j = self.slot(other_id)
+                self.affinity[i, j] = value
+
+    def load_from_agents(self, agents: Iterable) -> int:
+        count = 0
+        for agent in agents:
+            self.load_agent(agent.id, getattr(agent, 'relationships', None))
+            count += 1
+        return count
+
+    def decay(self, factor: float):
+        """
+        好感度整体向 0 衰减（乘以 factor）。
+        """
+        with self._lock:
+            self.affinity *= np.float32(factor)
+
+    def decay_elapsed(self, half_life_hours: Optional[float] = None, now: Optional[float] = None) -> float:
+        """
+        按距上次衰减的时长和半衰期衰减，返回使用的衰减系数。
+        """
+        if half_life_hours is None:
+            half_life_hours = ConfigManager.get_relationship_settings().get('decayHalfLifeHours', 72)
+        now = now if now is not None else time.time()
+        elapsed = max(0.0, now - self.last_decay)
+        self.last_decay = now
+        factor = math.pow(0.5, elapsed / (half_life_hours * 3600)) if half_life_hours > 0 else 1.0
+        if factor < 1.0:
+            self.decay(factor)
+        return factor
+
+    # ---- 读 ----
+    def get(self, src: str, dst: str) -> Tuple[float, int, int]:
+        i, j = self._slots.get(src), self._slots.get(dst)
+        if i is None or j is None:
+            return 0.0, 0, 0
+        return float(self.affinity[i, j]), int(self.interactions[i, j]), int(self.last_interaction[i, j])
+
+    def top_partners(self, agent_id: str, k: int = 3, by: str = 'interactions') -> List[Tuple[str, float, int]]:
+        """
+        返回 agent 的前 k 个伙伴 [(id, 好感度, 互动次数)]，by 为 'interactions' 或 'affinity'。
+        只有发生过互动或好感度非零的才算伙伴。
+        """
+        i = self._slots.get(agent_id)
+        if i is None or k <= 0:
+            return []
+        with self._lock:
+            affinity = self.affinity[i].copy()
+            interactions = self.interactions[i].copy()
+        active = (interactions > 0) | (affinity != 0)
+        active[i] = False
+        candidates = np.flatnonzero(active)
+        if len(candidates) == 0:
+            return []
+        if by == 'affinity':
+            keys = affinity[candidates].astype(np.float64)
+        else:
+            # 互动次数为主，好感度打破平局
+            keys = interactions[candidates].astype(np.float64) + np.tanh(affinity[candidates]) * 0.5
+        k = min(k, len(candidates))
+        top = np.argpartition(-keys, k - 1)[:k]
+        top = top[np.argsort(-keys[top], kind='stable')]
+        return [(self._ids[candidates[t]], float(affinity[candidates[t]]), int(interactions[candidates[t]])) for t in top]
+
+    def neighbors(self, agent_id: str, min_affinity: Optional[float] = None, min_interactions: int = 1) -> List[str]:
+        """
+        邻域查询：互动次数不少于 min_interactions（且好感度不低于 min_affinity）的 agent。
+        """
+        i = self._slots.get(agent_id)
+        if i is None:
+            return []
+        with self._lock:
+            mask = self.interactions[i] >= min_interactions
+            if min_affinity is not None:
+                mask &= self.affinity[i] >= min_affinity
+            mask[i] = False
+            return [self._ids[j] for j in np.flatnonzero(mask) if self._ids[j] is not None]
+
+    def relationships_of(self, agent_id: str) -> Dict[str, float]:
+        """
+        导出为 Agent.relationships 格式（只含非零好感度），用于持久化。
+        """
+        i = self._slots.get(agent_id)
+        if i is None:
+            return {}
+        row = self.affinity[i]
+        return {self._ids[j]: round(float(row[j]), 2) for j in np.flatnonzero(row) if self._ids[j] is not None}
+
+    # ---- 序列化 ----
+    def to_bytes(self) -> bytes:
+        """
+        紧凑二进制：魔数 + 头部长度 + JSON 头（agent id 列表）+ 只含活跃槽位的三个矩阵。
+        """
+        with self._lock:
+            ids = list(self._slots)
+            slots = np.array([self._slots[a] for a in ids], dtype=np.intp)
+            block = np.ix_(slots, slots)
+            header = json.dumps({"ids": ids, "lastDecay": self.last_decay}, ensure_ascii=False).encode('utf-8')
+            return b"".join([
+                _MAGIC, struct.pack("<I", len(header)), header,
+                np.ascontiguousarray(self.affinity[block]).tobytes(),
+                np.ascontiguousarray(self.interactions[block]).tobytes(),
+                np.ascontiguousarray(self.last_interaction[block]).tobytes(),
+            ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'RelationshipGraph':
+        if data[:4] != _MAGIC:
+            raise ValueError("不是有效的关系图快照")
+        (header_len,) = struct.unpack("<I", data[4:8])
+        header = json.loads(data[8:8 + header_len].decode('utf-8'))
+        ids = header["ids"]
+        n = len(ids)
+        graph = cls(capacity=max(64, n))
+        for agent_id in ids:
+            graph.slot(agent_id)
+        offset = 8 + header_len
+        for name, dtype in (('affinity', np.float32), ('interactions', np.uint32), ('last_interaction', np.int64)):
+            size = n * n * np.dtype(dtype).itemsize
+            getattr(graph, name)[:n, :n] = np.frombuffer(data[offset:offset + size], dtype=dtype).reshape(n, n)
+            offset += size
+        graph.last_decay = header.get("lastDecay", time.time())
+        return graph
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    def load(self, path: str) -> bool:
+        """
+        从快照文件恢复（替换当前内容），文件不存在时返回 False。
+        """
+        try:
+            with open(path, 'rb') as f:
+                loaded = RelationshipGraph.from_bytes(f.read())
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self.__dict__.update({k: v for k, v in loaded.__dict__.items() if k != '_lock'})
+        return True
+
+    def nbytes(self) -> int:
+        return self.affinity.nbytes + self.interactions.nbytes + self.last_interaction.nbytes
+
+
+# 进程级关系图
+relationship_graph = RelationshipGraph()
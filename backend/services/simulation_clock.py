@@ -0,0 +1,241 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from backend.config_manager import ConfigManager
+
+IDLE = "idle"
+RUNNING = "running"
+PAUSED = "paused"
+
+
+class SimulationClock:
+    """
+    模拟时钟（毫秒时间戳，与事件 startTime 同一量纲）：
+    idle 时跟随真实时间；running 时从启动时刻起按 time_scale 倍速推进（1 为实时，10~100 为加速）；
+    paused 时冻结。倍速调整时重新锚定，模拟时间连续不跳变。
+    模拟时间单调不减：运行时领先真实时间后 reset/start，从 max(上次模拟时间, 真实时间) 继续，
+    不会倒退到真实时间（否则已登记的到期时间、去重窗口与政策 startTime 都会错乱）。
+    """
+
+    def __init__(self, time_scale: float = 1.0):
+        self.time_scale = float(time_scale)
+        self.status = IDLE
+        self._anchor_sim = time.time() * 1000
+        self._anchor_wall = time.monotonic()
+        self._last = self._anchor_sim
+        self._lock = threading.Lock()
+
+    def _now(self) -> float:
+        if self.status == IDLE:
+            now = time.time() * 1000
+        elif self.status == PAUSED:
+            now = self._anchor_sim
+        else:
+            now = self._anchor_sim + (time.monotonic() - self._anchor_wall) * 1000 * self.time_scale
+        self._last = max(self._last, now)
+        return self._last
+
+    def now_ms(self) -> int:
+        with self._lock:
+            return int(self._now())
+
+    def _reanchor(self):
+        self._anchor_sim = self._now()
+        self._anchor_wall = time.monotonic()
+
+    def start(self):
+        with self._lock:
+            if self.status != RUNNING:
+                self._reanchor()
+                self.status = RUNNING
+
+    def pause(self):
+        with self._lock:
+            if self.status == RUNNING:
+                self._reanchor()
+                self.status = PAUSED
+
+    def reset(self):
+        # 先按当前状态锚定再切换为 idle：idle 期间停在该时刻，直到真实时间追上后再跟随
+        with self._lock:
+            self._reanchor()
+            self.status = IDLE
+
+    def set_time_scale(self, time_scale: float):
+        with self._lock:
+            self._reanchor()
+            self.time_scale = float(time_scale)
+
+    def wall_seconds_until(self, sim_ms: float) -> Optional[float]:
+        """
+        距模拟时间 sim_ms 还有多少真实秒；未在运行（时间不前进）时返回 None。
+        """
+        with self._lock:
+            if self.status != RUNNING:
+                return None
+            return max(0.0, (sim_ms - self._now()) / 1000 / self.time_scale)
+
+    def stats(self) -> dict:
+        now = self.now_ms()
+        return {"status": self.status, "timeScale": self.time_scale, "simTime": now,
+                "simTimeText": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now / 1000))}
+
+
+class _Subsystem:
+    __slots__ = ('name', 'fn', 'period_ms', 'next_due', 'last_run', 'background', 'thread', 'requested',
+                 'runs', 'skipped', 'overruns', 'errors', 'last_error', 'last_duration')
+
+    def __init__(self, name: str, fn: Callable[[int, int], None], period_ms: Optional[int], background: bool):
+        self.name = name
+        self.fn = fn
+        self.period_ms = period_ms
+        self.next_due: Optional[float] = None
+        self.last_run: Optional[int] = None
+        self.background = background
+        self.thread: Optional[threading.Thread] = None
+        self.requested = False
+        self.runs = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_duration = 0.0
+
+
+class TickScheduler:
+    """
+    按模拟时间驱动各子系统：每个子系统有自己的周期（模拟秒），或只在 request 时按需运行（周期为 None）。
+    下一次到点时间按"上次到点 + 周期"排在固定网格上，不受执行耗时影响（无漂移）；
+    落后超过 max_catch_up 个周期时跳过错过的周期并计数，不集中补跑。
+    background 子系统（如调用 LLM 的事件生成）在独立线程执行，上一轮未结束时本轮记为 overrun 跳过，
+    慢子系统不会拖住每 tick 的演化。暂停时线程阻塞等待，设置变化或停止时立即唤醒。
+    fn 以 (模拟当前毫秒, 距该子系统上次运行的模拟毫秒) 调用。
+    """
+
+    def __init__(self, clock: SimulationClock, max_catch_up: int = 5, max_sleep: float = 1.0):
+        self.clock = clock
+        self.max_catch_up = max_catch_up
+        self.max_sleep = max_sleep
+        self._subsystems: Dict[str, _Subsystem] = {}
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, fn: Callable[[int, int], None], every_seconds: Optional[float] = None,
+            background: bool = False, run_immediately: bool = False):
+        period = int(every_seconds * 1000) if every_seconds else None
+        subsystem = _Subsystem(name, fn, period, background)
+        if period is not None:
+            subsystem.next_due = self.clock.now_ms() + (0 if run_immediately else period)
+        with self._lock:
+            self._subsystems[name] = subsystem
+        self.wake()
+
+    def set_cadence(self, name: str, every_seconds: float):
+        """
+        运行时调整子系统周期，从当前模拟时间重新排期。
+        """
+        with self._lock:
+            subsystem = self._subsystems[name]
+            subsystem.period_ms = int(every_seconds * 1000)
+            subsystem.next_due = self.clock.now_ms() + subsystem.period_ms
+        self.wake()
+
+    def request(self, name: str):
+        """
+        请求按需子系统在下一轮运行（周期子系统也可用来提前触发一次）。
+        """
+        with self._lock:
+            self._subsystems[name].requested = True
+        self.wake()
+
+    def wake(self):
+        self._wake.set()
+
+    def run_pending(self, now_ms: Optional[int] = None) -> List[str]:
+        """
+        运行所有到点或被请求的子系统，返回本轮运行的子系统名。
+        """
+        now_ms = self.clock.now_ms() if now_ms is None else now_ms
+        due = []
+        with self._lock:
+            for subsystem in self._subsystems.values():
+                on_time = subsystem.next_due is not None and subsystem.next_due <= now_ms
+                if not (on_time or subsystem.requested):
+                    continue
+                subsystem.requested = False
+                if on_time:
+                    subsystem.next_due += subsystem.period_ms
+                    behind = (now_ms - subsystem.next_due) // subsystem.period_ms
+                    if behind >= self.max_catch_up:
+                        # 直接跳到当前时间之后的下一个网格点
+                        subsystem.skipped += int(behind) + 1
+                        subsystem.next_due += (behind + 1) * subsystem.period_ms
+                due.append(subsystem)
+        ran = []
+        for subsystem in due:
+            elapsed = now_ms - subsystem.last_run if subsystem.last_run is not None else (subsystem.period_ms or 0)
+            if subsystem.background:
+                if subsystem.thread is not None and subsystem.thread.is_alive():
+                    subsystem.overruns += 1
+                    continue
+                subsystem.last_run = now_ms
+                subsystem.thread = threading.Thread(target=self._invoke, args=(subsystem, now_ms, elapsed),
+                                                    name=f"tick-{subsystem.name}", daemon=True)
+                subsystem.thread.start()
+            else:
+                subsystem.last_run = now_ms
+                self._invoke(subsystem, now_ms, elapsed)
+            ran.append(subsystem.name)
+        return ran
+
+    def _invoke(self, subsystem: _Subsystem, now_ms: int, elapsed_ms: int):
+        started = time.monotonic()
+        try:
+            subsystem.fn(now_ms, elapsed_ms)
+            subsystem.runs += 1
+        except Exception as e:
+            subsystem.errors += 1
+            subsystem.last_error = f"{type(e).__name__}: {e}"
+            print(f"警告: 模拟子系统 {subsystem.name} 执行失败: {e}")
+        finally:
+            subsystem.last_duration = time.monotonic() - started
+
+    def _sleep_seconds(self) -> Optional[float]:
+        with self._lock:
+            if any(s.requested for s in self._subsystems.values()):
+                return 0.0
+            dues = [s.next_due for s in self._subsystems.values() if s.next_due is not None]
+        if not dues:
+            return None
+        return self.clock.wall_seconds_until(min(dues))
+
+    def run(self, stop_event: threading.Event):
+        """
+        调度主循环：睡到最早的到点时间（真实时间按倍速换算），暂停时阻塞到被唤醒，stop_event 置位后退出。
+        """
+        while not stop_event.is_set():
+            wait = self._sleep_seconds()
+            if wait is None or wait > 0:
+                self._wake.wait(self.max_sleep if wait is None else min(wait, self.max_sleep))
+                self._wake.clear()
+                continue
+            self.run_pending()
+
+    def stats(self) -> dict:
+        now = self.clock.now_ms()
+        with self._lock:
+            return {name: {"everySeconds": s.period_ms / 1000 if s.period_ms else None,
+                           "dueInSeconds": round((s.next_due - now) / 1000, 3) if s.next_due is not None else None,
+                           "runs": s.runs, "skipped": s.skipped, "overruns": s.overruns, "errors": s.errors,
+                           "lastError": s.last_error, "lastDurationMs": round(s.last_duration * 1000, 2),
+                           "running": bool(s.thread and s.thread.is_alive())}
+                    for name, s in self._subsystems.items()}
+
+
+def event_interval_seconds(event_frequency: float) -> float:
+    # eventFrequency：每模拟小时生成的 Titan 事件数
+    return 3600.0 / event_frequency
+
+
+# 进程级模拟时钟，事件生命周期、主循环与 /api/simulation 共用
+simulation_clock = SimulationClock(ConfigManager.get_global_settings().get('timeScale', 60))
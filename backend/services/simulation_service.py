@@ -1,36 +1,83 @@
 import threading
-from typing import Any
-from backend.state import simulation_status, simulation_thread, stop_event, events
-from backend.loop import main_loop
+from typing import Any, Optional
+from backend.config_manager import ConfigManager
+from backend.state import stop_event, events
+from backend.services.simulation_clock import simulation_clock, event_interval_seconds, RUNNING, PAUSED, IDLE
+from backend.services.world_state import world_state
+from backend.services.event_lifetime import event_lifetime
+from backend.services.event_dedup import event_dedup
+from backend import loop
+
+_simulation_thread: Optional[threading.Thread] = None
+_thread_lock = threading.Lock()
 
 class SimulationService:
     def get_status(self) -> dict:
+        settings = ConfigManager.get_global_settings()
+        scheduler = loop.current_scheduler
         return {
-            "status": simulation_status,
+            "status": simulation_clock.status,
+            "clock": simulation_clock.stats(),
+            "settings": {"timeScale": simulation_clock.time_scale, "eventFrequency": settings.get('eventFrequency', 1.0)},
+            "subsystems": scheduler.stats() if scheduler else {},
+            "agents": [a.dict() for a in world_state.get_agents()],
             "events": [e.dict() for e in events],
         }
 
     def control(self, action: str) -> dict:
-        global simulation_status, simulation_thread, stop_event
+        global _simulation_thread
         if action == 'start':
-            if simulation_status != "running":
-                simulation_status = "running"
+            with _thread_lock:
+                if stop_event.is_set() and _simulation_thread is not None:
+                    # reset 之后旧循环可能正在退出，等它结束再起新循环，避免两个调度器并存
+                    _simulation_thread.join(timeout=2.0)
+                simulation_clock.start()
                 stop_event.clear()
-                if simulation_thread is None or not simulation_thread.is_alive():
-                    simulation_thread = threading.Thread(target=main_loop, daemon=True)
-                    simulation_thread.start()
-            return {"status": "running"}
+                if _simulation_thread is None or not _simulation_thread.is_alive():
+                    _simulation_thread = threading.Thread(target=loop.main_loop, name="simulation-loop", daemon=True)
+                    _simulation_thread.start()
+            self._wake()
+            return {"status": RUNNING}
         elif action == 'pause':
-            simulation_status = "paused"
-            return {"status": "paused"}
+            simulation_clock.pause()
+            self._wake()
+            return {"status": PAUSED}
         elif action == 'reset':
-            simulation_status = "idle"
+            simulation_clock.reset()
             stop_event.set()
+            self._wake()
             events.clear()
-            return {"status": "idle"}
+            # 事件列表已清空：撤销仍在生效的事件影响，去重窗口也不再与 reset 之前的事件比较
+            event_lifetime.clear()
+            event_dedup.clear()
+            return {"status": IDLE}
         else:
             raise ValueError("无效的操作")
 
     def update_settings(self, settings: Any) -> dict:
-        # TODO: 实现设置更新逻辑
-        return {"settings": settings} 
\ No newline at end of file
+        """
+        运行时调整模拟倍速与 Titan 事件频率：时钟重新锚定，调度器从当前模拟时间重新排期，并写回 GLOBAL_SETTINGS。
+        """
+        global_settings = ConfigManager.get_global_settings()
+        time_scale = settings.get('timeScale') if settings.get('timeScale') is not None else settings.get('speed')
+        event_frequency = settings.get('eventFrequency')
+        if time_scale is not None and not 0 < time_scale <= global_settings.get('maxTimeScale', 6000):
+            raise ValueError(f"timeScale 须在 (0, {global_settings.get('maxTimeScale', 6000)}] 之间")
+        if event_frequency is not None and event_frequency <= 0:
+            raise ValueError("eventFrequency 须大于 0")
+        if time_scale is not None:
+            simulation_clock.set_time_scale(time_scale)
+            global_settings['timeScale'] = time_scale
+        if event_frequency is not None:
+            global_settings['eventFrequency'] = event_frequency
+            if loop.current_scheduler is not None:
+                loop.current_scheduler.set_cadence('events', event_interval_seconds(event_frequency))
+        self._wake()
+        return {"settings": {**settings, "timeScale": simulation_clock.time_scale,
+                             "eventFrequency": global_settings.get('eventFrequency', 1.0)},
+                "clock": simulation_clock.stats()}
+
+    def _wake(self):
+        # 调度线程可能正阻塞等待（暂停中或睡到下一个到点时间），状态变化后立即重新计算
+        if loop.current_scheduler is not None:
+            loop.current_scheduler.wake()
@@ -0,0 +1,147 @@
+import heapq
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from backend.config_manager import ConfigManager
+
+
+class SpatialGrid:
+    """
+    地图上的均匀网格空间索引：每个格子记录其中的 agent id。
+    移动只需把 id 从旧格子挪到新格子；半径查询只扫描与圆相交的格子，
+    k 近邻按格子环逐圈向外扩展，找到的候选足够且下一圈不可能更近时停止。
+    """
+
+    def __init__(self, width: int = 800, height: int = 600, cell_size: int = 50):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.cols = max(1, math.ceil(width / cell_size))
+        self.rows = max(1, math.ceil(height / cell_size))
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._positions: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        cx = min(self.cols - 1, max(0, int(x // self.cell_size)))
+        cy = min(self.rows - 1, max(0, int(y // self.cell_size)))
+        return cx, cy
+
+    def upsert(self, agent_id: str, x: float, y: float):
+        with self._lock:
+            old = self._positions.get(agent_id)
+            new_cell = self._cell(x, y)
+            if old is not None:
+                old_cell = self._cell(*old)
+                if old_cell != new_cell:
+                    bucket = self._cells.get(old_cell)
+                    if bucket is not None:
+                        bucket.discard(agent_id)
+                        if not bucket:
+                            del self._cells[old_cell]
+            self._cells.setdefault(new_cell, set()).add(agent_id)
+            self._positions[agent_id] = (x, y)
+
+    def remove(self, agent_id: str):
+        with self._lock:
+            old = self._positions.pop(agent_id, None)
+            if old is None:
+                return
+            cell = self._cell(*old)
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.discard(agent_id)
+                if not bucket:
+                    del self._cells[cell]
+
+    def position(self, agent_id: str) -> Optional[Tuple[float, float]]:
+        return self._positions.get(agent_id)
+
+    def rebuild(self, agents: Iterable):
+        with self._lock:
+            self._cells.clear()
+            self._positions.clear()
+            for agent in agents:
+                pos = agent.position or {}
+                self.upsert(agent.id, pos.get('x', 0), pos.get('y', 0))
+
+    def query_radius(self, x: float, y: float, radius: float, exclude: Optional[str] = None,
+                     limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        返回半径内的 [(id, 距离)]，按距离升序；limit 限制返回条数。
+        """
+        cx0, cy0 = self._cell(x - radius, y - radius)
+        cx1, cy1 = self._cell(x + radius, y + radius)
+        r2 = radius * radius
+        found = []
+        with self._lock:
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    for agent_id in self._cells.get((cx, cy), ()):
+                        if agent_id == exclude:
+                            continue
+                        px, py = self._positions[agent_id]
+                        d2 = (px - x) ** 2 + (py - y) ** 2
+                        if d2 <= r2:
+                            found.append((d2, agent_id))
+        if limit is not None:
+            found = heapq.nsmallest(limit, found)
+        else:
+            found.sort()
+        return [(agent_id, math.sqrt(d2)) for d2, agent_id in found]
+
+    def _ring_cells(self, ccx: int, ccy: int, ring: int):
+        if ring == 0:
+            yield ccx, ccy
+            return
+        for cx in range(ccx - ring, ccx + ring + 1):
+            yield cx, ccy - ring
+            yield cx, ccy + ring
+        for cy in range(ccy - ring + 1, ccy + ring):
+            yield ccx - ring, cy
+            yield ccx + ring, cy
+
+    def nearest(self, x: float, y: float, k: int, exclude: Optional[str] = None,
+                max_radius: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        k 近邻：以查询点所在格子为中心逐圈扩展，可用 max_radius 限定视野。
+        """
+        if k <= 0:
+            return []
+        ccx, ccy = self._cell(x, y)
+        max_ring = max(self.cols, self.rows)
+        limit2 = max_radius * max_radius if max_radius is not None else math.inf
+        cells, positions = self._cells, self._positions
+        best: List[Tuple[float, str]] = []  # 最大堆（距离取负）
+        with self._lock:
+            for ring in range(max_ring + 1):
+                for cell in self._ring_cells(ccx, ccy, ring):
+                    bucket = cells.get(cell)
+                    if not bucket:
+                        continue
+                    for agent_id in bucket:
+                        px, py = positions[agent_id]
+                        d2 = (px - x) * (px - x) + (py - y) * (py - y)
+                        if d2 > limit2 or agent_id == exclude:
+                            continue
+                        if len(best) < k:
+                            heapq.heappush(best, (-d2, agent_id))
+                        elif d2 < -best[0][0]:
+                            heapq.heapreplace(best, (-d2, agent_id))
+                # 第 ring+1 圈及以外的点距离至少为 ring * cell_size
+                reach = ring * self.cell_size
+                if (len(best) == k and -best[0][0] <= reach * reach) or reach * reach > limit2:
+                    break
+        return [(agent_id, math.sqrt(-neg)) for neg, agent_id in sorted(best, reverse=True)]
+
+
+def _make_grid() -> SpatialGrid:
+    settings = ConfigManager.get_spatial_settings()
+    return SpatialGrid(settings.get('mapWidth', 800), settings.get('mapHeight', 600), settings.get('cellSize', 50))
+
+
+# 进程级 agent 位置索引，由 world_state 在增删改 agent 时维护
+spatial_index = _make_grid()
@@ -0,0 +1,390 @@
+import heapq
+import json
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from backend.config_manager import ConfigManager
+
+
+class VectorIndex:
+    """
+    进程内向量索引：float32 连续矩阵 + 行号映射，向量入库时归一化，
+    检索为一次矩阵乘得到余弦相似度，再用 argpartition 取 top-k。
+    支持增量 upsert / 删除（删除时用末行回填，保持矩阵紧凑）。
+    每行附带一个 payload（数据库行去掉 embedding），检索结果无需再回表。
+    """
+
+    def __init__(self, name: str, dim: int = 1536, initial_capacity: int = 1024):
+        self.name = name
+        self.dim = dim
+        self._vectors = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._payloads: List[Any] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        # 预热期间被删除的 id，避免预热读到的旧分页把它们重新加回来
+        self._tombstones = set()
+        self.loading = False
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._rows
+
+    def _normalize(self, vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vec.shape[0] != self.dim:
+            fitted = np.zeros(self.dim, dtype=np.float32)
+            fitted[:min(self.dim, vec.shape[0])] = vec[:self.dim]
+            vec = fitted
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def _ensure_capacity(self, size: int):
+        capacity = self._vectors.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[:len(self._ids)] = self._vectors[:len(self._ids)]
+        self._vectors = grown
+        self._grow_columns(capacity)
+
+    def add(self, item_id: str, vector, payload: Any = None):
+        with self._lock:
+            self._tombstones.discard(item_id)
+            self._upsert(item_id, self._normalize(vector), payload)
+
+    def add_many(self, items: Iterable[Tuple[str, Any, Any]], skip_removed: bool = False):
+        with self._lock:
+            for item_id, vector, payload in items:
+                if skip_removed and item_id in self._tombstones:
+                    continue
+                self._upsert(item_id, self._normalize(vector), payload)
+
+    def _upsert(self, item_id: str, vec: np.ndarray, payload: Any):
+        row = self._rows.get(item_id)
+        if row is None:
+            row = len(self._ids)
+            self._ensure_capacity(row + 1)
+            self._ids.append(item_id)
+            self._payloads.append(payload)
+            self._rows[item_id] = row
+        else:
+            self._payloads[row] = payload
+        self._vectors[row] = vec
+        self._write_columns(row, payload)
+
+    # 以下三个钩子供子类维护与行号对齐的元数据列（用于检索前过滤）
+    def _grow_columns(self, capacity: int):
+        pass
+
+    def _write_columns(self, row: int, payload: Any):
+        pass
+
+    def _copy_columns(self, src: int, dst: int):
+        pass
+
+    def update_payload(self, item_id: str, payload: Any) -> bool:
+        with self._lock:
+            row = self._rows.get(item_id)
+            if row is None:
+                return False
+            self._payloads[row] = payload
+            self._write_columns(row, payload)
+            return True
+
+    def get(self, item_id: str) -> Any:
+        with self._lock:
+            row = self._rows.get(item_id)
+            return self._payloads[row] if row is not None else None
+
+    def remove(self, item_id: str) -> bool:
+        with self._lock:
+            if self.loading:
+                self._tombstones.add(item_id)
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                return False
+            last = len(self._ids) - 1
+            if row != last:
+                # 末行回填到被删除的位置
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = self._ids[last]
+                self._payloads[row] = self._payloads[last]
+                self._rows[self._ids[row]] = row
+                self._copy_columns(last, row)
+            self._ids.pop()
+            self._payloads.pop()
+            self._vectors[last] = 0.0
+            return True
+
+    def search(self, query, top_k: int = 5, mask: Optional[np.ndarray] = None) -> List[Tuple[Any, float]]:
+        """
+        余弦 top-k。mask 为与行对齐的布尔数组时，只对通过过滤的行打分。
+        """
+        q = self._normalize(query)
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or top_k <= 0:
+                return []
+            if mask is None:
+                rows = None
+                scores = self._vectors[:n] @ q
+            else:
+                rows = np.flatnonzero(mask[:n])
+                if rows.size == 0:
+                    return []
+                scores = self._vectors[rows] @ q
+            m = scores.shape[0]
+            k = min(top_k, m)
+            if k < m:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(m)
+            top = top[np.argsort(-scores[top], kind='stable')]
+            if rows is not None:
+                return [(self._payloads[rows[i]], float(scores[i])) for i in top]
+            return [(self._payloads[i], float(scores[i])) for i in top]
+
+    def similarities(self, query) -> Tuple[List[str], np.ndarray]:
+        """
+        返回全部行的 id 与余弦相似度（供排序引擎按 id 对齐使用）。
+        """
+        q = self._normalize(query)
+        with self._lock:
+            n = len(self._ids)
+            return list(self._ids), self._vectors[:n] @ q
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._payloads.clear()
+            self._rows.clear()
+            self._vectors[:] = 0.0
+            self.ready = False
+
+    def nbytes(self) -> int:
+        return int(self._vectors.nbytes)
+
+
+class MemoryPartition(VectorIndex):
+    """
+    单个 agent 的记忆索引，额外维护 importance / timestamp / type 列，
+    检索前先在这些列上做向量化过滤，只对命中的行打分。
+    """
+    _type_codes: Dict[str, int] = {}
+    _type_lock = threading.Lock()
+
+    def __init__(self, name: str, dim: int = 1536, initial_capacity: int = 64):
+        super().__init__(name, dim, initial_capacity)
+        self._importance = np.zeros(initial_capacity, dtype=np.int32)
+        self._timestamp = np.zeros(initial_capacity, dtype=np.int64)
+        self._type = np.full(initial_capacity, -1, dtype=np.int32)
+
+    @classmethod
+    def type_code(cls, type_name: Optional[str]) -> int:
+        if type_name is None:
+            return -1
+        code = cls._type_codes.get(type_name)
+        if code is None:
+            with cls._type_lock:
+                code = cls._type_codes.setdefault(type_name, len(cls._type_codes))
+        return code
+
+    def _grow_columns(self, capacity: int):
+        for attr, fill in (('_importance', 0), ('_timestamp', 0), ('_type', -1)):
+            old = getattr(self, attr)
+            grown = np.full(capacity, fill, dtype=old.dtype)
+            grown[:old.shape[0]] = old
+            setattr(self, attr, grown)
+
+    def _write_columns(self, row: int, payload: Any):
+        payload = payload or {}
+        self._importance[row] = int(payload.get('importance') or 0)
+        self._timestamp[row] = int(payload.get('timestamp') or 0)
+        self._type[row] = self.type_code(payload.get('type'))
+
+    def _copy_columns(self, src: int, dst: int):
+        self._importance[dst] = self._importance[src]
+        self._timestamp[dst] = self._timestamp[src]
+        self._type[dst] = self._type[src]
+
+    def filter_mask(self, types: Optional[List[str]] = None, min_importance: Optional[int] = None,
+                    max_importance: Optional[int] = None, since: Optional[int] = None,
+                    until: Optional[int] = None, tags: Optional[List[str]] = None) -> np.ndarray:
+        n = len(self._ids)
+        mask = np.ones(n, dtype=bool)
+        if types:
+            mask &= np.isin(self._type[:n], [self.type_code(t) for t in types])
+        if min_importance is not None:
+            mask &= self._importance[:n] >= min_importance
+        if max_importance is not None:
+            mask &= self._importance[:n] <= max_importance
+        if since is not None:
+            mask &= self._timestamp[:n] >= since
+        if until is not None:
+            mask &= self._timestamp[:n] <= until
+        if tags:
+            wanted = set(tags)
+            # 标签是变长集合，只对已通过数值过滤的行逐个检查
+            for row in np.flatnonzero(mask):
+                if not wanted.intersection((self._payloads[row] or {}).get('tags') or []):
+                    mask[row] = False
+        return mask
+
+
+class PartitionedMemoryIndex:
+    """
+    按 agent_id 分区的记忆索引：每个 agent 一个 MemoryPartition，
+    单次检索的代价只与该 agent 的记忆条数相关。接口与 VectorIndex 保持一致，
+    全局检索（不指定 agent）时对各分区分别取 top-k 再归并。
+    """
+
+    def __init__(self, name: str, dim: int = 1536):
+        self.name = name
+        self.dim = dim
+        self._partitions: Dict[str, MemoryPartition] = {}
+        self._owner: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._tombstones = set()
+        self.loading = False
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._owner)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._owner
+
+    def partition(self, agent_id: str) -> Optional[MemoryPartition]:
+        return self._partitions.get(agent_id)
+
+    def _upsert(self, item_id: str, vector, payload: Any):
+        agent_id = str((payload or {}).get('agent_id', ''))
+        previous = self._owner.get(item_id)
+        if previous is not None and previous != agent_id:
+            self._partitions[previous].remove(item_id)
+        part = self._partitions.get(agent_id)
+        if part is None:
+            part = self._partitions[agent_id] = MemoryPartition(f"{self.name}:{agent_id}", self.dim)
+        part.add(item_id, vector, payload)
+        self._owner[item_id] = agent_id
+
+    def add(self, item_id: str, vector, payload: Any = None):
+        with self._lock:
+            self._tombstones.discard(item_id)
+            self._upsert(item_id, vector, payload)
+
+    def add_many(self, items: Iterable[Tuple[str, Any, Any]], skip_removed: bool = False):
+        with self._lock:
+            for item_id, vector, payload in items:
+                if skip_removed and item_id in self._tombstones:
+                    continue
+                self._upsert(item_id, vector, payload)
+
+    def update_payload(self, item_id: str, payload: Any) -> bool:
+        with self._lock:
+            agent_id = self._owner.get(item_id)
+            return agent_id is not None and self._partitions[agent_id].update_payload(item_id, payload)
+
+    def get(self, item_id: str) -> Any:
+        with self._lock:
+            agent_id = self._owner.get(item_id)
+            return self._partitions[agent_id].get(item_id) if agent_id is not None else None
+
+    def remove(self, item_id: str) -> bool:
+        with self._lock:
+            if self.loading:
+                self._tombstones.add(item_id)
+            agent_id = self._owner.pop(item_id, None)
+            if agent_id is None:
+                return False
+            return self._partitions[agent_id].remove(item_id)
+
+    def search(self, query, top_k: int = 5) -> List[Tuple[Any, float]]:
+        with self._lock:
+            partitions = list(self._partitions.values())
+        hits = []
+        for part in partitions:
+            hits.extend(part.search(query, top_k))
+        return heapq.nlargest(top_k, hits, key=lambda h: h[1])
+
+    def search_agent(self, agent_id: str, query, top_k: int = 5, **filters) -> List[Tuple[Any, float]]:
+        part = self._partitions.get(agent_id)
+        if part is None:
+            return []
+        with part._lock:
+            mask = part.filter_mask(**filters) if any(v is not None for v in filters.values()) else None
+            return part.search(query, top_k, mask=mask)
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._owner.clear()
+            self.ready = False
+
+    def nbytes(self) -> int:
+        return sum(p.nbytes() for p in self._partitions.values())
+
+
+def parse_embedding(value) -> Optional[list]:
+    # pgvector 经 PostgREST 返回时通常是 "[0.1,0.2,...]" 字符串
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except Exception:
+            return None
+    return value if isinstance(value, list) and value else None
+
+
+_dim = ConfigManager.get_embedding_settings().get('dimension', 1536)
+# 进程级单例：记忆/事件/Agent 三个索引
+memory_index = PartitionedMemoryIndex("memories", _dim)
+event_index = VectorIndex("events", _dim)
+agent_index = VectorIndex("agents", _dim)
+
+
+def _warm_load(index, table: str, page_size: int):
+    from backend.services.supabase_client import supabase
+    index.loading = True
+    start = time.time()
+    offset = 0
+    try:
+        while True:
+            res = supabase.table(table).select("*").range(offset, offset + page_size - 1).execute()
+            rows = res.data or []
+            items = []
+            for row in rows:
+                emb = parse_embedding(row.pop('embedding', None))
+                if emb is not None and row.get('id') is not None:
+                    items.append((str(row['id']), emb, row))
+            index.add_many(items, skip_removed=True)
+            if len(rows) < page_size:
+                break
+            offset += page_size
+        index.ready = True
+        print(f"[向量索引] {table} 预热完成: {len(index)} 条, 耗时 {time.time() - start:.2f}s")
+    except Exception as e:
+        print(f"警告: 向量索引 {table} 预热失败，继续使用数据库检索: {e}")
+    finally:
+        index.loading = False
+        index._tombstones.clear()
+
+
+def warm_load_vector_indexes():
+    """
+    启动时从数据库分页加载已有 embedding 到内存索引。预热完成前检索仍走 Supabase RPC。
+    """
+    settings = ConfigManager.get_vector_index_settings()
+    if not settings.get('enabled', True):
+        return
+    page_size = settings.get('warmLoadPageSize', 1000)
+    for index, table in ((memory_index, "memories"), (event_index, "events"), (agent_index, "agents")):
+        _warm_load(index, table, page_size)
@@ -0,0 +1,310 @@
+import atexit
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from backend.models import Agent
+from backend.config_manager import ConfigManager
+from backend.services.supabase_client import supabase
+from backend.services.write_behind import WriteBehindBuffer
+from backend.services.spatial_index import SpatialGrid, spatial_index
+from backend.services.agent_arrays import AgentArrays, ATTRIBUTE_COLUMNS
+from backend.state import agents as state_agents
+
+# agents 表实际存在的字段，其余（memories/llmPrompts/embedding 等）只在进程内
+AGENT_DB_FIELDS = {"id", "name", "position", "state", "avatar", "personality", "traits", "attributes", "emotion", "relationships"}
+
+
+class NullSink:
+    """
+    不做持久化的 sink，用于测试与压测。
+    """
+
+    def load_agents(self) -> List[dict]:
+        return []
+
+    def upsert_agents(self, rows: List[dict]):
+        pass
+
+    def delete_agents(self, agent_ids: List[str]):
+        pass
+
+
+class SupabaseSink:
+    """
+    把 agent 变更批量写回 Supabase agents 表。
+    """
+
+    def load_agents(self) -> List[dict]:
+        return supabase.table("agents").select("*").execute().data or []
+
+    def upsert_agents(self, rows: List[dict]):
+        supabase.table("agents").upsert(rows).execute()
+
+    def delete_agents(self, agent_ids: List[str]):
+        supabase.table("agents").delete().in_("id", agent_ids).execute()
+
+
+class WorldState:
+    """
+    进程内权威世界状态：所有 agent 读写都在内存完成，
+    变更只标记为脏，由写后缓冲按批量 upsert/delete 异步写回 sink。
+    agents 与 backend.state.agents 是同一个 list 对象，循环与 websocket 读到的就是最新状态。
+    数值型热字段同时存放在列式数组 columns 中，批量运算只改数组，
+    对象在经由 get_agent/get_agents 读取时才按 dirty 标记刷新。
+    """
+
+    def __init__(self, agents: List[Agent], sink=None, settings: Optional[dict] = None,
+                 spatial: Optional[SpatialGrid] = None, columns: Optional[AgentArrays] = None):
+        settings = settings or ConfigManager.get_world_state_settings()
+        self.agents = agents
+        self.sink = sink or NullSink()
+        self._by_id: Dict[str, Agent] = {a.id: a for a in agents}
+        # 位置索引随 agent 增删、移动增量更新
+        self.spatial = spatial if spatial is not None else SpatialGrid()
+        self.spatial.rebuild(agents)
+        self.columns = columns if columns is not None else AgentArrays()
+        self.columns.load_all(agents)
+        self._lock = threading.RLock()
+        self.writer = WriteBehindBuffer(
+            "agents",
+            self._flush,
+            max_batch=settings.get('maxBatch', 200),
+            flush_interval=settings.get('flushIntervalSeconds', 1.0),
+            max_pending=settings.get('maxPending', 10000),
+        )
+
+    # ---- 读 ----
+    def get_agent(self, agent_id: str) -> Optional[Agent]:
+        agent = self._by_id.get(agent_id)
+        if agent is not None and self.columns.is_dirty(agent_id):
+            self.columns.write_view(agent)
+        return agent
+
+    def get_agents(self, agent_ids: Optional[Iterable[str]] = None) -> List[Agent]:
+        if agent_ids is None:
+            self.sync_views()
+            return list(self.agents)
+        return [self.get_agent(a) for a in agent_ids if a in self._by_id]
+
+    def sync_views(self) -> int:
+        """
+        把批量运算改过的行写回对应的 Agent 对象，返回刷新的个数。
+        """
+        with self._lock:
+            dirty = self.columns.dirty_ids()
+            for agent_id in dirty:
+                agent = self._by_id.get(agent_id)
+                if agent is not None:
+                    self.columns.write_view(agent)
+        return len(dirty)
+
+    def economy_summary(self) -> dict:
+        return self.columns.economy_summary()
+
+    # ---- 写 ----
+    def add_agent(self, agent: Agent, persist: bool = True) -> Agent:
+        with self._lock:
+            existing = self._by_id.get(agent.id)
+            if existing is not None:
+                self.agents[self.agents.index(existing)] = agent
+            else:
+                self.agents.append(agent)
+            self._by_id[agent.id] = agent
+            self._index_position(agent)
+            self.columns.load(agent)
+        if persist:
+            self.writer.submit([("upsert", agent.id)])
+        return agent
+
+    def update_agent(self, agent_id: str, updates: dict, persist: bool = True) -> Optional[Agent]:
+        """
+        在原对象上就地应用字段更新（保持对象身份），字段按 Agent 模型校验类型。
+        attributes 可以只给部分键，其余取锁内的当前值；列式核心只覆盖被更新字段对应的列，
+        不会用先前读到的旧值覆盖演化引擎/事件生命周期在此期间做的批量修改。
+        """
+        with self._lock:
+            agent = self.get_agent(agent_id)
+            if agent is None:
+                return None
+            fields = {k: v for k, v in updates.items() if k in Agent.__fields__ and k != 'id'}
+            if isinstance(fields.get('attributes'), dict):
+                fields['attributes'] = {**agent.attributes.dict(), **fields['attributes']}
+            if fields:
+                base = {"id": agent.id, "name": agent.name, "position": agent.position, "state": agent.state}
+                validated = Agent(**{**base, **fields})
+                for key in fields:
+                    setattr(agent, key, getattr(validated, key))
+                if 'position' in fields:
+                    self._index_position(agent)
+                self.columns.load_fields(agent, fields)
+        if persist and fields:
+            self.writer.submit([("upsert", agent_id)])
+        return agent
+
+    def _index_position(self, agent: Agent):
+        pos = agent.position or {}
+        self.spatial.upsert(agent.id, pos.get('x', 0), pos.get('y', 0))
+
+    def visible_agents(self, agent: Agent, radius: float, limit: Optional[int] = None) -> List[Agent]:
+        """
+        视野查询：半径内的其他 agent，按距离由近到远，最多 limit 个。
+        """
+        pos = agent.position or {}
+        if limit is not None:
+            # 只需最近的 limit 个时用 k 近邻，逐圈扩展找够即停
+            hits = self.spatial.nearest(pos.get('x', 0), pos.get('y', 0), limit, exclude=agent.id, max_radius=radius)
+        else:
+            hits = self.spatial.query_radius(pos.get('x', 0), pos.get('y', 0), radius, exclude=agent.id)
+        return [self.get_agent(a) for a, _ in hits if a in self._by_id]
+
+    def apply_attribute_deltas(self, agent_ids: Optional[Iterable[str]], deltas: Dict[str, float],
+                               persist: bool = True) -> int:
+        """
+        批量属性增量（如事件 impact 对全体受影响者的 mood 调整）：一次数组运算并截断到 0~100，
+        对象视图延迟刷新，返回受影响的 agent 数。
+        """
+        deltas = {k: v for k, v in deltas.items() if k in ATTRIBUTE_COLUMNS and isinstance(v, (int, float))}
+        if not deltas:
+            return 0
+        with self._lock:
+            slots = self.columns.add_attributes(agent_ids, deltas)
+            changed = self.columns.ids_of(slots)
+        if persist and changed:
+            self.writer.submit([("upsert", a) for a in dict.fromkeys(changed)])
+        return len(changed)
+
+    def apply_attribute_deltas_tracked(self, agent_ids: Iterable[str], deltas: Dict[str, float],
+                                       persist: bool = True) -> Tuple[List[str], np.ndarray]:
+        """
+        同 apply_attribute_deltas，但返回 (agent id 列表, 实际生效的增量矩阵)。
+        截断到 0~100 后实际变化可能小于请求值，调用方按实际值撤销（如事件到期）。
+        """
+        deltas = {k: v for k, v in deltas.items() if k in ATTRIBUTE_COLUMNS and isinstance(v, (int, float))}
+        with self._lock:
+            slots = np.unique(self.columns.slots_of(agent_ids))
+            if not deltas or len(slots) == 0:
+                return [], np.zeros((0, len(ATTRIBUTE_COLUMNS)), dtype=np.float32)
+            before = self.columns.attribute_rows(slots)
+            row = np.array([deltas.get(k, 0.0) for k in ATTRIBUTE_COLUMNS], dtype=np.float32)
+            self.columns.add_rows(slots, np.tile(row, (len(slots), 1)))
+            applied = self.columns.attribute_rows(slots) - before
+            changed = self.columns.ids_of(slots)
+        if persist and changed:
+            self.writer.submit([("upsert", a) for a in changed])
+        return changed, applied
+
+    @property
+    def lock(self) -> threading.RLock:
+        """
+        世界状态锁。需要"读列 -> 计算 -> 写列"整体原子的批量运算（如演化引擎一步）在外层持有它，
+        加锁顺序固定为先世界状态锁、后列式核心锁。
+        """
+        return self._lock
+
+    def add_rows(self, slots: np.ndarray, attribute_deltas: Optional[np.ndarray] = None,
+                 need_deltas: Optional[np.ndarray] = None):
+        """
+        按槽位加属性/需求增量矩阵（演化引擎每步一次），与单 agent 更新互斥。
+        """
+        with self._lock:
+            self.columns.add_rows(slots, attribute_deltas, need_deltas)
+
+    def add_attribute_rows(self, agent_ids: List[str], deltas: np.ndarray, persist: bool = True) -> int:
+        """
+        按 agent 逐行加属性增量（如批量撤销到期事件的影响），返回被修改的 agent 数。
+        """
+        if not agent_ids:
+            return 0
+        with self._lock:
+            changed = self.columns.add_attribute_rows(agent_ids, deltas)
+        if persist and changed:
+            self.writer.submit([("upsert", a) for a in changed])
+        return len(changed)
+
+    def touch(self, agent_ids: Iterable[str]):
+        """
+        调用方直接修改了 agent 对象（如 attributes.mood）后调用，标记为待写回。
+        """
+        touched = [a for a in agent_ids if a in self._by_id]
+        with self._lock:
+            for agent_id in touched:
+                self.columns.load(self._by_id[agent_id])
+        self.writer.submit([("upsert", a) for a in touched])
+
+    def remove_agent(self, agent_id: str, persist: bool = True) -> bool:
+        with self._lock:
+            agent = self._by_id.pop(agent_id, None)
+            if agent is not None:
+                self.agents.remove(agent)
+                self.spatial.remove(agent_id)
+                self.columns.remove(agent_id)
+        if persist:
+            self.writer.submit([("delete", agent_id)])
+        return agent is not None
+
+    def replace_all(self, agents: List[Agent]):
+        """
+        整体替换（如重新加载配置），保持 list 对象不变。
+        """
+        with self._lock:
+            self.agents[:] = agents
+            self._by_id = {a.id: a for a in agents}
+            self.spatial.rebuild(agents)
+            self.columns.load_all(agents)
+
+    def hydrate(self):
+        """
+        启动时用 sink 中已持久化的状态覆盖预设（位置、情绪、关系等），并补充只存在于数据库的 agent。
+        """
+        rows = self.sink.load_agents()
+        for row in rows:
+            agent_id = str(row.get('id'))
+            updates = {k: v for k, v in row.items() if k in AGENT_DB_FIELDS and v not in (None, "")}
+            try:
+                if agent_id in self._by_id:
+                    self.update_agent(agent_id, updates, persist=False)
+                else:
+                    self.add_agent(Agent(**updates), persist=False)
+            except Exception as e:
+                print(f"警告: 加载Agent {agent_id} 的持久化状态失败: {e}")
+        return len(rows)
+
+    # ---- 写回 ----
+    def to_row(self, agent: Agent) -> dict:
+        if self.columns.is_dirty(agent.id):
+            self.columns.write_view(agent)
+        return agent.dict(include=AGENT_DB_FIELDS, exclude_none=True)
+
+    def _flush(self, batch: List[tuple]):
+        # 同一 agent 多次变更只写一次，以最后一次操作为准
+        last_op: Dict[str, str] = {}
+        for op, agent_id in batch:
+            last_op.pop(agent_id, None)
+            last_op[agent_id] = op
+        with self._lock:
+            rows = [self.to_row(self._by_id[a]) for a, op in last_op.items() if op == "upsert" and a in self._by_id]
+        deleted = [a for a, op in last_op.items() if op == "delete"]
+        if rows:
+            self.sink.upsert_agents(rows)
+        if deleted:
+            self.sink.delete_agents(deleted)
+
+    def flush(self) -> int:
+        return self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+    def stats(self) -> dict:
+        return {"agents": len(self.agents), "columnBytes": self.columns.nbytes(), "writer": self.writer.stats()}
+
+
+def _make_sink(name: str):
+    if name == 'null':
+        return NullSink()
+    return SupabaseSink()
+
+
+world_state = WorldState(state_agents, _make_sink(ConfigManager.get_world_state_settings().get('sink', 'supabase')),
+                         spatial=spatial_index)
+atexit.register(world_state.close)
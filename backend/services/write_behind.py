@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional
+
+
+class WriteBehindBuffer:
+    """
+    通用写后缓冲：调用方 submit 后立即返回，后台线程在攒够 max_batch 条
+    或最早一条等待超过 flush_interval 秒时调用 flush_fn 批量落库。
+    积压达到 max_pending 时由提交方同步刷写（背压），保证内存有界。
+    正在刷写的批次仍对 pending/discard 可见；刷写中被 discard 的条目在落库后交给 undo_fn 撤销（如删除刚插入的行）。
+    刷写失败的批次放在队首下次优先重试，连续失败超过 max_retries 次后移入死信列表，不再阻塞后续数据；
+    积压超出上限的部分丢弃并告警。
+    """
+
+    def __init__(self, name: str, flush_fn: Callable[[List[Any]], Any], max_batch: int = 200,
+                 flush_interval: float = 1.0, max_pending: int = 10000, max_retries: int = 3,
+                 undo_fn: Optional[Callable[[List[Any]], Any]] = None, max_dead_letter: int = 1000):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.undo_fn = undo_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._pending: List[Any] = []
+        self._retry: List[Any] = []       # 上次刷写失败、等待重试的批次
+        self._retry_attempts = 0
+        self._inflight: List[Any] = []    # 正在刷写的批次
+        self._cancelled: List[Any] = []   # 刷写中被 discard 的条目
+        self.dead_letter: Deque[List[Any]] = deque(maxlen=max_dead_letter)
+        self._oldest: Optional[float] = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.submitted = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+        self.undone = 0
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+            self._thread.start()
+
+    def submit(self, items: List[Any]):
+        if not items:
+            return
+        if self._closed:
+            # 已关闭（进程退出中）时直接同步写
+            self.flush_fn(list(items))
+            return
+        with self._cond:
+            self._pending.extend(items)
+            self.submitted += len(items)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            backlog = len(self._pending) + len(self._retry)
+            self._ensure_worker()
+            if backlog >= self.max_batch:
+                self._cond.notify()
+        if backlog >= self.max_pending:
+            self.flush()
+
+    def pending(self, predicate: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        """
+        尚未确认落库的条目（按提交顺序）：正在刷写的、等待重试的与排队中的。
+        """
+        with self._cond:
+            inflight = [item for item in self._inflight if not any(item is c for c in self._cancelled)]
+            return [item for item in inflight + self._retry + self._pending if predicate is None or predicate(item)]
+
+    def discard(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        撤回尚未落库的条目，返回撤回条数。排队/重试中的直接移除；
+        正在刷写的无法中止，标记后在该批落库成功时交给 undo_fn 撤销。
+        """
+        with self._cond:
+            before = len(self._pending) + len(self._retry)
+            self._pending = [item for item in self._pending if not predicate(item)]
+            self._retry = [item for item in self._retry if not predicate(item)]
+            if not self._retry:
+                self._retry_attempts = 0
+            cancelled = [item for item in self._inflight
+                         if predicate(item) and not any(item is c for c in self._cancelled)]
+            self._cancelled.extend(cancelled)
+            if not self._pending and not self._retry:
+                self._oldest = None
+            return before - len(self._pending) - len(self._retry) + len(cancelled)
+
+    def flush(self) -> int:
+        """
+        同步刷写当前所有积压，返回成功写入的条数。多个刷写方串行执行，保证写入顺序。
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    if self._retry:
+                        batch, self._retry = self._retry, []
+                    else:
+                        batch = self._pending[:self.max_batch]
+                        del self._pending[:self.max_batch]
+                        self._retry_attempts = 0
+                    if not self._pending:
+                        self._oldest = None
+                    self._inflight = batch
+                    self._cancelled = []
+                if not batch:
+                    return written
+                try:
+                    self.flush_fn(batch)
+                except Exception as e:
+                    self.failures += 1
+                    with self._cond:
+                        batch = [item for item in batch if not any(item is c for c in self._cancelled)]
+                        self._inflight, self._cancelled = [], []
+                        self._retry_attempts += 1
+                        if self._retry_attempts > self.max_retries:
+                            # 反复失败（如某一行本身有问题）的批次移入死信，不再挡住后面的数据
+                            self.dead_letter.append(batch)
+                            self.dead_lettered += len(batch)
+                            self._retry_attempts = 0
+                            print(f"错误: {self.name} 写后缓冲刷写失败，已重试{self.max_retries}次，{len(batch)} 条移入死信: {e}")
+                            continue
+                        self._retry = batch
+                        overflow = len(self._pending) + len(self._retry) - self.max_pending
+                        if overflow > 0:
+                            del self._pending[-overflow:]
+                            self.dropped += overflow
+                        if self._oldest is None:
+                            self._oldest = time.monotonic()
+                    print(f"警告: {self.name} 写后缓冲刷写失败，{len(batch)} 条将稍后重试: {e}")
+                    return written
+                written += len(batch)
+                self.flushed += len(batch)
+                self.flushes += 1
+                with self._cond:
+                    cancelled, self._inflight, self._cancelled = self._cancelled, [], []
+                if cancelled and self.undo_fn is not None:
+                    # 刷写期间被删除的条目已随本批落库，立即撤销
+                    try:
+                        self.undo_fn(cancelled)
+                        self.undone += len(cancelled)
+                    except Exception as e:
+                        print(f"警告: {self.name} 写后缓冲撤销 {len(cancelled)} 条已删除数据失败: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending or self._retry:
+                        waited = time.monotonic() - (self._oldest or time.monotonic())
+                        if len(self._pending) >= self.max_batch or waited >= self.flush_interval:
+                            break
+                        self._cond.wait(self.flush_interval - waited)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+            self.flush()
+
+    def close(self):
+        """
+        停止后台线程并刷写全部积压（进程退出前调用）。
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self._pending) + len(self._retry),
+                "inflight": len(self._inflight),
+                "submitted": self.submitted,
+                "flushed": self.flushed,
+                "flushes": self.flushes,
+                "failures": self.failures,
+                "dropped": self.dropped,
+                "deadLettered": self.dead_lettered,
+                "undone": self.undone,
+            }
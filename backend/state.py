@@ -8,8 +8,6 @@ from backend.config_manager import ConfigManager
 # 动态加载 agent 预设
 agents = [Agent(**a) for a in ConfigManager.get_agent_presets()]
 events = []
-simulation_status = "idle"
-simulation_thread = None
 stop_event = threading.Event()
 
 DASHSCOPE_API_KEY = os.getenv('DASHSCOPE_API_KEY', '') 
\ No newline at end of file
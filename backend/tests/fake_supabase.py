@@ -0,0 +1,115 @@
+"""
+内存版 Supabase 客户端替身，只实现服务层用到的 PostgREST 查询子集，
+用于离线单元测试与基准测试（可统计往返次数并模拟网络延迟）。
+"""
+import copy
+import time
+from types import SimpleNamespace
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.filters = []
+        self.op = 'select'
+        self.payload = None
+        self.order_by = []
+        self.bounds = None
+
+    def select(self, *columns, count=None):
+        self.op = 'select'
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = 'insert', rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows):
+        self.op, self.payload = 'upsert', rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, data):
+        self.op, self.payload = 'update', data
+        return self
+
+    def delete(self):
+        self.op = 'delete'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda r: r.get(column) in values)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) >= value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) <= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) < value)
+        return self
+
+    def contains(self, column, values):
+        self.filters.append(lambda r: set(values).issubset(r.get(column) or []))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.bounds = (0, n - 1)
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def _matches(self, row):
+        return all(f(row) for f in self.filters)
+
+    def execute(self):
+        self.client.calls += 1
+        if self.client.latency:
+            time.sleep(self.client.latency)
+        rows = self.client.tables.setdefault(self.table_name, [])
+        if self.op in ('insert', 'upsert'):
+            data = copy.deepcopy(self.payload)
+            if self.op == 'upsert':
+                ids = {r.get('id') for r in data}
+                rows[:] = [r for r in rows if r.get('id') not in ids]
+            rows.extend(data)
+            return SimpleNamespace(data=data, count=None)
+        matched = [r for r in rows if self._matches(r)]
+        if self.op == 'delete':
+            rows[:] = [r for r in rows if not self._matches(r)]
+            return SimpleNamespace(data=matched, count=None)
+        if self.op == 'update':
+            for r in matched:
+                r.update(copy.deepcopy(self.payload))
+            return SimpleNamespace(data=copy.deepcopy(matched), count=None)
+        for column, desc in reversed(self.order_by):
+            matched.sort(key=lambda r: r.get(column) or 0, reverse=desc)
+        count = len(matched)
+        if self.bounds:
+            matched = matched[self.bounds[0]:self.bounds[1] + 1]
+        return SimpleNamespace(data=copy.deepcopy(matched), count=count)
+
+
+class FakeSupabase:
+    def __init__(self, latency: float = 0.0):
+        self.tables = {}
+        self.calls = 0
+        self.latency = latency
+
+    def table(self, name):
+        return FakeQuery(self, name)
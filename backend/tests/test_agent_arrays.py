@@ -0,0 +1,40 @@
+import numpy as np
+from backend.models import Agent
+from backend.services.agent_arrays import AgentArrays
+from backend.services.world_state import WorldState, NullSink
+
+SETTINGS = {'flushIntervalSeconds': 60, 'maxBatch': 200, 'maxPending': 10000}
+
+def _agent(i, **extra):
+    return Agent(id=str(i), name=f"A{i}", position={"x": i, "y": i}, state="IDLE",
+                 needs={"energy": 80, "social": 60}, **extra)
+
+def test_columns_grow_and_summarize():
+    arrays = AgentArrays(capacity=2)
+    for i in range(5):
+        arrays.load(_agent(i, income=1000 * (i + 1), sensitivity={"medical_tax": 0.1 * i}))
+    arrays.load(_agent(9))  # 收入、敏感度未知
+    arrays.remove("0")
+    assert len(arrays) == 5 and arrays.capacity == 8
+    summary = arrays.economy_summary()
+    assert summary["population"] == 5 and summary["avgIncome"] == 3500
+    assert summary["sensitivity"] == {"medical_tax": 0.25} and summary["states"] == {"IDLE": 5}
+
+def test_bulk_deltas_clamp_and_refresh_views_lazily():
+    agents = [_agent(1), _agent(2), _agent(3)]
+    agents[0].attributes.mood = 95
+    state = WorldState(agents, NullSink(), SETTINGS)
+    assert state.apply_attribute_deltas(["1", "2", "missing"], {"mood": 10, "energy": -5, "emotion": "x"}) == 2
+    # 对象视图在读取前不变，读取时才刷新
+    assert agents[0].attributes.mood == 95
+    assert state.get_agent("1").attributes.mood == 100 and agents[0].attributes.energy == 95
+    assert [a.attributes.mood for a in state.get_agents()] == [100, 60, 50]
+    assert state.columns.dirty_ids() == []
+    # 普通字段更新基于刷新后的对象，并同步回数组
+    state.apply_attribute_deltas(["2"], {"mood": -70})
+    state.update_agent("2", {"emotion": "低落"})
+    assert agents[1].attributes.mood == 0 and agents[1].emotion == "低落"
+    state.columns.add_needs(None, {"social": -70})
+    assert state.get_agent("3").needs == {"energy": 80, "social": 0}
+    assert np.isnan(state.columns.income[state.columns.slot("3")])
+    state.close()
@@ -0,0 +1,49 @@
+from backend.models import Agent
+from backend.services.agent_dynamics import AgentDynamics
+from backend.services.world_state import WorldState, NullSink
+
+SETTINGS = {
+    'rates': {
+        'default': {'energy': -10, 'needs.energy': -10, 'needs.fun': -5},
+        'RESTING': {'energy': 30, 'needs.energy': 30},
+    },
+    'moodBaseline': 50, 'moodReversionPerHour': 0.5, 'moodPenaltyPerHour': 4,
+    'thresholds': {'needs.energy': 20, 'mood': 25},
+    'decisionCooldownSeconds': 100, 'maxDecisionsPerStep': 1, 'persistIntervalSeconds': 1e9,
+}
+
+def _agent(i, state, energy_need, mood):
+    return Agent(id=str(i), name=f"A{i}", position={"x": 0, "y": 0}, state=state,
+                 needs={"energy": energy_need, "fun": 50}, attributes={"energy": 95, "mood": mood, "sociability": 50})
+
+def test_step_decays_recovers_and_flags_threshold_crossings():
+    agents = [_agent(1, "WORKING", 25, 50), _agent(2, "RESTING", 25, 90), _agent(3, "IDLE", 10, 50)]
+    state = WorldState(agents, NullSink(), {'flushIntervalSeconds': 60})
+    dynamics = AgentDynamics(state, SETTINGS)
+    flagged = dynamics.step(3600.0)  # 1 模拟小时
+    a1, a2, a3 = state.get_agents(["1", "2", "3"])
+    assert a1.needs == {"energy": 15, "fun": 45} and a1.attributes.energy == 85
+    # 休息恢复并截断到 100；心情向基线回归一半
+    assert a2.needs["energy"] == 55 and a2.attributes.energy == 100 and a2.attributes.mood == 70
+    # 已经低于阈值的需求拖累心情，但不重复标记
+    assert a3.needs["energy"] == 0 and a3.attributes.mood == 46
+    assert flagged == {"1": ["needs.energy"]}
+    assert dynamics.due_decisions(flagged, now=0) == [("1", ["needs.energy"])]
+    assert dynamics.due_decisions(flagged, now=50) == []  # 冷却中
+    assert "精力" in dynamics.decision_prompt(["needs.energy"])
+    state.close()
+
+def test_cooldown_and_persist_follow_simulation_time():
+    state = WorldState([_agent(1, "WORKING", 25, 50)], NullSink(), {'flushIntervalSeconds': 60})
+    dynamics = AgentDynamics(state, {**SETTINGS, 'persistIntervalSeconds': 3600})
+    submitted = []
+    state.writer.submit = submitted.append
+    sim_start = 1_000_000.0
+    dynamics.step(60, now=sim_start)
+    dynamics.step(60, now=sim_start + 1800)
+    assert submitted == []
+    dynamics.step(60, now=sim_start + 3600)  # 写回间隔按模拟时间计，与真实经过多久无关
+    assert len(submitted) == 1
+    assert dynamics.due_decisions({"1": ["mood"]}, now=sim_start) and not dynamics.due_decisions({"1": ["mood"]}, now=sim_start + 99)
+    assert dynamics.due_decisions({"1": ["mood"]}, now=sim_start + 100)
+    state.close()
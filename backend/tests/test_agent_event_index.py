@@ -0,0 +1,61 @@
+import pytest
+from backend.services import log_service
+from backend.services.agent_event_index import AgentEventIndex, decode_cursor, encode_cursor, warm_load_agent_event_index
+from backend.services.log_service import LogService
+from backend.services.recent_events import RecentEventBuffer
+from backend.tests.fake_supabase import FakeSupabase
+
+def _row(i, agents=("1",), start=None):
+    return {"id": f"e{i}", "type": "SOCIAL", "description": f"事件{i}", "affected_agents": list(agents),
+            "start_time": start if start is not None else i * 1000, "duration": 1}
+
+def test_timeline_keeps_time_order_and_pages_by_keyset():
+    index = AgentEventIndex()
+    for i in [3, 1, 4, 0, 2]:
+        index.add(f"e{i}", i * 1000, ["1", "2"] if i % 2 else ["1"])
+    index.add("e5", 2000, ["1"])  # 与 e2 同一时刻，按 id 排序
+    keys, cursor = index.page("1", 2, descending=False)
+    assert [k[1] for k in keys] == ["e0", "e1"]
+    keys, cursor = index.page("1", 2, decode_cursor(encode_cursor(cursor)), descending=False)
+    assert [k[1] for k in keys] == ["e2", "e5"]
+    keys, cursor = index.page("1", 2, cursor, descending=False)
+    assert [k[1] for k in keys] == ["e3", "e4"] and cursor is None
+    assert index.recent("1", 3) == ["e4", "e3", "e5"]
+    keys, cursor = index.page("2", 1)
+    assert [k[1] for k in keys] == ["e3"] and index.page("2", 1, cursor)[0] == [(1000, "e1")]
+    assert index.remove("e3") and index.count("2") == 1 and index.count("1") == 5
+    with pytest.raises(ValueError):
+        decode_cursor("abc:e1")
+
+def test_warm_load_skips_events_deleted_while_loading(monkeypatch):
+    db = FakeSupabase()
+    db.tables["events"] = [_row(i) for i in range(5)]
+    index = AgentEventIndex()
+    index.loading = True
+    index.remove("e2")
+    monkeypatch.setattr("backend.services.supabase_client.supabase", db)
+    warm_load_agent_event_index(index, page_size=2)
+    assert index.ready and index.recent("1", 10) == ["e4", "e3", "e1", "e0"]
+
+def test_agent_log_uses_index_and_falls_back_to_database(monkeypatch):
+    db = FakeSupabase()
+    db.tables["events"] = [_row(i, agents=("1", "2") if i % 2 else ("1",)) for i in range(6)]
+    index, buffer = AgentEventIndex(), RecentEventBuffer(capacity=2)
+    monkeypatch.setattr(log_service, "supabase", db)
+    monkeypatch.setattr(log_service, "agent_event_index", index)
+    monkeypatch.setattr(log_service, "recent_events", buffer)
+    service = LogService()
+    fallback = service.get_agent_log("2", limit=2, order="desc")
+    assert [e["id"] for e in fallback["events"]] == ["e5", "e3"] and fallback["nextCursor"] == "3000:e3"
+    for row in db.tables["events"]:
+        index.add(row["id"], row["start_time"], row["affected_agents"])
+        buffer.add(row)
+    index.ready = True
+    page = service.get_agent_log("2", limit=2, order="desc")
+    assert page == {"events": page["events"], "nextCursor": "3000:e3"}
+    assert [e["id"] for e in page["events"]] == ["e5", "e3"]
+    calls = db.calls
+    last = service.get_agent_log("2", limit=2, cursor=page["nextCursor"], order="desc")
+    assert [e["id"] for e in last["events"]] == ["e1"] and last["nextCursor"] is None
+    assert last["events"][0]["affectedAgents"] == ["1", "2"] and db.calls == calls + 1  # e1 不在缓冲，批量查库一次
+    assert service.recent_event_descriptions("1", 3) == ["事件5", "事件4"]  # 只读缓冲，不查库
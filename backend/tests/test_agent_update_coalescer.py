@@ -0,0 +1,114 @@
+import pytest
+from backend.models import Agent, Event
+from backend.services import agent_service as agent_service_module
+from backend.services import event_service as event_service_module
+from backend.services import agent_update_coalescer as coalescer_module
+from backend.services.relationship_graph import RelationshipGraph
+from backend.services.agent_service import AgentService
+from backend.services.agent_update_coalescer import AgentUpdateCoalescer, get_update_counters
+from backend.services.event_service import EventService
+from backend.services.world_state import WorldState
+from backend.services.event_lifetime import EventLifetimeScheduler
+
+class CountingSink:
+    def __init__(self):
+        self.rows = []
+
+    def load_agents(self):
+        return []
+
+    def upsert_agents(self, rows):
+        self.rows.extend(rows)
+
+    def delete_agents(self, agent_ids):
+        pass
+
+@pytest.fixture
+def state(monkeypatch):
+    agents = [Agent(id=i, name=f"A{i}", position={"x": 0, "y": 0}, state="IDLE", relationships={}) for i in ("a", "b")]
+    state = WorldState(agents, CountingSink(), {'flushIntervalSeconds': 60})
+    monkeypatch.setattr(agent_service_module, "world_state", state)
+    monkeypatch.setattr(event_service_module, "world_state", state)
+    monkeypatch.setattr(event_service_module, "event_lifetime", EventLifetimeScheduler(state))
+    graph = RelationshipGraph(capacity=4)
+    for module in (agent_service_module, coalescer_module, event_service_module):
+        monkeypatch.setattr(module, "relationship_graph", graph)
+    yield state
+    state.close()
+
+def test_merges_patches_into_one_write_per_agent(state):
+    service = AgentService()
+    writes = []
+    original = service.update_agent_fields
+    service.update_agent_fields = lambda agent_id, fields: writes.append(agent_id) or original(agent_id, fields)
+    with AgentUpdateCoalescer(service) as updates:
+        updates.apply_impact("a", {"mood": 30, "energy": -150, "unknown": 1})
+        updates.add_attribute_delta("a", "mood", 5)
+        updates.set_field("a", "emotion", "愉快")
+        updates.set_field("a", "emotion", "高兴")   # 后写者胜
+        updates.add_relationship_delta("a", "b", 0.1)
+        updates.add_relationship_delta("a", "b", 0.1)
+        updates.set_field("b", "mood", 10)
+        updates.add_attribute_delta("b", "mood", 5)  # 赋值之后的增量继续叠加
+    a, b = state.get_agent("a"), state.get_agent("b")
+    assert writes == ["a", "b"] and updates.stats()["patches"] == 9
+    assert a.attributes.mood == 85 and a.attributes.energy == 0 and a.emotion == "高兴"
+    assert a.relationships == {"b": 0.2} and b.attributes.mood == 15
+
+def test_interaction_event_issues_one_write_per_side(state, monkeypatch):
+    monkeypatch.setattr(event_service_module.MemoryService, "add_memories", lambda self, memories, defer=None: memories)
+    before = get_update_counters()
+    event = Event(id="e1", type="GIFT", description="a送给b一束花", affectedAgents=["a", "b"], duration=1,
+                  impact={"mood": 5}, from_agent="a", to_agent="b", content="花")
+    service = EventService()
+    with AgentUpdateCoalescer() as updates:
+        service._write_event_memories_and_update_agents(event, updates)
+        service._auto_adjust_emotion_and_relationship(event, updates)
+    after = get_update_counters()
+    assert after["writes"] - before["writes"] == 2
+    # impact 中的数值属性走世界状态的数组批量运算，不再逐 agent 产生补丁
+    assert after["patches"] - before["patches"] == 3
+    state.flush()
+    assert len(state.sink.rows) == 2
+    b = state.get_agent("b")
+    assert b.emotion == "高兴" and b.relationships == {"a": 0.1} and b.attributes.mood == 55
+    assert coalescer_module.relationship_graph.get("a", "b")[1] == 1
+
+def test_retried_fanout_does_not_repeat_completed_side_effects(state, monkeypatch):
+    submitted = []
+    def flaky_add(self, memories, defer=None):
+        submitted.append(len(memories))
+        if len(submitted) == 1:
+            raise RuntimeError("写后缓冲不可用")
+        return memories
+    monkeypatch.setattr(event_service_module.MemoryService, "add_memories", flaky_add)
+    event = Event(id="e2", type="SOCIAL", description="a和b一起吃饭", affectedAgents=["a", "b"], duration=0,
+                  impact={"mood": 5, "emotion": "愉快"})
+    job = {"event": event}
+    service = EventService()
+    with pytest.raises(RuntimeError):
+        service._fan_out_event(job)
+    service._fan_out_event(job)  # 流水线重试
+    graph = coalescer_module.relationship_graph
+    assert graph.interactions[graph.slot("a"), graph.slot("b")] == 1
+    assert submitted == [2, 2] and job["done"] == {"group", "memories", "attributes", "agents"}
+    a = state.get_agent("a")
+    assert a.attributes.mood == 55 and a.emotion == "愉快"
+    service._fan_out_event(job)  # 已全部完成的 job 再次执行不产生任何副作用
+    assert state.get_agent("a").attributes.mood == 55 and submitted == [2, 2]
+
+def test_attribute_deltas_apply_on_top_of_concurrent_batch_changes(state):
+    service = AgentService()
+    updates = AgentUpdateCoalescer(service)
+    updates.add_attribute_delta("a", "mood", 10)
+    updates.set_field("a", "energy", 40)
+    state.apply_attribute_deltas(["a"], {"mood": 5, "sociability": -10})  # 合并期间演化引擎的批量修改
+    updates.flush()
+    attrs = state.get_agent("a").attributes
+    assert (attrs.mood, attrs.energy, attrs.sociability) == (65, 40, 40)
+
+def test_relationship_deltas_stamp_simulation_time(state, monkeypatch):
+    monkeypatch.setattr(coalescer_module.simulation_clock, "now_ms", lambda: 42_000)
+    with AgentUpdateCoalescer(AgentService()) as updates:
+        updates.add_relationship_delta("a", "b", 0.1)
+    assert coalescer_module.relationship_graph.get("a", "b")[2] == 42_000
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+from backend.services import llm_service
+from backend.services.embedding_cache import EmbeddingCache, embedding_cache
+
+MODEL = "text-embedding-v3"
+
+def test_lru_hits_misses_and_eviction():
+    cache = EmbeddingCache(max_entries=2)
+    assert cache.get(MODEL, "a") is None
+    cache.put(MODEL, "a", [0.5, 0.25])
+    cache.put(MODEL, "b", [1.0, 0.0])
+    assert cache.get(MODEL, "a") == [0.5, 0.25]
+    cache.put(MODEL, "c", [0.0, 1.0])  # 淘汰最久未使用的 b
+    assert cache.get(MODEL, "b") is None
+    assert cache.get(MODEL, "a") is not None
+    assert cache.get("other-model", "a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 3 and stats["entries"] == 2
+
+def test_disk_store_survives_restart(tmp_path):
+    path = str(tmp_path / "emb.sqlite")
+    EmbeddingCache(max_entries=8, disk_path=path).put(MODEL, "政策调整", [0.125, -2.0, 3.5])
+    reopened = EmbeddingCache(max_entries=8, disk_path=path)
+    assert reopened.get(MODEL, "政策调整") == [0.125, -2.0, 3.5]
+    assert reopened.stats()["diskHits"] == 1
+
+class _FakeEmbeddings:
+    def __init__(self):
+        self.requests = []
+
+    def create(self, input, model):
+        self.requests.append(list(input))
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(len(t))]) for i, t in enumerate(input)])
+
+def test_get_embeddings_dedups_and_respects_batch_limit(monkeypatch):
+    fake = _FakeEmbeddings()
+    monkeypatch.setattr(llm_service, "DASHSCOPE_API_KEY", "test-key")
+    monkeypatch.setattr(llm_service, "get_llm_client", lambda key: SimpleNamespace(embeddings=fake))
+    embedding_cache.clear()
+    texts = ["最新政策/税率: 商店税上调"] * 500 + [f"记忆{i}" for i in range(25)]
+    embs = llm_service.LLMService().get_embeddings(texts)
+    assert len(embs) == len(texts)
+    assert len(fake.requests) == 3  # 26 条去重后的文本，每批最多 10 条
+    assert all(len(r) <= 10 for r in fake.requests)
+    assert embs[0] == embs[499] and len(embs[0]) == 1536
+    llm_service.LLMService().get_embeddings(texts[:3])
+    assert len(fake.requests) == 3
+    embedding_cache.clear()
@@ -0,0 +1,53 @@
+import threading
+import time
+from backend.models import Agent, Event
+from backend.services.event_cascade import EventCascade
+from backend.services.reaction_fanout import ReactionFanout
+
+AGENTS = {i: Agent(id=i, name=f"A{i}", position={"x": 0, "y": 0}, state="IDLE") for i in ("a", "b", "c", "d")}
+SETTINGS = {'maxDepth': 2, 'maxChildrenPerEvent': 2, 'maxEventsPerAgent': 2, 'maxEventsPerCascade': 10, 'budgetSeconds': 10}
+
+def _event(event_id, agents, from_agent=None):
+    return Event(id=event_id, type="DIALOGUE", description=event_id, affected_agents=agents, duration=1, from_agent=from_agent)
+
+def _cascade(submitted, settings=SETTINGS, timeout=5):
+    return EventCascade(dict(settings), ReactionFanout(max_workers=8, timeout=timeout), submitted.append,
+                        lambda ids: [AGENTS[i] for i in ids if i in AGENTS])
+
+def test_breadth_first_with_causal_ids_and_depth_limit():
+    submitted = []
+    seen = []
+
+    def react(agent, source, emit):
+        # 每个人都回复给事件发起者（或 a），形成无限对话
+        seen.append((source.id, agent.id))
+        reply_to = source.from_agent or "a"
+        emit(_event(f"{source.id}>{agent.id}", [agent.id, reply_to], from_agent=agent.id))
+
+    report = _cascade(submitted).run(_event("root", ["b", "c"]), react)
+    assert [len(level) for level in report.levels] == [2, 2, 2]
+    assert [e.id for e in submitted] == ["root>b", "root>c", "root>b>a", "root>c>a"]
+    assert all(e.meta["causalId"] == "root" for e in submitted)
+    assert submitted[2].meta == {"causalId": "root", "parentId": "root>b", "depth": 2}
+    # 第 2 层的反应照常进行，但其触发事件超出深度被丢弃；a 触发满 2 个后不再接纳
+    assert report.emitted == 4 and report.dropped == 2
+
+def test_chatty_agent_is_capped_and_slow_agent_does_not_stall():
+    submitted = []
+    release = threading.Event()
+
+    def react(agent, source, emit):
+        if agent.id == "d":
+            release.wait(2)  # 慢 agent：超时后迟到的事件被丢弃
+            emit(_event(f"late-{agent.id}", ["a"], from_agent=agent.id))
+            return
+        for i in range(10):
+            emit(_event(f"{source.id}-{agent.id}-{i}", ["c"], from_agent=agent.id))
+
+    settings = dict(SETTINGS, maxDepth=1)
+    start = time.monotonic()
+    report = _cascade(submitted, settings, timeout=0.2).run(_event("root", ["b", "d"]), react)
+    assert time.monotonic() - start < 1.5
+    release.set()
+    assert [e.id for e in submitted] == ["root-b-0", "root-b-1"]
+    assert report.levels[0][1].timed_out and report.emitted == 2
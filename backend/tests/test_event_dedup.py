@@ -0,0 +1,56 @@
+from backend.models import Event
+from backend.services.event_dedup import EventDeduplicator
+
+VECTORS = {
+    "集市开张": [1.0, 0.0, 0.0],
+    "集市今天开张": [0.99, 0.05, 0.0],      # ~0.999 丢弃
+    "集市开张了，人很多": [0.95, 0.3, 0.0],  # ~0.954 合并
+    "集市附近有演出": [0.88, -0.47, 0.0],    # ~0.882 减弱
+    "暴雨来袭": [0.0, 0.0, 1.0],
+    "停电": [0.0, 1.0, 0.0],
+    "桥梁维修": [0.0, 0.7, 0.7],
+}
+SETTINGS = {'window': 3, 'windowSeconds': 3600, 'dropThreshold': 0.97, 'mergeThreshold': 0.92,
+            'downweightThreshold': 0.85, 'downweightImpactScale': 0.5, 'downweightMaxReactors': 1}
+
+def _event(i, description, agents, impact=None):
+    return Event(id=f"e{i}", type="LLM", description=description, affected_agents=agents, duration=1, impact=impact or {})
+
+def test_tiers_by_similarity_and_reports_metrics():
+    dedup = EventDeduplicator(SETTINGS, embed=lambda text: VECTORS[text])
+    assert dedup.check(_event(0, "集市开张", ["a", "b"])).action == "keep"
+    dropped = dedup.check(_event(1, "集市今天开张", ["a", "b"]))
+    assert dropped.action == "drop" and dropped.match_id == "e0" and not dropped.persist
+    merged_event = _event(2, "集市开张了，人很多", ["a", "b", "c"])
+    merged = dedup.check(merged_event)
+    assert merged.action == "merge" and merged.reactors == ["c"] and merged_event.meta["duplicateOf"] == "e0"
+    assert merged_event.affectedAgents == ["c"] and merged_event.meta["coveredAgents"] == ["a", "b"]
+    similar = _event(3, "集市附近有演出", ["c", "d"], {"mood": 4, "state": "IDLE"})
+    decision = dedup.check(similar)
+    assert decision.action == "downweight" and decision.reactors == ["c"]
+    assert similar.impact == {"mood": 2.0, "state": "IDLE"} and similar.embedding == VECTORS["集市附近有演出"]
+    assert dedup.check(_event(4, "暴雨来袭", ["a"])).action == "keep"
+    stats = dedup.stats()
+    assert stats["checked"] == 5 and stats["dropped"] == 1 and stats["merged"] == 1 and stats["downweighted"] == 1
+    assert stats["suppressionRate"] == 0.6 and stats["reactionsSaved"] == 2 + 2 + 1
+
+def test_window_slides_and_embedding_errors_fail_open():
+    dedup = EventDeduplicator(SETTINGS, embed=lambda text: VECTORS[text])
+    dedup.check(_event(0, "集市开张", ["a"]))
+    for i, description in enumerate(["暴雨来袭", "停电", "桥梁维修"], 1):  # 窗口只保留 3 条，最早的集市事件被挤出
+        assert dedup.check(_event(i, description, ["a"])).action == "keep"
+    assert dedup.check(_event(9, "集市今天开张", ["a"])).action == "keep"
+    failing = EventDeduplicator(SETTINGS, embed=lambda text: (_ for _ in ()).throw(RuntimeError("offline")))
+    assert failing.check(_event(0, "集市开张", ["a"])).action == "keep" and failing.stats()["errors"] == 1
+
+def test_merge_only_affects_uncovered_agents_and_extends_coverage():
+    vectors = {"集市开张": [1.0, 0.0, 0.0], "集市开张了，人很多": [0.95, 0.3, 0.0], "集市开张了，很热闹": [0.95, -0.3, 0.0]}
+    dedup = EventDeduplicator(SETTINGS, embed=lambda text: vectors[text])
+    dedup.check(_event(0, "集市开张", ["a", "b"], {"mood": 5}))
+    first = _event(1, "集市开张了，人很多", ["a", "c"], {"mood": 5})
+    assert dedup.check(first).reactors == ["c"] and first.affectedAgents == ["c"] and first.impact == {"mood": 5}
+    # 第二次重复仍匹配原事件：c 已并入原事件的覆盖范围，只剩 d 是新受影响者
+    second = _event(2, "集市开张了，很热闹", ["a", "c", "d"], {"mood": 5})
+    decision = dedup.check(second)
+    assert decision.action == "merge" and decision.match_id == "e0" and second.affectedAgents == ["d"]
+    assert dedup.stats()["reactionsSaved"] == 1 + 2
@@ -0,0 +1,43 @@
+from backend.models import Agent, Event
+from backend.services.event_lifetime import EventLifetimeScheduler
+from backend.services.world_state import WorldState
+
+def _state(n=3, mood=50):
+    agents = [Agent(id=str(i), name=f"A{i}", position={"x": 0, "y": 0}, state="IDLE",
+                    attributes={"energy": 100, "mood": mood, "sociability": 50}) for i in range(n)]
+    return WorldState(agents, settings={'flushIntervalSeconds': 60})
+
+def _event(i, start, duration, impact, agents=("0", "1")):
+    return Event(id=f"e{i}", type="SOCIAL", description="", affected_agents=list(agents),
+                 start_time=start, duration=duration, impact=impact)
+
+def _mood(state, agent_id):
+    return state.get_agent(agent_id).attributes.mood
+
+def test_applies_on_start_and_reverts_actual_delta_on_expiry():
+    state = _state(mood=95)
+    scheduler = EventLifetimeScheduler(state, clock=lambda: 0)
+    notified = []
+    scheduler.subscribe(notified.append)
+    assert not scheduler.register(_event(0, 0, 0, {"mood": 10}), ["0"])  # 无持续时间：由调用方永久施加
+    assert scheduler.register(_event(1, 0, 1000, {"mood": 10, "energy": -20}), ["0", "1"])
+    assert scheduler.register(_event(2, 500, 1000, {"mood": -30}), ["1"])  # 尚未开始
+    assert _mood(state, "0") == 100 and state.get_agent("0").attributes.energy == 80
+    assert scheduler.advance(600) == [] and _mood(state, "1") == 70
+    assert scheduler.advance(1000) == ["e1"] and notified == [["e1"]]
+    assert _mood(state, "0") == 95 and _mood(state, "1") == 65 and state.get_agent("1").attributes.energy == 100
+    assert scheduler.advance(2000) == ["e2"] and _mood(state, "1") == 95
+    assert scheduler.stats()["tracked"] == 0 and scheduler.stats()["expired"] == 2
+    state.close()
+
+def test_cancel_reverts_and_reregistration_ignores_stale_heap_items():
+    state = _state()
+    scheduler = EventLifetimeScheduler(state, clock=lambda: 0)
+    scheduler.register(_event(1, 0, 100, {"mood": 10}), ["0", "0", "2"])
+    scheduler.register(_event(2, 0, 100, {"mood": 5}), ["2"])
+    assert _mood(state, "0") == 60 and _mood(state, "2") == 65
+    assert scheduler.cancel("e1") and _mood(state, "0") == 50 and _mood(state, "2") == 55
+    scheduler.register(_event(2, 50, 500, {"mood": 5}), ["2"], now_ms=60)  # 重新登记，旧的到期点失效
+    assert _mood(state, "2") == 55
+    assert scheduler.advance(200) == [] and scheduler.advance(550) == ["e2"] and _mood(state, "2") == 50
+    state.close()
@@ -0,0 +1,94 @@
+import threading
+import time
+import pytest
+from backend.models import Event
+from backend.services import event_service
+from backend.services.event_pipeline import EventPipeline, PipelineFull
+from backend.services.event_service import EventService, _make_pipeline
+from backend.services.llm_service import LLMService
+from backend.services.vector_index import VectorIndex
+from backend.tests.fake_supabase import FakeSupabase
+
+def test_stages_retry_skip_optional_failures_and_report_latency():
+    seen, attempts = [], {}
+    def flaky(n):
+        attempts[n] = attempts.get(n, 0) + 1
+        if n == 2 and attempts[n] < 2:
+            raise RuntimeError("瞬时错误")
+        if n == 3:
+            raise RuntimeError("一直失败")
+    def enrich(n):
+        if n == 4:
+            raise RuntimeError("embedding 服务不可用")
+    pipeline = EventPipeline([
+        ("persist", flaky, {'workers': 2, 'max_retries': 1, 'retry_backoff': 0.001}),
+        ("enrich", enrich, {'max_retries': 0, 'optional': True}),
+        ("fanout", seen.append, {'workers': 2}),
+    ])
+    for n in range(5):
+        pipeline.submit(n)
+    assert pipeline.drain(timeout=5)
+    stats = pipeline.stats()
+    assert sorted(seen) == [0, 1, 2, 4]  # 3 持久化失败不再扇出；4 的可选阶段失败仍扇出
+    assert stats["accepted"] == 5 and stats["completed"] == 4 and stats["inFlight"] == 0
+    assert stats["stages"]["persist"]["retried"] == 2 and stats["stages"]["persist"]["failed"] == 1
+    assert stats["stages"]["enrich"]["failed"] == 1 and stats["stages"]["fanout"]["p95Ms"] >= 0
+    pipeline.close()
+
+def test_full_entry_queue_rejects_with_backpressure():
+    release = threading.Event()
+    pipeline = EventPipeline([("persist", lambda n: release.wait(), {'queue_size': 1})], accept_timeout=0.01)
+    pipeline.submit(1)  # 被工作线程取走并阻塞
+    time.sleep(0.05)
+    pipeline.submit(2)  # 占满队列
+    with pytest.raises(PipelineFull):
+        pipeline.submit(3)
+    release.set()
+    assert pipeline.drain(timeout=5) and pipeline.stats()["rejected"] == 1
+    pipeline.close()
+
+def test_add_event_acknowledges_then_persists_and_enriches(monkeypatch):
+    db = FakeSupabase(latency=0.02)
+    fanned = []
+    monkeypatch.setattr(event_service, "supabase", db)
+    monkeypatch.setattr(event_service, "event_index", VectorIndex("events"))
+    monkeypatch.setattr(LLMService, "get_embedding", lambda self, text: [0.5, 0.5])
+    monkeypatch.setattr(EventService, "_fan_out_event", lambda self, job: fanned.append(job["event"].id))
+    pipeline = _make_pipeline()
+    monkeypatch.setattr(event_service, "event_pipeline", pipeline)
+    started = time.perf_counter()
+    for i in range(8):
+        EventService().add_event(Event(id=f"e{i}", type="SOCIAL", description=f"聚会{i}", duration=1, affected_agents=["1"]))
+    assert time.perf_counter() - started < 0.1  # 只入队，不等待写库
+    assert pipeline.drain(timeout=5)
+    rows = {r["id"]: r for r in db.tables["events"]}
+    assert len(rows) == 8 and rows["e3"]["embedding"] == [0.5, 0.5] and rows["e3"]["affected_agents"] == ["1"]
+    assert sorted(fanned) == [f"e{i}" for i in range(8)]
+    pipeline.close()
+
+def test_persist_retry_after_stored_but_failed_response_is_idempotent(monkeypatch):
+    db = FakeSupabase()
+    monkeypatch.setattr(event_service, "supabase", db)
+    original = db.table
+    def table(name):
+        query = original(name)
+        execute = query.execute
+        def flaky_execute():
+            result = execute()
+            if query.op == 'upsert' and len(db.tables["events"]) == 1 and not getattr(db, "failed", False):
+                db.failed = True
+                raise TimeoutError("写入成功但响应超时")
+            return result
+        query.execute = flaky_execute
+        return query
+    monkeypatch.setattr(db, "table", table)
+    fanned = []
+    monkeypatch.setattr(EventService, "_enrich_event", lambda self, job: None)
+    monkeypatch.setattr(EventService, "_fan_out_event", lambda self, job: fanned.append(job["event"].id))
+    pipeline = _make_pipeline()
+    monkeypatch.setattr(event_service, "event_pipeline", pipeline)
+    EventService().add_event(Event(id="p1", type="SOCIAL", description="聚会", duration=1, affected_agents=["1"]))
+    assert pipeline.drain(timeout=10)
+    assert [r["id"] for r in db.tables["events"]] == ["p1"] and fanned == ["p1"]
+    assert pipeline.stats()["stages"]["persist"]["retried"] == 1
+    pipeline.close()
@@ -0,0 +1,62 @@
+import pytest
+from backend.models import Agent, Memory
+from backend.services import agent_service, memory_service
+from backend.services.agent_service import AgentService
+from backend.services.memory_service import LatestMemoriesCache, MemoryService
+from backend.services.world_state import NullSink, WorldState
+from backend.services.write_behind import WriteBehindBuffer
+from backend.tests.fake_supabase import FakeSupabase
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeSupabase()
+    buf = WriteBehindBuffer("memories", lambda b: MemoryService()._persist_memories(b), flush_interval=60)
+    monkeypatch.setattr(memory_service, "supabase", db)
+    monkeypatch.setattr(memory_service, "memory_write_buffer", buf)
+    monkeypatch.setattr(memory_service, "latest_memories_cache", LatestMemoriesCache(ttl=60))
+    yield db
+    buf.close()
+
+def _row(agent_id, ts):
+    return {"id": f"{agent_id}-{ts}", "agent_id": agent_id, "content": "x", "timestamp": ts, "importance": 1, "type": "EVENT"}
+
+def test_loads_latest_k_per_agent_with_skewed_activity(fake_db):
+    # agent 0 非常活跃，最新的记忆全是它的；其余 agent 只有少量旧记忆
+    fake_db.tables["memories"] = [_row("0", 1000 + i) for i in range(100)]
+    fake_db.tables["memories"] += [_row(str(a), ts) for a in range(1, 20) for ts in range(a % 4 * 3)]
+    latest = MemoryService().get_latest_memories([str(a) for a in range(20)], k=5)
+    assert [m.timestamp for m in latest["0"]] == [1099, 1098, 1097, 1096, 1095]
+    for a in range(1, 20):
+        expected = sorted(range(a % 4 * 3), reverse=True)[:5]
+        assert [m.timestamp for m in latest[str(a)]] == expected
+    assert fake_db.calls <= 3
+
+def test_cache_is_shared_and_invalidated_on_write(fake_db):
+    fake_db.tables["memories"] = [_row("1", ts) for ts in range(10)]
+    service = MemoryService()
+    service.get_latest_memories(["1"], k=3)
+    calls = fake_db.calls
+    assert [m.timestamp for m in service.get_latest_memories(["1"], k=2)["1"]] == [9, 8]
+    assert fake_db.calls == calls
+    service.add_memories([Memory(id="new", agent_id="1", content="y", timestamp=50, embedding=[1.0])])
+    assert [m.id for m in service.get_latest_memories(["1"], k=2)["1"]] == ["new", "1-9"]
+
+def test_get_agents_loads_memories_in_one_round_trip(fake_db, monkeypatch):
+    agents = [Agent(id=str(a), name=f"A{a}", position={"x": 0, "y": 0}, state="IDLE") for a in range(50)]
+    monkeypatch.setattr(agent_service, "world_state", WorldState(agents, NullSink()))
+    fake_db.tables["memories"] = [_row(str(a), ts) for a in range(50) for ts in range(8)]
+    loaded = AgentService().get_agents()
+    assert fake_db.calls == 1
+    assert all([m.timestamp for m in a.memories] == [7, 6, 5, 4, 3] for a in loaded)
+    assert all(a.memories == [] for a in agents)  # 返回副本，不改动世界状态中的对象
+
+def test_quiet_agents_do_not_fall_back_to_per_agent_queries(fake_db):
+    # agent 0 占满第一轮，agent 1~10 占满第二轮；40 个安静 agent 只有 2 条更早的记忆
+    fake_db.tables["memories"] = [_row("0", 100000 + i) for i in range(1000)]
+    fake_db.tables["memories"] += [_row(str(a), 10000 + i * 10 + a) for a in range(1, 11) for i in range(200)]
+    fake_db.tables["memories"] += [_row(str(a), ts) for a in range(11, 51) for ts in range(2)]
+    latest = MemoryService().get_latest_memories([str(a) for a in range(51)], k=5)
+    assert [m.timestamp for m in latest["0"]] == [100999, 100998, 100997, 100996, 100995]
+    assert [m.timestamp for m in latest["3"]] == [11993, 11983, 11973, 11963, 11953]
+    assert all([m.timestamp for m in latest[str(a)]] == [1, 0] for a in range(11, 51))
+    assert fake_db.calls <= 3
@@ -0,0 +1,22 @@
+import asyncio
+from backend.services.llm_client import get_llm_client, get_async_llm_client, reset_llm_clients
+
+BASE_URL = "http://127.0.0.1:9/v1"
+
+def test_client_reused_per_base_url_and_key():
+    reset_llm_clients()
+    a = get_llm_client("key-a", BASE_URL)
+    assert get_llm_client("key-a", BASE_URL) is a
+    assert get_llm_client("key-b", BASE_URL) is not a
+    assert get_llm_client("key-a", BASE_URL + "/") is a
+    reset_llm_clients()
+    assert get_llm_client("key-a", BASE_URL) is not a
+    reset_llm_clients()
+
+def test_async_client_reused_within_loop():
+    async def fetch_twice():
+        return get_async_llm_client("key-a", BASE_URL), get_async_llm_client("key-a", BASE_URL)
+    first, second = asyncio.run(fetch_twice())
+    assert first is second
+    other, _ = asyncio.run(fetch_twice())
+    assert other is not first
@@ -0,0 +1,47 @@
+import pytest
+from backend.services import memory_consolidation, memory_service
+from backend.services.memory_consolidation import MemoryConsolidationService
+from backend.tests.fake_supabase import FakeSupabase
+
+NOW = 100 * 3600 * 1000
+SETTINGS = {
+    'insertBatchSize': 200, 'consolidationMinAgeMinutes': 60, 'consolidationMaxImportance': 1,
+    'consolidationSimilarity': 0.9, 'consolidationMinClusterSize': 3, 'consolidationBatchSize': 2000,
+    'summaryMaxChars': 300, 'maxMemoriesPerAgent': 8, 'protectedTypes': ['POLICY', 'SUMMARY'],
+}
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeSupabase()
+    monkeypatch.setattr(memory_consolidation, "supabase", db)
+    monkeypatch.setattr(memory_service, "supabase", db)
+    return db
+
+def _row(i, content, embedding, importance=1, type="RESULT", hours_ago=10):
+    return {"id": f"m{i}", "agent_id": "1", "content": content, "timestamp": NOW - hours_ago * 3600 * 1000,
+            "importance": importance, "type": type, "embedding": embedding, "tags": []}
+
+def test_clusters_old_low_importance_memories_into_summaries(fake_db):
+    rows = [_row(i, "你完成了本次行动，结果待观察。", [1.0, 0.0, 0.0]) for i in range(6)]
+    rows += [_row(10 + i, f"散步{i}", [0.0, 1.0, 0.1 * i], type="EVENT") for i in range(3)]
+    rows += [_row(20, "重要对话", [0.0, 0.0, 1.0], importance=3, type="DIALOGUE"),
+             _row(21, "最新政策/税率", [1.0, 0.0, 0.0], type="POLICY"),
+             _row(22, "刚发生的结果", [1.0, 0.0, 0.0], hours_ago=0)]
+    fake_db.tables["memories"] = rows
+    report = MemoryConsolidationService(SETTINGS).consolidate_agent("1", now=NOW)
+    remaining = fake_db.tables["memories"]
+    summaries = [r for r in remaining if r["type"] == "SUMMARY"]
+    assert report["summariesAdded"] == 2 and len(summaries) == 2
+    assert report["rowsRemoved"] == 9 and report["rowsAfter"] == len(remaining) == 5
+    assert report["bytesReclaimed"] > 0
+    assert {"m20", "m21", "m22"} <= {r["id"] for r in remaining}
+    assert all(abs(sum(v * v for v in s["embedding"]) - 1.0) < 1e-5 for s in summaries)
+
+def test_enforces_per_agent_cap_without_touching_protected_types(fake_db):
+    rows = [_row(i, f"重要记忆{i}", [float(i), 1.0, 0.0], importance=3, type="DIALOGUE", hours_ago=i) for i in range(12)]
+    rows.append(_row(99, "最新政策/税率", [1.0, 0.0, 0.0], type="POLICY", hours_ago=50))
+    fake_db.tables["memories"] = rows
+    report = MemoryConsolidationService(SETTINGS).consolidate_agent("1", now=NOW)
+    remaining = {r["id"] for r in fake_db.tables["memories"]}
+    assert report["evicted"] == 5 and len(remaining) == 8
+    assert "m99" in remaining and "m0" in remaining and "m11" not in remaining
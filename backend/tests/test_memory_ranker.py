@@ -0,0 +1,32 @@
+from backend.models import Memory
+from backend.services.memory_ranker import MemoryRanker
+
+NOW = 10_000_000
+SETTINGS = {'recencyWeight': 1.0, 'importanceWeight': 1.0, 'relevanceWeight': 1.0, 'recencyHalfLifeMinutes': 1}
+
+def _mem(i, minutes_ago, importance=1, type="EVENT", embedding=None):
+    return Memory(id=f"m{i}", agent_id="1", content=f"记忆{i}", timestamp=NOW - minutes_ago * 60000,
+                  importance=importance, type=type, embedding=embedding)
+
+def test_recent_sections_follow_timestamp_order():
+    memories = [_mem(0, 5, type="DIALOGUE"), _mem(1, 1), _mem(2, 3, type="DIALOGUE"), _mem(3, 0)]
+    ranked = MemoryRanker(SETTINGS).rank(memories, now=NOW)
+    assert [m.id for m in ranked.recent(3)] == ["m3", "m1", "m2"]
+    assert [m.id for m in ranked.recent(5, "DIALOGUE")] == ["m2", "m0"]
+    assert ranked.latest("DIALOGUE", lambda m: m.id == "m0").id == "m0"
+
+def test_combined_score_blends_recency_importance_and_relevance():
+    memories = [
+        _mem(0, 0, importance=1, embedding=[0.0, 1.0]),
+        _mem(1, 30, importance=3, embedding=[1.0, 0.0]),
+        _mem(2, 30, importance=1, embedding=[0.0, 1.0]),
+    ]
+    ranked = MemoryRanker(dict(SETTINGS, importanceWeight=0.8)).rank(memories, now=NOW)
+    assert ranked.top(1)[0].id == "m0"  # 仅近因+重要性时，最新的一条胜出
+    ranked.with_relevance([1.0, 0.0])
+    assert ranked.top(1)[0].id == "m1"  # 加入相关度后，重要且相关的旧记忆排第一
+    assert [m.id for m in ranked.top(3)][-1] == "m2"
+
+def test_handles_empty_memories():
+    ranked = MemoryRanker(SETTINGS).rank([], now=NOW).with_relevance([1.0])
+    assert ranked.top(3) == [] and ranked.recent(3) == [] and ranked.latest() is None
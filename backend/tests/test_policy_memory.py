@@ -0,0 +1,49 @@
+import pytest
+from backend.models import Event, Memory
+from backend.services import memory_service, policy_memory_service
+from backend.services.llm_service import LLMService
+from backend.services.policy_memory_service import PolicyMemoryService
+from backend.services.write_behind import WriteBehindBuffer
+from backend.tests.fake_supabase import FakeSupabase
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeSupabase()
+    buf = WriteBehindBuffer("memories", lambda b: memory_service.MemoryService()._persist_memories(b), flush_interval=60)
+    for module in (memory_service, policy_memory_service):
+        monkeypatch.setattr(module, "supabase", db)
+        monkeypatch.setattr(module, "memory_write_buffer", buf)
+    monkeypatch.setattr(policy_memory_service, "state_agents", [])
+    monkeypatch.setattr(LLMService, "get_embedding", lambda self, text: [1.0, 0.0])
+    yield db
+    buf.close()
+
+def _event(i):
+    return Event(id=f"e{i}", type="POLICY", description=f"税率调整为{i}%", impact={}, startTime=i, duration=1, affectedAgents=[])
+
+def test_replaces_policy_memories_with_bulk_statements(fake_db):
+    agent_ids = [str(i) for i in range(450)]
+    fake_db.tables["agents"] = [{"id": a} for a in agent_ids]
+    fake_db.tables["memories"] = [{"id": f"old-{a}", "agent_id": a, "type": "POLICY", "content": "最新政策/税率: 旧"} for a in agent_ids]
+    fake_db.tables["memories"].append({"id": "talk", "agent_id": "1", "type": "DIALOGUE", "content": "我们聊聊税"})
+    memory_service.memory_write_buffer.submit([Memory(id="queued", agent_id="2", content="旧政策", timestamp=0, importance=3, type="POLICY")])
+
+    report = PolicyMemoryService({'policyDeleteChunkSize': 200, 'insertBatchSize': 200}).replace_policy_memories(_event(5))
+    rows = fake_db.tables["memories"]
+    assert report["deleted"] == 451 and report["inserted"] == 450
+    assert fake_db.calls == 1 + 3 + 3  # 取 agent id + 3 次集合删除 + 3 次批量插入
+    assert sorted(r["id"] for r in rows if r["type"] == "POLICY") == sorted(f"e5-{a}-policy" for a in agent_ids)
+    assert any(r["id"] == "talk" for r in rows)
+    assert memory_service.memory_write_buffer.pending() == []
+
+def test_fanout_skips_policy_older_than_the_applied_one(monkeypatch):
+    from backend.services import event_service
+    applied = []
+    monkeypatch.setattr(event_service, "_applied_policy", {"startTime": None, "id": None})
+    monkeypatch.setattr(PolicyMemoryService, "replace_policy_memories", lambda self, event: applied.append(event.id))
+    monkeypatch.setattr(event_service.EventService, "_write_event_memories_and_update_agents", lambda self, event, updates, done=None: None)
+    monkeypatch.setattr(event_service.EventService, "_auto_adjust_emotion_and_relationship", lambda self, event, updates: None)
+    service = event_service.EventService()
+    for i in (5, 3, 7, 7):   # e3 晚于 e5 到达 fanout，但 startTime 更早
+        service._fan_out_event({"event": _event(i)})
+    assert applied == ["e5", "e7", "e7"]
@@ -0,0 +1,49 @@
+from backend.models import Event
+from backend.services import event_service
+from backend.services.event_service import EventService
+from backend.services.policy_registry import PolicyRegistry, is_policy_event
+from backend.tests.fake_supabase import FakeSupabase
+
+def _event(i, type="POLICY", description=None, duration=300000, meta=None):
+    return Event(id=f"p{i}", type=type, description=description or f"新政策{i}", start_time=i * 1000,
+                 duration=duration, meta={"type": "税率", "target": "商户"} if meta is None else meta)
+
+def test_classifies_once_and_serves_recent_active_policies():
+    registry = PolicyRegistry(capacity=3)
+    assert registry.observe(_event(0, type="SOCIAL", description="集市开张", meta={})) is None
+    assert is_policy_event(_event(1, type="SOCIAL", description="调整房产税"))
+    for i in range(1, 5):
+        meta = {"type": "税率", "target": "商户", "duration": 1000} if i == 3 else None
+        registry.observe(_event(i, meta=meta))
+    assert len(registry) == 3  # 最早的 p1 被淘汰
+    # 只有 meta 显式给出有效时长的 p3 到期；事件本身的 duration 不影响政策有效期
+    assert [p.id for p in registry.recent(5, now_ms=10_000_000)] == ["p2", "p4"]
+    assert [p.id for p in registry.recent(2, active_only=False)] == ["p3", "p4"]
+    record = registry.recent(1)[0]
+    assert record.describe() == "新政策4 类型:税率 目标:商户 影响:未知" and record.expires_at is None
+    assert registry.remove("p4") and [p.id for p in registry.recent(1)] == ["p2"]
+
+def test_warm_load_reads_latest_policies_in_publish_order(monkeypatch):
+    db = FakeSupabase()
+    db.tables["events"] = [_event(i).dict(by_alias=True) for i in range(4)] + [_event(9, type="SOCIAL", description="集市开张", meta={}).dict(by_alias=True)]
+    registry = PolicyRegistry(capacity=2)
+    monkeypatch.setattr(event_service, "supabase", db)
+    monkeypatch.setattr(event_service, "policy_registry", registry)
+    assert EventService().warm_load_policies() == 2
+    assert [p.id for p in registry.recent(5)] == ["p2", "p3"]
+
+def test_warm_load_classifies_generated_policies_like_ingest(monkeypatch):
+    # Titan 生成的政策多为 LLM 类型，只能按描述/meta 识别
+    db = FakeSupabase()
+    db.tables["events"] = [_event(i, type="SOCIAL", description=f"集市{i}", meta={}).dict(by_alias=True) for i in range(10, 30)]
+    db.tables["events"] += [_event(5, type="LLM", description="上调房产税").dict(by_alias=True),
+                            _event(7, type="LLM", description="夜市开放", meta={"policy": "宵禁取消"}).dict(by_alias=True),
+                            _event(8, type="POLICY").dict(by_alias=True)]
+    registry = PolicyRegistry(capacity=5)
+    monkeypatch.setattr(event_service, "supabase", db)
+    monkeypatch.setattr(event_service, "policy_registry", registry)
+    monkeypatch.setattr(event_service.ConfigManager, "get_policy_registry_settings",
+                        classmethod(lambda cls: {'warmLoad': True, 'warmLoadScanLimit': 100, 'warmLoadPageSize': 8}))
+    assert EventService().warm_load_policies() == 3
+    assert [p.id for p in registry.recent(5)] == ["p5", "p7", "p8"]
+    assert db.calls == 3  # 23 行，每页 8 行
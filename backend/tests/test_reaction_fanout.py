@@ -0,0 +1,36 @@
+import time
+import pytest
+from backend.services.reaction_fanout import ReactionFanout
+
+@pytest.fixture
+def fanout():
+    f = ReactionFanout(max_workers=64, timeout=1.0)
+    yield f
+    f.shutdown()
+
+def test_results_keep_input_order(fanout):
+    delays = [0.05, 0.01, 0.03, 0.0]
+    results = fanout.run(list(range(4)), lambda i: time.sleep(delays[i]) or i * 10)
+    assert [r.item for r in results] == [0, 1, 2, 3]
+    assert [r.value for r in results] == [0, 10, 20, 30]
+
+def test_slow_and_failing_agents_do_not_block_others(fanout):
+    def react(i):
+        if i == 1:
+            time.sleep(3)
+        if i == 2:
+            raise ValueError("boom")
+        return i
+    start = time.monotonic()
+    results = fanout.run([0, 1, 2, 3], react, timeout=0.2)
+    assert time.monotonic() - start < 1.0
+    assert results[0].ok and results[3].ok
+    assert results[1].timed_out
+    assert isinstance(results[2].error, ValueError)
+
+@pytest.mark.parametrize("n", [4, 64])
+def test_wall_time_stays_flat(fanout, n):
+    start = time.monotonic()
+    results = fanout.run(list(range(n)), lambda i: time.sleep(0.1))
+    assert all(r.ok for r in results)
+    assert time.monotonic() - start < 0.5
@@ -0,0 +1,66 @@
+from backend.services import event_service
+from backend.services.event_service import EventService
+from backend.services.recent_events import RecentEventBuffer
+from backend.tests.fake_supabase import FakeSupabase
+
+def _row(i, type="SOCIAL"):
+    return {"id": f"e{i}", "type": type, "description": f"事件{i}", "affected_agents": ["1"], "start_time": i * 1000,
+            "duration": 1, "created_at": f"2025-01-01 00:{i // 60:02d}:{i % 60:02d}", "embedding": [0.1]}
+
+def test_ring_buffer_pages_newest_first_and_reports_misses():
+    buffer = RecentEventBuffer(capacity=4)
+    for i in range(6):
+        buffer.add(_row(i, "POLICY" if i % 2 else "SOCIAL"))
+    assert [e["id"] for e in buffer.page(None, 2, 1)] == ["e4", "e3"]
+    assert [e["id"] for e in buffer.page("POLICY", 2, 0)] == ["e5", "e3"]
+    assert buffer.page("POLICY", 3, 0) is None  # 更早的 POLICY 已被淘汰，需查库
+    event = buffer.page(None, 1, 0)[0]
+    assert event["affectedAgents"] == ["1"] and event["startTime"] == 5000 and "embedding" not in event
+    buffer.remove("e5")
+    assert [e["id"] for e in buffer.page("POLICY", 1, 0)] == ["e3"]
+
+def test_get_events_serves_from_buffer_and_falls_back_for_deep_history(monkeypatch):
+    db = FakeSupabase()
+    db.tables["events"] = [_row(i) for i in range(10)]
+    buffer = RecentEventBuffer(capacity=5)
+    monkeypatch.setattr(event_service, "supabase", db)
+    monkeypatch.setattr(event_service, "recent_events", buffer)
+    service = EventService()
+    assert service.warm_load_recent_events() == 5 and buffer.truncated
+    calls = db.calls
+    assert [e["id"] for e in service.get_events(limit=3, offset=1)] == ["e8", "e7", "e6"]
+    assert db.calls == calls  # 命中缓冲不查库
+    assert [e["id"] for e in service.get_events(limit=3, offset=4)] == ["e5", "e4", "e3"]
+    assert db.calls == calls + 1
+
+def test_complete_warm_load_answers_everything_from_memory(monkeypatch):
+    db = FakeSupabase()
+    db.tables["events"] = [_row(i) for i in range(3)]
+    monkeypatch.setattr(event_service, "supabase", db)
+    monkeypatch.setattr(event_service, "recent_events", RecentEventBuffer(capacity=5))
+    service = EventService()
+    service.warm_load_recent_events()
+    calls = db.calls
+    assert [e["id"] for e in service.get_events()] == ["e2", "e1", "e0"]
+    assert service.get_events(type="POLICY") == [] and db.calls == calls
+
+def test_llm_generated_event_goes_through_pipeline_into_buffer(monkeypatch):
+    from backend.routers import event as event_router
+    from backend.services.event_service import _make_pipeline
+    from backend.services.llm_service import LLMService
+    from backend.models import Event
+    db = FakeSupabase()
+    buffer = RecentEventBuffer(capacity=5)
+    monkeypatch.setattr(event_service, "supabase", db)
+    monkeypatch.setattr(event_service, "recent_events", buffer)
+    monkeypatch.setattr(EventService, "_enrich_event", lambda self, job: None)
+    monkeypatch.setattr(EventService, "_fan_out_event", lambda self, job: None)
+    pipeline = _make_pipeline()
+    monkeypatch.setattr(event_service, "event_pipeline", pipeline)
+    generated = Event(id="g1", type="LLM", description="集市开张", affectedAgents=["1"], startTime=1, duration=1).dict()
+    monkeypatch.setattr(LLMService, "generate_event_via_llm", lambda self, context, persist=True: None if persist else generated)
+    event_router.llm_generate_event({"time": "08:00"}, EventService())
+    assert pipeline.drain(timeout=5)
+    assert [r["id"] for r in db.tables["events"]] == ["g1"]
+    assert [e["id"] for e in EventService().get_events(limit=1)] == ["g1"]
+    pipeline.close()
@@ -0,0 +1,34 @@
+import pytest
+from backend.services.relationship_graph import RelationshipGraph
+
+def _graph():
+    graph = RelationshipGraph(capacity=2)  # 触发扩容
+    graph.load_agent("a", {"b": 0.5, "c": -0.3})
+    graph.add_affinity("a", "d", 0.1, interactions=3, now=1000)
+    graph.add_affinity("a", "b", 0.1, now=2000)
+    graph.record_group(["a", "c", "e"], now=3000)
+    return graph
+
+def test_top_partners_and_neighbors():
+    graph = _graph()
+    assert [p for p, _, _ in graph.top_partners("a", 2)] == ["d", "b"]
+    assert [p for p, _, _ in graph.top_partners("a", 2, by="affinity")] == ["b", "d"]
+    assert graph.get("a", "b") == (pytest.approx(0.6), 1, 2000)
+    assert graph.get("c", "e")[1] == 1 and graph.get("e", "e")[1] == 0
+    assert sorted(graph.neighbors("a")) == ["b", "c", "d", "e"]
+    assert sorted(graph.neighbors("a", min_affinity=0.05)) == ["b", "d"]
+    assert graph.relationships_of("a") == {"b": 0.6, "c": -0.3, "d": 0.1}
+
+def test_decay_remove_and_binary_round_trip():
+    graph = _graph()
+    graph.last_decay = 0
+    assert graph.decay_elapsed(half_life_hours=1, now=3600) == pytest.approx(0.5)
+    assert graph.get("a", "b")[0] == pytest.approx(0.3)
+    graph.remove_agent("c")
+    data = graph.to_bytes()
+    restored = RelationshipGraph.from_bytes(data)
+    assert len(data) < 4 * 4 * 16 + 200  # 只序列化活跃槽位
+    for src in ("a", "b", "d", "e"):
+        assert restored.relationships_of(src) == graph.relationships_of(src)
+        assert restored.top_partners(src, 3) == graph.top_partners(src, 3)
+    assert not restored.has_agent("c")
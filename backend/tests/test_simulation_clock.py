@@ -0,0 +1,181 @@
+import threading
+import time
+import pytest
+from backend.services import simulation_clock as clock_module
+from backend.services.simulation_clock import SimulationClock, TickScheduler, event_interval_seconds, RUNNING, PAUSED
+
+class FakeClock:
+    def __init__(self, now=0):
+        self.now = now
+
+    def now_ms(self):
+        return self.now
+
+    def wall_seconds_until(self, sim_ms):
+        return max(0.0, (sim_ms - self.now) / 1000)
+
+def test_clock_scales_pauses_and_rescales_without_jumping(monkeypatch):
+    wall = [100.0]
+    monkeypatch.setattr(clock_module.time, "monotonic", lambda: wall[0])
+    clock = SimulationClock(time_scale=10)
+    clock.start()
+    start = clock.now_ms()
+    wall[0] += 2
+    assert clock.status == RUNNING and clock.now_ms() - start == 20000
+    assert clock.wall_seconds_until(clock.now_ms() + 5000) == pytest.approx(0.5, abs=1e-3)
+    clock.set_time_scale(1)
+    assert clock.now_ms() - start == 20000  # 调整倍速不跳变
+    wall[0] += 3
+    assert clock.now_ms() - start == 23000
+    clock.pause()
+    wall[0] += 100
+    assert clock.status == PAUSED and clock.now_ms() - start == 23000
+    assert clock.wall_seconds_until(clock.now_ms() + 1) is None
+    clock.start()
+    wall[0] += 1
+    assert clock.now_ms() - start == 24000
+
+def test_cadence_is_drift_free_and_skips_beyond_catch_up():
+    clock = FakeClock()
+    scheduler = TickScheduler(clock, max_catch_up=3)
+    calls = []
+    scheduler.add('tick', lambda now, elapsed: calls.append((now, elapsed)), every_seconds=1)
+    assert scheduler.run_pending(999) == []
+    # 执行晚了 300ms，下一次仍排在 2000 而不是 1300+1000
+    assert scheduler.run_pending(1300) == ['tick'] and scheduler.stats()['tick']['dueInSeconds'] == 2.0
+    assert scheduler.run_pending(2000) == ['tick']
+    assert calls == [(1300, 1000), (2000, 700)]
+    # 落后 10 个周期：只运行一次，错过的周期计为跳过
+    assert scheduler.run_pending(12500) == ['tick'] and scheduler.run_pending(12600) == []
+    stats = scheduler.stats()['tick']
+    assert stats['runs'] == 3 and stats['skipped'] == 9 and calls[-1] == (12500, 10500)
+    clock.now = 12600
+    scheduler.set_cadence('tick', 5)
+    assert scheduler.run_pending(17000) == [] and scheduler.run_pending(17600) == ['tick']
+
+def test_on_demand_subsystem_runs_only_when_requested():
+    scheduler = TickScheduler(FakeClock())
+    calls = []
+    scheduler.add('decide', lambda now, elapsed: calls.append(now))
+    assert scheduler.run_pending(5000) == []
+    scheduler.request('decide')
+    assert scheduler.run_pending(6000) == ['decide'] and scheduler.run_pending(7000) == []
+    assert calls == [6000]
+
+def test_background_subsystem_overrun_is_skipped_not_queued():
+    scheduler = TickScheduler(FakeClock())
+    release = threading.Event()
+    fast = []
+    scheduler.add('slow', lambda now, elapsed: release.wait(2), every_seconds=1, background=True, run_immediately=True)
+    scheduler.add('fast', lambda now, elapsed: fast.append(now), every_seconds=1)
+    assert scheduler.run_pending(0) == ['slow']
+    assert scheduler.run_pending(1000) == ['fast']  # slow 仍在运行，不阻塞 fast
+    assert scheduler.stats()['slow']['overruns'] == 1 and fast == [1000]
+    release.set()
+    deadline = time.time() + 2
+    while scheduler.stats()['slow']['running'] and time.time() < deadline:
+        time.sleep(0.01)
+    assert scheduler.run_pending(2000) == ['slow', 'fast'] and scheduler.stats()['slow']['runs'] >= 1
+
+def test_failing_subsystem_is_counted_and_loop_exits_on_stop():
+    clock = SimulationClock()
+    clock.start()
+    scheduler = TickScheduler(clock, max_sleep=0.05)
+    def boom(now, elapsed):
+        raise RuntimeError("bad")
+    scheduler.add('boom', boom, every_seconds=0.01, run_immediately=True)
+    stop = threading.Event()
+    thread = threading.Thread(target=scheduler.run, args=(stop,), daemon=True)
+    thread.start()
+    time.sleep(0.1)
+    stop.set()
+    scheduler.wake()
+    thread.join(1)
+    assert not thread.is_alive() and scheduler.stats()['boom']['errors'] >= 1
+
+def test_event_frequency_is_events_per_sim_hour():
+    assert event_interval_seconds(1.0) == 3600.0 and event_interval_seconds(4) == 900.0
+
+def test_update_settings_rejects_out_of_range_values(monkeypatch):
+    from backend.services import simulation_service
+    from backend.services.simulation_service import SimulationService
+    clock = SimulationClock(time_scale=2)
+    monkeypatch.setattr(simulation_service, "simulation_clock", clock)
+    settings = {'timeScale': 2, 'eventFrequency': 1.0, 'maxTimeScale': 1000}
+    monkeypatch.setattr(simulation_service.ConfigManager, "get_global_settings", classmethod(lambda cls: settings))
+    service = SimulationService()
+    for bad in ({'timeScale': 0, 'speed': None}, {'timeScale': -1}, {'timeScale': 5000}, {'speed': 0}, {'eventFrequency': 0}):
+        with pytest.raises(ValueError):
+            service.update_settings(bad)
+    assert clock.time_scale == 2
+    assert service.update_settings({'timeScale': None, 'speed': 10})["settings"]["timeScale"] == 10
+    assert clock.time_scale == 10 and settings['timeScale'] == 10
+
+def test_unstamped_events_and_policies_follow_simulation_time(monkeypatch):
+    from backend.models import Agent, Event
+    from backend.services import policy_registry as policy_module
+    from backend.services.event_lifetime import EventLifetimeScheduler
+    from backend.services.policy_registry import PolicyRegistry
+    from backend.services.world_state import WorldState
+    wall = [100.0]
+    monkeypatch.setattr(clock_module.time, "monotonic", lambda: wall[0])
+    clock = SimulationClock(time_scale=100)
+    clock.start()
+    monkeypatch.setattr(clock_module, "simulation_clock", clock)
+    monkeypatch.setattr(policy_module, "simulation_clock", clock)
+    wall[0] += 10  # 模拟时钟已领先真实时间约 990 秒
+    event = Event(id="e1", type="POLICY", description="临时减税", affectedAgents=["0"], duration=300000, impact={"mood": 10},
+                  meta={"duration": 300000})  # 政策有效期需在 meta 中显式给出
+    assert event.startTime == clock.now_ms()
+    state = WorldState([Agent(id="0", name="A0", position={"x": 0, "y": 0}, state="IDLE")], settings={'flushIntervalSeconds': 60})
+    lifetime = EventLifetimeScheduler(state, clock=clock.now_ms)
+    registry = PolicyRegistry(capacity=5)
+    assert lifetime.register(event, ["0"]) and registry.observe(event)
+    assert lifetime.advance() == [] and state.get_agent("0").attributes.mood == 60
+    assert [p.id for p in registry.recent(5)] == ["e1"]
+    wall[0] += 3  # 300 模拟秒后到期
+    assert lifetime.advance() == ["e1"] and state.get_agent("0").attributes.mood == 50
+    assert registry.recent(5) == []
+    state.close()
+
+def test_clock_never_goes_back_across_reset_and_restart(monkeypatch):
+    wall = [100.0]
+    monkeypatch.setattr(clock_module.time, "monotonic", lambda: wall[0])
+    monkeypatch.setattr(clock_module.time, "time", lambda: 1_000_000 + wall[0])
+    clock = SimulationClock(time_scale=60)
+    clock.start()
+    wall[0] += 10  # 模拟时间领先真实时间 590 秒
+    ahead = clock.now_ms()
+    clock.reset()
+    assert clock.now_ms() == ahead  # idle 时停在 reset 时刻，不回落到真实时间
+    wall[0] += 100
+    assert clock.now_ms() == ahead
+    clock.start()
+    wall[0] += 1
+    assert clock.now_ms() == ahead + 60_000
+    clock.reset()
+    wall[0] += 1000  # 真实时间追上后重新跟随
+    assert clock.now_ms() == int((1_000_000 + wall[0]) * 1000)
+
+def test_reset_reverts_live_event_impacts_and_clears_dedup_window(monkeypatch):
+    from backend.models import Agent, Event
+    from backend.services import simulation_service
+    from backend.services.event_dedup import EventDeduplicator
+    from backend.services.event_lifetime import EventLifetimeScheduler
+    from backend.services.simulation_service import SimulationService
+    from backend.services.world_state import WorldState
+    clock = SimulationClock(time_scale=60)
+    state = WorldState([Agent(id="0", name="A0", position={"x": 0, "y": 0}, state="IDLE")], settings={'flushIntervalSeconds': 60})
+    lifetime = EventLifetimeScheduler(state, clock=clock.now_ms)
+    dedup = EventDeduplicator({'window': 3, 'windowSeconds': 3600, 'dropThreshold': 0.97}, embed=lambda text: [1.0, 0.0],
+                              clock=clock.now_ms)
+    for name, value in (("simulation_clock", clock), ("event_lifetime", lifetime), ("event_dedup", dedup)):
+        monkeypatch.setattr(simulation_service, name, value)
+    monkeypatch.setattr(simulation_service.stop_event, "set", lambda: None)
+    event = Event(id="e1", type="SOCIAL", description="集市开张", affectedAgents=["0"], duration=600000, impact={"mood": 10})
+    assert lifetime.register(event, ["0"]) and state.get_agent("0").attributes.mood == 60
+    assert dedup.check(event).action == "keep"
+    SimulationService().control('reset')
+    assert len(lifetime) == 0 and state.get_agent("0").attributes.mood == 50
+    assert dedup.check(Event(id="e2", type="SOCIAL", description="集市开张", affectedAgents=["0"], duration=1)).action == "keep"
+    state.close()
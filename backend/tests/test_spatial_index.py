@@ -0,0 +1,36 @@
+import math
+import random
+from backend.models import Agent
+from backend.services.spatial_index import SpatialGrid
+from backend.services.world_state import NullSink, WorldState
+
+def _brute(points, x, y):
+    return sorted((math.hypot(px - x, py - y), agent_id) for agent_id, (px, py) in points.items())
+
+def test_radius_and_knn_match_brute_force():
+    rng = random.Random(0)
+    grid = SpatialGrid(800, 600, 50)
+    points = {f"a{i}": (rng.uniform(0, 800), rng.uniform(0, 600)) for i in range(2000)}
+    for agent_id, (x, y) in points.items():
+        grid.upsert(agent_id, x, y)
+    # 移动一部分，验证增量更新
+    for i in range(0, 2000, 7):
+        points[f"a{i}"] = (rng.uniform(0, 800), rng.uniform(0, 600))
+        grid.upsert(f"a{i}", *points[f"a{i}"])
+    for _ in range(20):
+        x, y = rng.uniform(0, 800), rng.uniform(0, 600)
+        expected = _brute(points, x, y)
+        within = [a for d, a in expected if d <= 120]
+        assert [a for a, _ in grid.query_radius(x, y, 120)] == within
+        assert [a for a, _ in grid.query_radius(x, y, 120, limit=5)] == within[:5]
+        assert [a for a, _ in grid.nearest(x, y, 7)] == [a for _, a in expected[:7]]
+
+def test_world_state_keeps_index_in_sync_on_move_and_remove():
+    agents = [Agent(id=str(i), name=f"A{i}", position={"x": 100 * i, "y": 100}, state="IDLE") for i in range(4)]
+    state = WorldState(agents, NullSink(), {'flushIntervalSeconds': 60})
+    assert [a.id for a in state.visible_agents(agents[0], 150)] == ["1"]
+    state.update_agent("3", {"position": {"x": 10, "y": 110}})
+    state.remove_agent("1")
+    assert [a.id for a in state.visible_agents(agents[0], 150)] == ["3"]
+    assert [a.id for a in state.visible_agents(agents[0], 1000, limit=2)] == ["3", "2"]
+    state.close()
@@ -0,0 +1,66 @@
+import numpy as np
+from backend.services.vector_index import VectorIndex, PartitionedMemoryIndex, parse_embedding
+
+def _random_index(n=300, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    index = VectorIndex("test", dim, initial_capacity=4)
+    index.add_many((f"m{i}", vectors[i], {"id": f"m{i}"}) for i in range(n))
+    return index, vectors, rng
+
+def test_top_k_matches_brute_force():
+    index, vectors, rng = _random_index()
+    query = rng.normal(size=vectors.shape[1])
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normed @ (query / np.linalg.norm(query))))[:5]
+    hits = index.search(query, 5)
+    assert [p["id"] for p, _ in hits] == [f"m{i}" for i in expected]
+    assert hits[0][1] >= hits[-1][1]
+
+def test_remove_and_upsert_keep_index_consistent():
+    index, vectors, _ = _random_index(n=10)
+    assert index.remove("m3") and not index.remove("m3")
+    assert len(index) == 9 and "m3" not in index
+    assert index.search(vectors[9], 1)[0][0]["id"] == "m9"  # 末行被回填后仍可检索
+    index.add("m0", vectors[5], {"id": "m0", "v": 2})
+    assert len(index) == 9
+    assert index.get("m0")["v"] == 2
+
+def test_removed_ids_are_not_resurrected_by_warm_load():
+    index = VectorIndex("test", 4)
+    index.loading = True
+    index.remove("stale")
+    index.add_many([("stale", [1, 0, 0, 0], {"id": "stale"}), ("fresh", [0, 1, 0, 0], {"id": "fresh"})], skip_removed=True)
+    assert "stale" not in index and "fresh" in index
+
+def test_parse_embedding_accepts_pgvector_strings():
+    assert parse_embedding("[0.5,1]") == [0.5, 1]
+    assert parse_embedding("not-json") is None
+    assert parse_embedding(None) is None
+
+def _memory(i, agent_id, type="EVENT", importance=1, timestamp=0, tags=None):
+    return {"id": f"{agent_id}-{i}", "agent_id": agent_id, "type": type, "importance": importance,
+            "timestamp": timestamp, "tags": tags or []}
+
+def test_agent_scoped_search_never_returns_other_agents():
+    index = PartitionedMemoryIndex("memories", 4)
+    index.add("a-0", [1, 0, 0, 0], _memory(0, "a"))
+    index.add("b-0", [1, 0, 0, 0], _memory(0, "b"))
+    index.add("a-1", [0, 1, 0, 0], _memory(1, "a"))
+    hits = index.search_agent("a", [1, 0, 0, 0], 5)
+    assert [p["id"] for p, _ in hits] == ["a-0", "a-1"]
+    assert index.search_agent("missing", [1, 0, 0, 0], 5) == []
+    assert len(index.search([1, 0, 0, 0], 5)) == 3
+
+def test_prefilters_apply_before_scoring():
+    index = PartitionedMemoryIndex("memories", 4)
+    index.add("a-0", [1, 0, 0, 0], _memory(0, "a", type="DIALOGUE", importance=3, timestamp=100, tags=["gift"]))
+    index.add("a-1", [1, 0.1, 0, 0], _memory(1, "a", type="RESULT", importance=1, timestamp=200))
+    index.add("a-2", [0, 1, 0, 0], _memory(2, "a", type="DIALOGUE", importance=2, timestamp=300, tags=["dialogue"]))
+    ids = lambda hits: [p["id"] for p, _ in hits]
+    assert ids(index.search_agent("a", [1, 0, 0, 0], 5, types=["DIALOGUE"])) == ["a-0", "a-2"]
+    assert ids(index.search_agent("a", [1, 0, 0, 0], 5, min_importance=2, max_importance=2)) == ["a-2"]
+    assert ids(index.search_agent("a", [1, 0, 0, 0], 5, since=150, until=250)) == ["a-1"]
+    assert ids(index.search_agent("a", [1, 0, 0, 0], 5, tags=["dialogue"])) == ["a-2"]
+    index.remove("a-0")  # 回填后列数据仍与行对齐
+    assert ids(index.search_agent("a", [1, 0, 0, 0], 5, types=["DIALOGUE"])) == ["a-2"]
@@ -0,0 +1,64 @@
+from backend.models import Agent, AgentAttributes
+from backend.services.world_state import WorldState
+
+SETTINGS = {'flushIntervalSeconds': 60, 'maxBatch': 200, 'maxPending': 10000}
+
+class RecordingSink:
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.upserts = []
+        self.deletes = []
+
+    def load_agents(self):
+        return self.rows
+
+    def upsert_agents(self, rows):
+        self.upserts.append(rows)
+
+    def delete_agents(self, agent_ids):
+        self.deletes.append(agent_ids)
+
+def _agent(i):
+    return Agent(id=str(i), name=f"A{i}", position={"x": i, "y": i}, state="IDLE", llmPrompts={"system": "s"})
+
+def test_updates_apply_in_place_and_persist_once_per_agent():
+    agents = [_agent(1), _agent(2)]
+    sink = RecordingSink()
+    state = WorldState(agents, sink, SETTINGS)
+    live = agents[0]
+    state.update_agent("1", {"position": {"x": 10, "y": 20}})
+    state.update_agent("1", {"attributes": {"energy": 80, "mood": 60, "sociability": 50}, "emotion": "高兴"})
+    assert state.get_agent("1") is live and live.position == {"x": 10, "y": 20}
+    assert isinstance(live.attributes, AgentAttributes) and live.attributes.mood == 60
+    assert sink.upserts == []  # 写回是异步的
+    state.remove_agent("2")
+    state.flush()
+    assert len(sink.upserts) == 1 and [r["id"] for r in sink.upserts[0]] == ["1"]
+    row = sink.upserts[0][0]
+    assert row["emotion"] == "高兴" and row["position"] == {"x": 10, "y": 20} and "llmPrompts" not in row
+    assert sink.deletes == [["2"]] and [a.id for a in agents] == ["1"]
+    state.close()
+
+def test_hydrate_overlays_persisted_state_on_presets():
+    agents = [_agent(1)]
+    sink = RecordingSink([{"id": "1", "name": "A1", "position": {"x": 5, "y": 6}, "state": "WORK", "emotion": "", "avatar": None},
+                          {"id": "9", "name": "新居民", "position": {"x": 0, "y": 0}, "state": "IDLE"}])
+    state = WorldState(agents, sink, SETTINGS)
+    assert state.hydrate() == 2
+    assert agents[0].position == {"x": 5, "y": 6} and agents[0].state == "WORK" and agents[0].llmPrompts == {"system": "s"}
+    assert state.get_agent("9").name == "新居民" and len(agents) == 2
+    state.flush()
+    assert sink.upserts == []
+    state.close()
+
+def test_single_agent_update_keeps_pending_batch_deltas():
+    agents = [_agent(1)]
+    state = WorldState(agents, RecordingSink(), SETTINGS)
+    state.apply_attribute_deltas(["1"], {"mood": 10})        # 批量增量只改列，对象视图尚未刷新
+    state.update_agent("1", {"emotion": "平静", "position": {"x": 3, "y": 4}})
+    state.apply_attribute_deltas(["1"], {"energy": -20})
+    state.update_agent("1", {"attributes": {"sociability": 70}})  # 只给部分属性键
+    attrs = state.get_agent("1").attributes
+    assert (attrs.mood, attrs.energy, attrs.sociability) == (60, 80, 70)
+    assert agents[0].position == {"x": 3, "y": 4} and agents[0].emotion == "平静"
+    state.close()
@@ -0,0 +1,121 @@
+import threading
+import time
+import pytest
+from backend.models import Memory
+from backend.services import memory_service
+from backend.services.memory_service import MemoryService
+from backend.services.write_behind import WriteBehindBuffer
+from backend.tests.fake_supabase import FakeSupabase
+
+def _wait_until(cond, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline and not cond():
+        time.sleep(0.01)
+    return cond()
+
+def test_flushes_on_size_and_time_thresholds():
+    batches = []
+    buf = WriteBehindBuffer("t", batches.append, max_batch=3, flush_interval=0.1)
+    buf.submit([1, 2, 3, 4])
+    assert _wait_until(lambda: sum(map(len, batches)) == 4)
+    assert batches[0] == [1, 2, 3] and buf.stats()["pending"] == 0
+    buf.close()
+
+def test_backpressure_and_close_flush_everything():
+    batches = []
+    buf = WriteBehindBuffer("t", batches.append, max_batch=100, flush_interval=60, max_pending=5)
+    buf.submit(list(range(5)))  # 达到积压上限，调用方同步刷写
+    assert batches == [[0, 1, 2, 3, 4]]
+    buf.submit([5, 6])
+    buf.close()
+    assert batches[-1] == [5, 6]
+
+def test_failed_flush_is_retried_first_in_order():
+    calls = []
+    def flaky(batch):
+        calls.append(list(batch))
+        if len(calls) == 1:
+            raise RuntimeError("db down")
+    buf = WriteBehindBuffer("t", flaky, max_batch=10, flush_interval=60)
+    buf.submit([1, 2])
+    assert buf.flush() == 0 and buf.pending() == [1, 2]
+    buf.submit([3])
+    assert buf.pending() == [1, 2, 3]
+    assert buf.flush() == 3 and calls[1:] == [[1, 2], [3]]
+    assert buf.discard(lambda x: True) == 0
+
+def test_poison_batch_moves_to_dead_letter_after_max_retries():
+    written = []
+    def flush_fn(batch):
+        if "bad" in batch:
+            raise ValueError("bad row")
+        written.extend(batch)
+    buf = WriteBehindBuffer("t", flush_fn, max_batch=2, flush_interval=60, max_retries=2)
+    buf.submit(["bad", "a"])
+    assert buf.flush() == 0 and buf.flush() == 0  # 第 1、2 次重试
+    buf.submit(["b", "c"])
+    assert buf.flush() == 2 and written == ["b", "c"]  # 超过重试上限后移入死信，后续数据照常写入
+    assert list(buf.dead_letter) == [["bad", "a"]] and buf.stats()["deadLettered"] == 2
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeSupabase()
+    monkeypatch.setattr(memory_service, "supabase", db)
+    buf = WriteBehindBuffer("memories", lambda b: MemoryService()._persist_memories(b), max_batch=50, flush_interval=60,
+                            undo_fn=lambda b: MemoryService()._undo_persisted([m.id for m in b]))
+    monkeypatch.setattr(memory_service, "memory_write_buffer", buf)
+    yield db
+    buf.close()
+
+def _mem(i, agent_id="1"):
+    return Memory(id=f"m{i}", agent_id=agent_id, content=f"记忆{i}", timestamp=i, importance=1,
+                  type="EVENT", embedding=[1.0, 0.0])
+
+def test_memory_service_reads_its_own_pending_writes(fake_db):
+    service = MemoryService()
+    service.add_memories([_mem(0), _mem(1), _mem(2, agent_id="2")])
+    assert fake_db.calls == 0
+    assert [m.id for m in service.get_memories("1")] == ["m1", "m0"]
+    assert service.delete_memory("m1")
+    assert service.flush_pending() == 2
+    assert {r["id"] for r in fake_db.tables["memories"]} == {"m0", "m2"}
+    assert [m.id for m in service.get_memories("1")] == ["m0"]
+
+def test_inflight_writes_stay_visible_and_deletes_are_undone_after_landing(fake_db, monkeypatch):
+    service = MemoryService()
+    buf = memory_service.memory_write_buffer
+    entered, release = threading.Event(), threading.Event()
+    persist = MemoryService._persist_memories
+    def slow_persist(self, memories):
+        entered.set()
+        release.wait(2)
+        persist(self, memories)
+    monkeypatch.setattr(MemoryService, "_persist_memories", slow_persist)
+    service.add_memories([_mem(0), _mem(1)])
+    flusher = threading.Thread(target=buf.flush)
+    flusher.start()
+    assert entered.wait(2)
+    # 正在刷写：读己之写仍能看到，删除被记下
+    assert [m.id for m in service.get_memories("1")] == ["m1", "m0"]
+    assert service.delete_memory("m1")
+    assert [m.id for m in service.get_memories("1")] == ["m0"]
+    release.set()
+    flusher.join(2)
+    # 插入晚于删除落库，随后被撤销，不会"复活"
+    assert {r["id"] for r in fake_db.tables["memories"]} == {"m0"} and buf.stats()["undone"] == 1
+
+def test_embedding_failure_keeps_memories_queued_for_retry(fake_db, monkeypatch):
+    from backend.services.llm_service import LLMService
+    service = MemoryService()
+    attempts = []
+    def embed(self, texts):
+        attempts.append(len(texts))
+        if len(attempts) == 1:
+            raise RuntimeError("embedding 服务不可用")
+        return [[0.5, 0.5] for _ in texts]
+    monkeypatch.setattr(LLMService, "get_embeddings", embed)
+    service.add_memories([Memory(id="n1", agent_id="1", content="没有向量", timestamp=1, importance=1, type="EVENT")])
+    assert service.flush_pending() == 0 and fake_db.tables.get("memories", []) == []
+    assert [m.id for m in service.get_memories("1")] == ["n1"]
+    assert service.flush_pending() == 1
+    assert fake_db.tables["memories"][0]["embedding"] == [0.5, 0.5]